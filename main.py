@@ -22,6 +22,9 @@ op = OptionParser(usage = "%prog [options] <filename.pdf>")
 op.add_option("--no-opengl", action = "store_false",
               dest = "use_opengl", default = True,
               help = "disable OpenGL for rendering (default: use OpenGL)")
+op.add_option("--atlas", action = "store_true",
+              dest = "use_atlas", default = False,
+              help = "with OpenGL, draw patches from shared texture atlases (experimental)")
 op.add_option("--size", "-s", default = '1024x768',
               help = "set target rendering / window size in pixels")
 op.add_option("--cache", action = "store_true",
@@ -30,9 +33,31 @@ op.add_option("--cache", action = "store_true",
 op.add_option("--ignore-cache", action = "store_false",
               dest = "use_cache", default = None,
               help = "ignore cache file (even if it seems to be up-to-date)")
+op.add_option("--service", default = None, metavar = "URL",
+              help = "let a decomposition service (python -m pdf_decanter.service) decompose the PDF if there is no cache")
+op.add_option("--service-timeout", type = "float", default = pdf_decanter.SERVICE_TIMEOUT, metavar = "SECONDS",
+              help = "decompose locally if the service did not finish after this time (default: %default)")
 op.add_option("--no-gui", action = "store_false",
               dest = "show_gui", default = True,
               help = "skip main GUI (use for benchmarking / cache generation)")
+op.add_option("--prefetch", type = "int", default = None, metavar = "N",
+              help = "number of upcoming frames / slides to prepare in idle time (0: disable)")
+op.add_option("--pixmap-budget", type = "int", default = None, metavar = "MB",
+              help = "maximum memory used for patch pixmaps (default: 256)")
+op.add_option("--composite", action = "store_true", default = False,
+              help = "flatten content that is static within a slide into one pixmap per layer")
+op.add_option("--incremental-classifier", action = "store_true", default = False,
+              help = "train a lightweight nearest-example header / footer classifier instead of a random forest")
+op.add_option("--stats-overlay", action = "store_true", default = False,
+              help = "show input latency / frame interval / item count overlay")
+op.add_option("--stats-log", default = None, metavar = "FILENAME",
+              help = "write input latencies, transition frame intervals and item counts to JSON file on exit")
+op.add_option("--timings", default = None, metavar = "FILENAME",
+              help = "write per-stage decomposition times and counts to JSON file")
+op.add_option("--memory-report", default = None, metavar = "FILENAME",
+              help = "trace memory usage per decomposition stage and write report to JSON file (slow)")
+op.add_option("--trace", default = None, metavar = "FILENAME",
+              help = "record timeline of loading, decomposition and GUI events and write it as Chrome trace on exit")
 op.add_option("--profile", action = "store_true",
               help = "enable profiling (and dump to 'pdf_decanter.prof')")
 options, args = op.parse_args()
@@ -45,10 +70,29 @@ if not ma:
     sys.exit(1)
 slideSize = list(map(int, ma.groups()))
 
+if options.trace:
+    pdf_decanter.tracing.enable(options.trace)
+
 g = pdf_decanter.start(show = options.show_gui, slideSize = slideSize)
 
 if options.use_opengl and options.show_gui:
-    g.enableGL()
+    g.enableGL(textureAtlas = options.use_atlas)
+
+if options.prefetch is not None:
+    g.prefetcher().setLookAhead(options.prefetch)
+if options.pixmap_budget is not None:
+    g.pixmapCache().setBudget(options.pixmap_budget * 1024**2)
+if options.composite:
+    g.setCompositeStaticLayers(True)
+if options.incremental_classifier:
+    g.navigationTrainer().setIncremental(True)
+if options.service:
+    g.setDecompositionService(options.service, timeout = options.service_timeout)
+if options.stats_overlay or options.stats_log:
+    g.enableInstrumentation(overlay = options.stats_overlay, logFilename = options.stats_log)
+
+if options.memory_report:
+    g.enableMemoryProfiling()
 
 if options.profile:
     import cProfile
@@ -63,6 +107,14 @@ if options.profile:
     pr.disable()
     pr.dump_stats('pdf_decanter.prof')
 
+if options.memory_report:
+    g.memoryProfiler().writeReport(options.memory_report)
+
+if options.timings:
+    import json
+    with open(options.timings, 'w') as f:
+        json.dump(g.loadStatistics(), f, indent = 1)
+
 pixelCount = g._slides.pixelCount()
 sw, sh = g.slideSize() # _slides[0].sizeF()
 rawCount = g._slides.frameCount() * sw * sh
@@ -14,11 +14,13 @@
 
 
 
-from .dynqt import qt, QtCore, QtGui, QtWidgets, QtOpenGL, getprop as p
+from .dynqt import qt, QtCore, QtGui, QtWidgets, getprop as p
 
-import numpy, os, sys, time, math, operator
-from . import bz2_pickle
-from . import decomposer, slide_renderer
+import numpy, os, sys, math, operator, tempfile
+from . import cache
+from . import decomposer, slide_renderer, prefetcher, pixmap_cache, transitions, texture_atlas
+from . import instrumentation, memory_profile, tracing, navigation
+from .progress import Progress, ConsoleReporter
 
 __version__ = "0.1"
 
@@ -27,6 +29,17 @@ PADDING_Y = 0.03 # 3% of frame height
 LINEBREAK_PADDING = 2.5 * PADDING_Y
 INDENT_X = 0 # 0.125
 
+# SlideRenderers are only created for slides within the visible area
+# plus this margin (as fraction of the visible area's size, in each
+# direction), and are dropped again when they leave the (larger)
+# recycling margin:
+PRELOAD_MARGIN = 0.5
+RECYCLE_MARGIN = 1.5
+
+# maximum time (seconds) to wait for a decomposition service before
+# decomposing locally (cf. setDecompositionService()):
+SERVICE_TIMEOUT = 300
+
 
 class GeometryAnimation(QtCore.QVariantAnimation):
     def __init__(self, item, parent = None):
@@ -57,7 +70,12 @@ class PDFDecanter(QtCore.QObject):
     _presentationItem and the renderers, there is a viewport
     (cf. _slideViewport) that serves as a clipping rect, in order to
     hide neighboring slides in case of a larger window (e.g. 16:9
-    fullscreen with 4:3 slides)."""
+    fullscreen with 4:3 slides).
+
+    The grid geometry (_slideRects) is computed for all slides, but
+    SlideRenderers are only created for slides in or near the visible
+    region (cf. _updateVisibleRenderers); _renderers contains None for
+    all others."""
     
     def __init__(self, view = None, slideSize = (1024, 768)):
         QtCore.QObject.__init__(self)
@@ -115,20 +133,41 @@ class PDFDecanter(QtCore.QObject):
 
         self._inOverview = False
 
+        self._prefetcher = prefetcher.Prefetcher(self)
+        self._transitionPlanner = transitions.TransitionPlanner(self)
+        self._loadProgress = Progress()
+        self._decompositionService = None
+        self._serviceTimeout = SERVICE_TIMEOUT
+        self._memoryProfiler = None
+        self._animationCount = 0 # (for tracing)
+        self._instrumentation = None
+
         self._loadConfig()
 
     def _loadConfig(self):
         self._configDirectory = os.path.expanduser('~/.pdf_decanter')
         self._classifierFilename = os.path.join(self._configDirectory, 'classifier')
         decomposer.load_classifier(self._classifierFilename)
+        self._navigationTrainer = navigation.NavigationTrainer(self._classifierFilename, self)
+        self._navigationTrainer.setChangeHandler(self._navigationFlagsChanged)
+
+    def enableGL(self, textureAtlas = False):
+        """Render using an OpenGL viewport (QGLWidget).  If
+        textureAtlas is True (experimental, not tested with real GL
+        contexts yet), a QOpenGLWidget is used instead if available,
+        and patch images are packed into shared texture atlases that
+        are drawn with batched calls per layer (cf.
+        setUseTextureAtlas()).  Returns whether GL could be enabled."""
+        if textureAtlas and hasattr(QtWidgets, 'QOpenGLWidget'):
+            return self._enableOpenGLWidget()
 
-    def enableGL(self):
         try:
             from OpenGL import GL
         except ImportError:
             sys.stderr.write("WARNING: OpenGL could not be imported, running without GL...\n")
             return False
 
+        QtOpenGL = qt.QtOpenGL
         glWidget = QtOpenGL.QGLWidget(QtOpenGL.QGLFormat(QtOpenGL.QGL.SampleBuffers))
         if not glWidget.isValid():
             sys.stderr.write("WARNING: Could not create valid OpenGL context, running without GL...\n")
@@ -140,6 +179,52 @@ class PDFDecanter(QtCore.QObject):
         self._view.viewport().installEventFilter(self)
         return True
 
+    def _enableOpenGLWidget(self):
+        context = QtGui.QOpenGLContext()
+        if not context.create():
+            sys.stderr.write("WARNING: Could not create valid OpenGL context, running without GL...\n")
+            return False
+
+        glWidget = QtWidgets.QOpenGLWidget()
+        format = QtGui.QSurfaceFormat()
+        format.setSamples(4)
+        glWidget.setFormat(format)
+
+        self._view.setViewport(glWidget)
+        self._view.setViewportUpdateMode(QtWidgets.QGraphicsView.FullViewportUpdate)
+        self._view.viewport().setMouseTracking(True)
+        self._view.viewport().installEventFilter(self)
+
+        self.setUseTextureAtlas(True)
+        return True
+
+    def setUseTextureAtlas(self, onoff):
+        """Draw patch images from shared texture atlases (cf.
+        texture_atlas module), batched per layer."""
+        slide_renderer.setUseTextureAtlas(onoff)
+        for r in self.renderers():
+            r.resetItems()
+
+    def enableInstrumentation(self, overlay = False, logFilename = None):
+        """Start measuring input latencies, transition frame intervals
+        and item / pixmap counts (cf. instrumentation module),
+        optionally showing an on-screen overlay and writing a JSON log
+        when the application quits.  Returns Instrumentation object."""
+        if self._instrumentation is None:
+            self._instrumentation = instrumentation.Instrumentation(
+                self, overlay = overlay, logFilename = logFilename)
+        return self._instrumentation
+
+    def instrumentation(self):
+        """Return Instrumentation object (None unless enabled)."""
+        return self._instrumentation
+
+    def renderStatistics(self):
+        """Return dict with uploadBytes, drawCalls and fragments
+        (patches drawn) of the last painted frame when using the
+        texture atlas."""
+        return texture_atlas.atlas.frameStatistics()
+
     def view(self):
         return self._view
 
@@ -148,14 +233,91 @@ class PDFDecanter(QtCore.QObject):
         return self._slideSize
 
     def presentationBounds(self):
-        result = QtCore.QRectF()
-        for renderer in self._renderers:
-            br = renderer.boundingRect()
-            br.translate(p(renderer.pos))
-            result |= br
+        return QtCore.QRectF(self._presentationBounds)
+
+    def renderer(self, slideIndex):
+        """Return SlideRenderer for the given slide, creating it if necessary."""
+        result = self._renderers[slideIndex]
+        if result is None:
+            with tracing.span('create renderer', 'gui', slide = slideIndex):
+                result = slide_renderer.SlideRenderer(self._slides[slideIndex], self._slideViewport)
+                result.setLinkHandler(self.followLink)
+                result.setTransitionPlanner(self._transitionPlanner)
+                result.setPos(self._slideRects[slideIndex].topLeft())
+            self._renderers[slideIndex] = result
         return result
 
+    def existingRenderer(self, slideIndex):
+        """Return SlideRenderer for the given slide, or None if it
+        has not been created (cf. _updateVisibleRenderers())."""
+        return self._renderers[slideIndex]
+
+    def renderers(self):
+        """Return list of currently existing SlideRenderers (empty
+        before setSlides())."""
+        return [renderer for renderer in self._renderers or () if renderer is not None]
+
+    def _visibleRect(self, margin, pos = None, scale = None):
+        """Return part of the presentation (in _slideViewport
+        coordinates) visible with the given (default: current)
+        presentation pos and scale, enlarged by the given margin."""
+        pres = self._presentationItem
+        if pos is None:
+            pos = p(pres.pos)
+        if scale is None:
+            scale = p(pres.scale)
+        sceneRect = p(self._scene.sceneRect)
+        result = QtCore.QRectF((sceneRect.left() - pos.x()) / scale,
+                               (sceneRect.top() - pos.y()) / scale,
+                               sceneRect.width() / scale,
+                               sceneRect.height() / scale)
+        dx, dy = margin * result.width(), margin * result.height()
+        return result.adjusted(-dx, -dy, dx, dy)
+
+    def _updateVisibleRenderers(self, pos = None, scale = None):
+        """Create SlideRenderers for slides that are (almost) visible
+        (restoring items released by the PixmapCache) and drop
+        far-away ones.  The current renderer and renderers
+        with custom content are kept.
+
+        Also switches renderers to thumbnail mode if the current
+        presentation scale is small enough (except for the current
+        renderer outside of the overview)."""
+        if not self._renderers:
+            return
+
+        preloadRect = self._visibleRect(PRELOAD_MARGIN, pos, scale)
+        keepRect = self._visibleRect(RECYCLE_MARGIN, pos, scale)
+        currentSlideIndex = self._currentSlideIndex()
+
+        for slideIndex, rect in enumerate(self._slideRects):
+            if rect.intersects(preloadRect):
+                self.renderer(slideIndex).restoreItems()
+                continue
+            renderer = self._renderers[slideIndex]
+            if (renderer is not None and slideIndex != currentSlideIndex
+                and not rect.intersects(keepRect) and renderer.isRecyclable()):
+                renderer.discardPreparedItems()
+                self._scene.removeItem(renderer)
+                self._renderers[slideIndex] = None
+
+        # renderers may have left the screen:
+        pixmap_cache.cache.checkInUse()
+
+        useThumbnails = p(self._presentationItem.scale) < slide_renderer.THUMBNAIL_SCALE
+        for slideIndex, renderer in enumerate(self._renderers):
+            if renderer is not None:
+                renderer.setThumbnailMode(useThumbnails and (
+                    self._inOverview or slideIndex != currentSlideIndex))
+
     def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            if obj is self._view.viewport():
+                texture_atlas.atlas.beginFrame()
+                if self._instrumentation is not None:
+                    self._instrumentation.framePainted()
+            return False
+
         if event.type() == QtCore.QEvent.MouseMove:
             self.mouseMoveEvent(event)
             return False
@@ -163,7 +325,11 @@ class PDFDecanter(QtCore.QObject):
         event.ignore()
         if obj is self._view:
             if event.type() == QtCore.QEvent.KeyPress:
+                if self._instrumentation is not None:
+                    self._instrumentation.inputStarted(event.key())
                 self.keyPressEvent(event)
+                if self._instrumentation is not None:
+                    self._instrumentation.inputHandled()
             elif event.type() == QtCore.QEvent.Resize:
                 self.resizeEvent(event)
             elif event.type() == QtCore.QEvent.Wheel:
@@ -191,6 +357,7 @@ class PDFDecanter(QtCore.QObject):
         else:
             scale = self._overviewScale()
         pres.setScale(scale)
+        self._updateVisibleRenderers()
 
     def _adjustSlideViewport(self):
         if self._currentFrameIndex is None:
@@ -211,6 +378,7 @@ class PDFDecanter(QtCore.QObject):
             overviewPos.setY(overviewPos.y() + e.delta())
             self._adjustOverviewPos(overviewPos, self._overviewScale())
             overview.setPos(overviewPos)
+            self._updateVisibleRenderers()
         else:
             e.ignore()
 
@@ -238,8 +406,9 @@ class PDFDecanter(QtCore.QObject):
                     renderer = item
                     break
             if renderer is not None:
+                pos = renderer.mapFromScene(e.scenePos())
                 for item in self._scene.items(e.scenePos()):
-                    patch = renderer.patchOf(item)
+                    patch = renderer.patchOf(item, pos)
                     if patch is not None:
                         if self.toggleNavigationFlag(patch):
                             return
@@ -263,59 +432,194 @@ class PDFDecanter(QtCore.QObject):
             for item in self._scene.items(e.scenePos()):
                 #if isinstance(item, slide_renderer.SlideRenderer):
                 if item in self._renderers:
-                    slideIndex = self._renderers.index(item)
+                    slideIndex = item.slide().slideIndex()
                     self.gotoFrame(self._slides[slideIndex].currentFrame().frameIndex())
                     break
 
-    def loadPDF(self, pdfFilename, cacheFilename = None, useCache = None, createCache = False):
+    def loadPDF(self, pdfFilename, cacheFilename = None, useCache = None, createCache = False,
+                progress = None):
+        """Load the given PDF (from cache if possible), decomposing it
+        otherwise.  Stage times and counts are reported via the given
+        Progress (default: console output, cf. loadStatistics())."""
+        with tracing.span('loadPDF', 'load', filename = pdfFilename):
+            self._loadPDF(pdfFilename, cacheFilename, useCache, createCache, progress)
+
+    def _loadPDF(self, pdfFilename, cacheFilename, useCache, createCache, progress):
         slides = None
 
-        pdfFilename = os.path.abspath(pdfFilename)
+        if progress is None:
+            progress = Progress(ConsoleReporter())
+        callbacks = [self._showProgress]
+        if self._memoryProfiler is not None:
+            callbacks.append(self._memoryProfiler)
+        for callback in callbacks:
+            progress.addCallback(callback)
+        self._loadProgress = progress
+
+        try:
+            pdfFilename = os.path.abspath(pdfFilename)
         
-        if cacheFilename is None:
-            dirname, basename = os.path.split(pdfFilename)
-            w, h = self.slideSize()
-            cacheFilename = os.path.join(
-                dirname, "pdf_decanter_cache_%s_%dx%d.bz2" % (
-                    os.path.splitext(basename)[0], w, h))
-
-        if useCache is not False:
-            if os.path.exists(cacheFilename):
-                if os.path.getmtime(cacheFilename) >= os.path.getmtime(pdfFilename) or useCache:
-                    sys.stdout.write("reading cache '%s'...\n" % cacheFilename)
-                    try:
-                        slides = bz2_pickle.unpickle(cacheFilename)
-                    except Exception as e:
-                        sys.stderr.write("FAILED to load cache (%s), re-rendering...\n" % (e, ))
+            if cacheFilename is None:
+                cacheFilename = cache.cacheFilename(pdfFilename, self.slideSize())
+
+            if useCache is not False:
+                if os.path.exists(cacheFilename):
+                    if cache.isCurrent(cacheFilename, pdfFilename) or useCache:
+                        sys.stdout.write("reading cache '%s'...\n" % cacheFilename)
+                        try:
+                            with progress.stage('cache'):
+                                cachedSlides, transitionPlans = cache.readCache(cacheFilename)
+                            if transitionPlans is not None:
+                                self._transitionPlanner.importState(cachedSlides, transitionPlans)
+                            slides = cachedSlides
+                        except Exception as e:
+                            sys.stderr.write("FAILED to load cache (%s), re-rendering...\n" % (e, ))
         
-        if slides is None:
-            wallClockTime = time.time()
-            cpuTime = time.clock()
-
-            slides = decomposer.decompose_pdf(pdfFilename, sizePX = self.slideSize())
-            
-            print("complete rendering took %.3gs. (%.3gs. real time)" % (
-                time.clock() - cpuTime, time.time() - wallClockTime))
-
-            if createCache:
-                sys.stdout.write("caching in '%s'...\n" % cacheFilename)
-                bz2_pickle.pickle(cacheFilename, slides)
+            if slides is None and self._decompositionService:
+                slides = self._fetchFromService(pdfFilename, cacheFilename, createCache, progress)
+                if slides is not None:
+                    createCache = False # (cache has been downloaded already)
+
+            if slides is None:
+                slides = decomposer.decompose_pdf(pdfFilename, sizePX = self.slideSize(),
+                                                  progress = progress)
+
+                if createCache:
+                    sys.stdout.write("caching in '%s'...\n" % cacheFilename)
+                    cache.writeCache(cacheFilename, slides, self._transitionPlanner)
+        finally:
+            # (progress may be reused for further calls)
+            for callback in callbacks:
+                progress.removeCallback(callback)
 
         self.setSlides(slides)
         self._view.setWindowFilePath(pdfFilename)
+        self._view.setWindowTitle("")
+
+    def enableMemoryProfiling(self):
+        """Record memory usage at the stage boundaries of subsequent
+        loadPDF() calls and in setSlides() (cf. memoryProfiler()).
+        Starts tracemalloc, so this slows down decomposition."""
+        if self._memoryProfiler is None:
+            self._memoryProfiler = memory_profile.MemoryProfiler()
+        return self._memoryProfiler
+
+    def memoryProfiler(self):
+        """Return MemoryProfiler (None unless enableMemoryProfiling()
+        has been called)."""
+        return self._memoryProfiler
+
+    def decompositionService(self):
+        return self._decompositionService
+
+    def setDecompositionService(self, url, timeout = SERVICE_TIMEOUT):
+        """Set URL of a decomposition service (cf. service module) to
+        be used by loadPDF() before decomposing locally (None: don't
+        use a service).  If the service did not deliver the result
+        after timeout seconds, the PDF is decomposed locally."""
+        self._decompositionService = url
+        self._serviceTimeout = timeout
+
+    def _fetchFromService(self, pdfFilename, cacheFilename, createCache, progress):
+        """Return slides decomposed by the decomposition service, or
+        None if that fails.  The downloaded cache file is kept (as
+        cacheFilename) only if createCache is True and it could be
+        read."""
+        from . import service # (imports HTTP and multiprocessing modules)
+
+        # download into a temporary file (next to the cache file, so
+        # that it can be renamed atomically):
+        fd, targetFilename = tempfile.mkstemp(
+            suffix = '.bz2', dir = os.path.dirname(cacheFilename) if createCache else None)
+        os.close(fd)
+
+        sys.stdout.write("fetching from decomposition service '%s'...\n" % self._decompositionService)
+        try:
+            with progress.stage('fetch'):
+                service.fetch_cache(self._decompositionService, pdfFilename,
+                                    self.slideSize(), targetFilename, progress,
+                                    timeout = self._serviceTimeout)
+                slides, transitionPlans = cache.readCache(targetFilename)
+            if createCache:
+                os.replace(targetFilename, cacheFilename)
+        except Exception as e:
+            sys.stderr.write("FAILED to fetch from decomposition service (%s), rendering locally...\n" % (e, ))
+            return None
+        finally:
+            if os.path.exists(targetFilename):
+                os.remove(targetFilename)
+
+        if transitionPlans is not None:
+            self._transitionPlanner.importState(slides, transitionPlans)
+        return slides
+
+    def _traceAnimation(self, animation, frameIndex):
+        self._animationCount += 1
+        animationId = self._animationCount
+        tracing.begin('transition', 'animation', animationId, frame = frameIndex)
+
+        def stateChanged(newState, oldState):
+            if newState == QtCore.QAbstractAnimation.Stopped:
+                animation.stateChanged.disconnect(stateChanged)
+                tracing.end('transition', 'animation', animationId)
+        animation.stateChanged.connect(stateChanged)
+
+    def _showProgress(self, event):
+        if event['type'] == 'progress':
+            total = " / %d" % event['total'] if event['total'] is not None else ""
+            self._view.setWindowTitle("%s %d%s..." % (event['name'], event['current'], total))
+            QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+
+    def loadStatistics(self):
+        """Return per-stage times and counts of the last loadPDF()
+        (cf. Progress.statistics(); empty stages if loaded from cache)."""
+        return self._loadProgress.statistics()
 
     def setSlides(self, slides):
+        with tracing.span('setSlides', 'gui', slides = len(slides)):
+            self._setSlides(slides)
+
+    def _setSlides(self, slides):
         self._slides = slides
         assert not self._renderers, "FIXME: delete old renderers / graphics items"
-        self._renderers = [slide_renderer.SlideRenderer(s, self._slideViewport) for s in slides]
-        for r in self._renderers:
-            r.setLinkHandler(self.followLink)
+        for slide in slides:
+            if slide.currentSubIndex() is None:
+                slide.setCurrentSubIndex(0)
+        self._renderers = [None] * len(slides)
         self._setupGrid()
         self.gotoFrame(0)
+        self._transitionPlanner.scheduleAll(slides)
+        self._navigationTrainer.setSlides(slides)
+        if self._memoryProfiler is not None:
+            self._memoryProfiler.checkpoint('setSlides', slides)
 
     def slides(self):
         return self._slides
 
+    def prefetcher(self):
+        """Return Prefetcher, e.g. for configuring look-ahead / memory budget."""
+        return self._prefetcher
+
+    def compositeStaticLayers(self):
+        return slide_renderer.COMPOSITE_STATIC_LAYERS
+
+    def setCompositeStaticLayers(self, onoff):
+        """Flatten patches that are present in all frames of a slide
+        into one pixmap per layer (cf. slide_renderer.StaticLayer),
+        which greatly reduces the number of items to be painted."""
+        slide_renderer.setCompositeStaticLayers(onoff)
+        for r in self.renderers():
+            r.resetItems()
+
+    def transitionPlanner(self):
+        """Return TransitionPlanner (cache of precomputed animations)."""
+        return self._transitionPlanner
+
+    def pixmapCache(self):
+        """Return (global) PixmapCache, e.g. for configuring the
+        budget or querying hit/miss statistics()."""
+        return pixmap_cache.cache
+
     def toggleNavigationFlag(self, patch):
         w, h = self.slideSize()
         if patch.flag(patch.FLAG_HEADER):
@@ -329,19 +633,31 @@ class PDFDecanter(QtCore.QObject):
         else:
             return False # cannot decide which flag it it
 
-        decomposer.add_navigation_example(patch)
+        # retraining, saving, and reclassification of all patches
+        # happens later (cf. NavigationTrainer):
+        self._navigationTrainer.addExample(patch)
 
-        if not os.path.exists(self._configDirectory):
-            os.mkdir(self._configDirectory)
-        decomposer.save_classifier(self._classifierFilename)
+        self._navigationFlagsChanged(
+            [frame for frame in self._slides.frames() if patch in frame.content()])
+        return True
 
-        decomposer.classify_navigation(self._slides.frames())
+    def navigationTrainer(self):
+        return self._navigationTrainer
 
-        if slide_renderer.FrameRenderer.DEBUG:
-            for r in self._renderers:
-                r.resetItems()
+    def _navigationFlagsChanged(self, frames):
+        """Update everything depending on the header / footer flags
+        of the patches in the given frames."""
+        self._slides.patchTable().updateFlags()
+        # header / footer are animated (and flattened) differently:
+        self._transitionPlanner.forgetFrames(frames)
+        slides = set(frame.slide() for frame in frames)
+        slide_renderer.clearStaticLayers(slides)
 
-        return True
+        if slide_renderer.FrameRenderer.DEBUG or slide_renderer.COMPOSITE_STATIC_LAYERS:
+            for slide in slides:
+                r = self.existingRenderer(slide.slideIndex())
+                if r is not None:
+                    r.resetItems()
 
     def snapshot(self, filename = 'snapshot.svg'):
         svg = qt.QtSvg.QSvgGenerator()
@@ -366,11 +682,15 @@ class PDFDecanter(QtCore.QObject):
             while slideLevel.max() > 0 and numpy.diff(numpy.nonzero(slideLevel)[0]).mean() < self._overviewColumnCount-1:
                 slideLevel[slideLevel == slideLevel.max()] = 0
 
+        self._slideRects = []
+        self._presentationBounds = QtCore.QRectF()
+
         x = y = col = rowHeight = 0
         lastLineBreak = previousWidth = 0
-        for i, renderer in enumerate(self._renderers):
+        for i, slide in enumerate(self._slides):
+            size = slide.sizeF()
             if col > 0:
-                x += PADDING_X * max(previousWidth, renderer.slide().sizeF().width())
+                x += PADDING_X * max(previousWidth, size.width())
             
             if slideLevel[i] and lastLineBreak < i - 1:
                 y += (1.0 + PADDING_Y + LINEBREAK_PADDING / slideLevel[i]) * rowHeight
@@ -378,14 +698,18 @@ class PDFDecanter(QtCore.QObject):
                 lastLineBreak = i
             elif col >= self._overviewColumnCount:
                 y += (1.0 + PADDING_Y) * rowHeight
-                x = INDENT_X * renderer.slide().sizeF().width() if lastLineBreak else 0
+                x = INDENT_X * size.width() if lastLineBreak else 0
                 col = rowHeight = 0
 
-            renderer.setPos(x, y)
+            rect = QtCore.QRectF(QtCore.QPointF(x, y), size)
+            self._slideRects.append(rect)
+            self._presentationBounds |= rect
+            if self._renderers[i] is not None:
+                self._renderers[i].setPos(rect.topLeft())
 
-            x += renderer.slide().sizeF().width()
-            previousWidth = renderer.slide().sizeF().width()
-            rowHeight = max(rowHeight, renderer.slide().sizeF().height())
+            x += size.width()
+            previousWidth = size.width()
+            rowHeight = max(rowHeight, size.height())
             col += 1
 
     def _updateCursor(self, animated):
@@ -403,8 +727,7 @@ class PDFDecanter(QtCore.QObject):
             self._cursor.setZValue(-10)
             self._cursorPos = None
 
-        r = QtCore.QRectF(p(self._currentRenderer().pos),
-                          self._currentRenderer().slide().sizeF())
+        r = QtCore.QRectF(self._slideRects[self._currentSlideIndex()])
 
         if not animated:
             self._cursor.setPos(r.topLeft())
@@ -445,11 +768,16 @@ class PDFDecanter(QtCore.QObject):
                                                       p(self._presentationItem.scale)))
         targetGeometry = QtCore.QRectF(pos, QtCore.QSizeF(scale, scale))
 
+        # create renderers for the target area before animating there:
+        self._updateVisibleRenderers(pos, scale)
+
         self._overviewAnimation = GeometryAnimation(self._presentationItem)
         self._overviewAnimation.setStartValue(currentGeometry)
         self._overviewAnimation.setEndValue(targetGeometry)
         self._overviewAnimation.setDuration(300)
         self._overviewAnimation.setEasingCurve(QtCore.QEasingCurve.InOutCubic)
+        self._overviewAnimation.valueChanged.connect(
+            lambda value: self._updateVisibleRenderers())
         self._overviewAnimation.finished.connect(self._resetOverviewAnimation)
 
         self._overviewAnimation.start()
@@ -461,6 +789,7 @@ class PDFDecanter(QtCore.QObject):
         self._overviewAnimation.stop()
         self._overviewAnimation = None
         self._adjustSlideViewport()
+        self._updateVisibleRenderers()
 
     def _overviewScale(self):
         """Return presentation scale that fills the view width with the overview."""
@@ -479,7 +808,7 @@ class PDFDecanter(QtCore.QObject):
         self._updateCursor(animated = False)
         self._cursorPos = None
 
-        for r in self._renderers:
+        for r in self.renderers():
             r.showCustomContent()
 
         self._animateOverviewGroup(self._overviewPosForCursor(), self._overviewScale())
@@ -487,6 +816,9 @@ class PDFDecanter(QtCore.QObject):
         self._inOverview = True
         self._adjustSlideViewport()
 
+    def currentFrameIndex(self):
+        return self._currentFrameIndex
+
     def _currentFrame(self):
         """Returns current Frame object (or None, in initialization phase)."""
         if self._currentFrameIndex is None:
@@ -505,7 +837,7 @@ class PDFDecanter(QtCore.QObject):
         slideIndex = self._currentSlideIndex()
         if slideIndex is None:
             return None
-        return self._renderers[slideIndex]
+        return self.renderer(slideIndex)
 
     def _maxpectScaleAndMargin(self, frameSize):
         """Returns presentation scale and margin (for one side,
@@ -522,17 +854,33 @@ class PDFDecanter(QtCore.QObject):
         """Identifies renderer responsible for the given frame and
         lets it show that frame.  If we're in overview mode, the scene
         is zoomed in to the above renderer."""
+        with tracing.span('gotoFrame', 'gui', frame = frameIndex):
+            self._gotoFrame(frameIndex)
+
+    def _gotoFrame(self, frameIndex):
 
         targetFrame = self._slides.frame(frameIndex)
-        renderer = self._renderers[targetFrame.slide().slideIndex()]
+        renderer = self.renderer(targetFrame.slide().slideIndex())
+        renderer.setThumbnailMode(False)
         renderer.uncover()
 
         animated = (not self._inOverview) \
             and self._currentFrameIndex is not None
 
         sourceFrame = self._currentRenderer().frame() if animated else None
-            
-        renderer.showFrame(targetFrame.subIndex(), animateFrom = sourceFrame)
+
+        # only movies of the current frame are played:
+        if self._currentFrameIndex is not None:
+            previous = self.existingRenderer(self._currentSlideIndex())
+            if previous is not None and previous is not renderer:
+                previous.setMoviesPlaying(False)
+        renderer.setMoviesPlaying(True)
+
+        animation = renderer.showFrame(targetFrame.subIndex(), animateFrom = sourceFrame)
+        if animation is not None and self._instrumentation is not None:
+            self._instrumentation.animationStarted(animation, frameIndex)
+        if animation is not None and tracing.isEnabled():
+            self._traceAnimation(animation, frameIndex)
 
         self._currentFrameIndex = frameIndex
 
@@ -542,10 +890,13 @@ class PDFDecanter(QtCore.QObject):
         if not self._inOverview:
             self._presentationItem.setPos(targetPresentationPos)
             self._adjustSlideViewport()
+            self._updateVisibleRenderers()
         else:
             self._inOverview = False
             self._animateOverviewGroup(targetPresentationPos, scale)
 
+        self._prefetcher.schedule(frameIndex)
+
     def _clearGotoSlide(self):
         self._gotoSlideIndex = None
 
@@ -562,7 +913,7 @@ class PDFDecanter(QtCore.QObject):
     def keyPressEvent(self, event):
         if event.text() == 'D':
             slide_renderer.toggleDebug()
-            for r in self._renderers:
+            for r in self.renderers():
                 r.resetItems()
         if event.text() == 'F':
             win = self._view.window()
@@ -591,8 +942,8 @@ class PDFDecanter(QtCore.QObject):
             self._view.window().close()
             event.accept()
         elif event.text() == 'P':
-            headerItems = sum((r.headerItems() for r in self._renderers), [])
-            footerItems = sum((r.footerItems() for r in self._renderers), [])
+            headerItems = sum((r.headerItems() for r in self.renderers()), [])
+            footerItems = sum((r.footerItems() for r in self.renderers()), [])
             if headerItems and footerItems:
                 onoff = headerItems[0].isVisible() + 2*footerItems[0].isVisible()
                 onoff = (onoff + 1) % 4
@@ -624,13 +975,23 @@ class PDFDecanter(QtCore.QObject):
                     self._updateCursor(animated = True)
                     event.accept()
             elif event.text() == 'U':
-                for renderer in self._renderers:
-                    renderer.uncoverAll()
+                for slideIndex, slide in enumerate(self._slides):
+                    renderer = self._renderers[slideIndex]
+                    if renderer is not None:
+                        renderer.uncoverAll()
+                    else:
+                        slide.setSeen(True)
+                        slide.setCurrentSubIndex(len(slide) - 1)
                 event.accept()
             elif event.text() == 'R':
-                for renderer in self._renderers:
-                    renderer.showFrame(0)
-                    renderer.uncover(False)
+                for slideIndex, slide in enumerate(self._slides):
+                    renderer = self._renderers[slideIndex]
+                    if renderer is not None:
+                        renderer.showFrame(0)
+                        renderer.uncover(False)
+                    else:
+                        slide.setCurrentSubIndex(0)
+                        slide.setSeen(False)
                 if self._currentFrameIndex:
                     self._currentFrameIndex = 0
                     self._updateCursor(animated = True)
@@ -655,9 +1016,11 @@ class PDFDecanter(QtCore.QObject):
                 self.showOverview()
                 event.accept()
 
+    def _slideSceneRect(self, slideIndex):
+        return self._slideViewport.mapRectToScene(self._slideRects[slideIndex])
+
     def _handleCursorKeyInOverview(self, event):
-        item = self._currentRenderer()
-        r = item.sceneBoundingRect()
+        r = self._slideSceneRect(self._currentSlideIndex())
         if self._cursorPos is None:
             self._cursorPos = r.center()
 
@@ -703,8 +1066,8 @@ class PDFDecanter(QtCore.QObject):
 
         # handle all cases, with naming of variables following downwards-case (see above)
         belowItems = []
-        for otherItem in self._renderers:
-            r2 = otherItem.sceneBoundingRect()
+        for otherIndex in range(len(self._slides)):
+            r2 = self._slideSceneRect(otherIndex)
             if ge(getTop(r2), bottom):
                 if mustOverlapInY:
                     if r2.bottom() < r.top() or r2.top() > r.bottom():
@@ -717,13 +1080,12 @@ class PDFDecanter(QtCore.QObject):
                 # x position)
                 belowItems.append((sortDirection * getY(c2),
                                    abs(getX(c2) - getX(self._cursorPos)),
-                                   otherItem))
+                                   otherIndex))
 
         if belowItems:
             belowItems.sort()
-            sortY, _, desiredSlide = belowItems[0]
+            sortY, _, desiredSlideIndex = belowItems[0]
             centerY = sortDirection * sortY
-            desiredSlideIndex = self._renderers.index(desiredSlide)
             setY(self._cursorPos, centerY)
         else:
             currentSlideIndex = self._currentSlideIndex()
@@ -0,0 +1,155 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Headless batch creation of cache files for many PDFs and slide
+sizes, using a pool of worker processes.  Run as
+
+  python -m pdf_decanter.batch [--sizes 1024x768,1280x960] [--jobs N] talk1.pdf talk2.pdf ...
+"""
+
+import os, sys, time
+import concurrent.futures
+from optparse import OptionParser
+from . import cache, page_cache, decomposer, tracing
+from .progress import Progress
+
+DEFAULT_SIZE = (1024, 768)
+
+
+def warm_cache(pdfFilename, slideSize, force = False, trace = False, pageCache = False):
+    """Decompose the given PDF and write its cache file for the given
+    slide size, unless the cache is current (and force is False).
+    If pageCache is True, the rendered pages are read from / written
+    to the page cache (cf. page_cache module).  Returns a summary dict
+    (cf. format_summary()), including the recorded 'traceEvents' if
+    trace is True.  Runs in the worker processes, so it must not use
+    any widgets."""
+    if trace:
+        tracing.disable() # (forget events inherited from the parent process)
+        tracing.enable()
+        try:
+            result = warm_cache(pdfFilename, slideSize, force, pageCache = pageCache)
+            result['traceEvents'] = tracing.events()
+            return result
+        finally:
+            tracing.disable()
+
+    pdfFilename = os.path.abspath(pdfFilename)
+    cacheFilename = cache.cacheFilename(pdfFilename, slideSize)
+    result = dict(pdf = pdfFilename, size = list(slideSize), cache = cacheFilename)
+
+    if not force and cache.isCurrent(cacheFilename, pdfFilename):
+        result['skipped'] = True
+        return result
+
+    startTime = time.perf_counter()
+    progress = Progress()
+    slides = decomposer.decompose_pdf(
+        pdfFilename, sizePX = slideSize, progress = progress,
+        pageCacheFilename = page_cache.pageCacheFilename(pdfFilename, slideSize) if pageCache else None)
+    cache.writeCache(cacheFilename, slides)
+
+    w, h = slideSize
+    rawCount = slides.frameCount() * w * h
+    result.update(skipped = False,
+                  time = time.perf_counter() - startTime,
+                  slides = slides.slideCount(),
+                  frames = slides.frameCount(),
+                  patches = len(slides.patchTable()),
+                  retained = float(slides.pixelCount()) / rawCount if rawCount else 0.0,
+                  stages = progress.stages())
+    return result
+
+
+def format_summary(result):
+    name = "%s (%dx%d)" % ((os.path.basename(result['pdf']), ) + tuple(result['size']))
+    if 'error' in result:
+        return "%s: FAILED (%s)" % (name, result['error'])
+    if result['skipped']:
+        return "%s: cache is current, skipped" % name
+    return "%s: %.1fs., %d slides, %d frames, %d patches, %.1f%% pixels retained" % (
+        name, result['time'], result['slides'], result['frames'],
+        result['patches'], 100.0 * result['retained'])
+
+
+def warm_caches(pdfFilenames, sizes = (DEFAULT_SIZE, ), jobs = None,
+                force = False, stream = None, pageCache = False):
+    """Create caches for all combinations of PDFs and sizes using
+    `jobs` worker processes (default: number of CPUs), writing one
+    summary line per finished deck to stream (default: sys.stdout).
+    Returns the list of summary dicts (in order of completion); failed
+    decks have an 'error' entry."""
+    stream = stream or sys.stdout
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = {}
+        for pdfFilename in pdfFilenames:
+            for size in sizes:
+                future = executor.submit(warm_cache, pdfFilename, tuple(size), force,
+                                         tracing.isEnabled(), pageCache)
+                futures[future] = (pdfFilename, size)
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                pdfFilename, size = futures[future]
+                result = dict(pdf = os.path.abspath(pdfFilename), size = list(size),
+                              error = str(e) or type(e).__name__)
+            tracing.addEvents(result.pop('traceEvents', ()))
+            results.append(result)
+            stream.write(format_summary(result) + "\n")
+            stream.flush()
+    return results
+
+
+def _parse_size(text):
+    w, h = text.split('x')
+    return int(w), int(h)
+
+def main(argv = None):
+    op = OptionParser(usage = "%prog [options] <filename.pdf>...")
+    op.add_option("--sizes", "-s", default = "%dx%d" % DEFAULT_SIZE,
+                  help = "comma-separated target rendering sizes in pixels (default: %default)")
+    op.add_option("--jobs", "-j", type = "int", default = None,
+                  help = "number of worker processes (default: number of CPUs)")
+    op.add_option("--trace", default = None, metavar = "FILENAME",
+                  help = "write Chrome trace of all workers to FILENAME")
+    op.add_option("--force", action = "store_true", default = False,
+                  help = "re-create caches even if they seem to be up-to-date")
+    op.add_option("--page-cache", action = "store_true", default = False,
+                  help = "also keep the rendered pages (for re-running the decomposition without rendering)")
+    options, args = op.parse_args(argv)
+    if not args:
+        op.error("no PDF files given")
+
+    sizes = [_parse_size(size) for size in options.sizes.split(',') if size]
+
+    if options.trace:
+        tracing.enable(options.trace)
+
+    startTime = time.perf_counter()
+    results = warm_caches(args, sizes, options.jobs, options.force,
+                          pageCache = options.page_cache)
+
+    failed = sum(1 for result in results if 'error' in result)
+    skipped = sum(1 for result in results if result.get('skipped'))
+    print("%d caches created, %d skipped, %d failed in %.1fs." % (
+        len(results) - failed - skipped, skipped, failed,
+        time.perf_counter() - startTime))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Benchmark of the decomposer stages on synthetic presentations
+(cf. synthetic_deck), reporting times, throughput and peak memory per
+stage for several slide sizes and page counts.  Also checks the
+start-up time for presenting a cached presentation against a budget
+(cf. startup_benchmark()).  Run as
+
+  python -m pdf_decanter.benchmark [--sizes 640x480,1024x768] [--pages 12,36] [--json FILENAME]
+
+or, for real presentations stored in page caches (cf. page_cache module), as
+
+  python -m pdf_decanter.benchmark --page-caches pdf_decanter_pages_talk1_1024x768.npz,...
+"""
+
+import os, sys, time, json, tempfile, subprocess, tracemalloc
+from optparse import OptionParser
+from . import cache, page_cache, decomposer, synthetic_deck
+from .presentation import Presentation
+from .progress import Progress
+
+SIZES = ((640, 480), (1024, 768), (1600, 1200))
+PAGE_COUNTS = (12, 36)
+FRAMES_PER_SLIDE = 3
+REPEAT = 3
+
+# maximum time (s) for starting python, importing pdf_decanter and
+# reading a cached presentation:
+STARTUP_BUDGET = 1.0
+# modules that must only be imported on the code paths needing them
+# (decomposition, classifier training, decomposition service, GL fallback):
+LAZY_MODULES = ('scipy', 'sklearn', 'pdfminer', 'popplerqt5', 'OpenGL',
+                'PyQt5.QtOpenGL', 'http.server', 'multiprocessing')
+# number of packages with the largest import times reported:
+TOP_PACKAGES = 10
+
+# stages in pipeline order (cf. decomposer.decompose_pages()):
+STAGES = ('create_frames', 'find_identical_rects', 'join_close_rects',
+          'extract_patches', 'classify_navigation', 'addFrames')
+
+
+def _join_close_rects(frames):
+    for frame in frames:
+        frame.content()[:] = decomposer.join_close_rects(frame)
+
+def _addFrames(frames):
+    Presentation().addFrames(frames)
+
+def _stage_functions(pages):
+    """Return list of (name, function) pairs; each function is called
+    with the result of the previous one (or None) and returns the
+    input for the next."""
+    def create_frames(_):
+        return decomposer.create_frames(pages)
+
+    def stage(function):
+        def run(frames):
+            function(frames)
+            return frames
+        return run
+
+    return list(zip(STAGES, (
+        create_frames,
+        stage(decomposer.find_identical_rects),
+        stage(_join_close_rects),
+        stage(decomposer.extract_patches),
+        stage(decomposer.classify_navigation),
+        stage(_addFrames))))
+
+
+def _run_pipeline(pages, measure):
+    result = None
+    for name, function in _stage_functions(pages):
+        result = measure(name, function, result)
+
+
+def benchmark(size, pageCount, repeat = REPEAT, memory = True, seed = 0):
+    """Benchmark all STAGES on pageCount synthetic pages of the given
+    size (cf. benchmark_pages())."""
+    slideCount = -(-pageCount // FRAMES_PER_SLIDE)
+    pages = list(synthetic_deck.generate_pages(
+        slideCount, FRAMES_PER_SLIDE, size, seed))[:pageCount]
+    return benchmark_pages(pages, repeat, memory)
+
+
+def benchmark_page_cache(pageCacheFilename, repeat = REPEAT, memory = True):
+    """Benchmark all STAGES on the pages stored in the given page
+    cache (cf. benchmark_pages())."""
+    with page_cache.PageCache(pageCacheFilename) as cached:
+        pages = list(cached.pages())
+    result = benchmark_pages(pages, repeat, memory)
+    result['pageCache'] = pageCacheFilename
+    return result
+
+
+def benchmark_pages(pages, repeat = REPEAT, memory = True):
+    """Benchmark all STAGES on the given list of pages (arrays of
+    equal size).  Returns a JSON-serializable dict with per-stage
+    'wall' and 'cpu' times (best of repeat runs), 'pagesPerSecond'
+    and 'megapixelsPerSecond' (based on wall time) and - if memory is
+    True - 'peakMemory', i.e. the peak of the memory allocated during
+    the stage (traced with tracemalloc in an extra run; this includes
+    numpy arrays but not Qt's image data)."""
+    pageCount = len(pages)
+    h, w = pages[0].shape[:2]
+    size = (w, h)
+
+    times = dict((name, []) for name in STAGES)
+    def measure_time(name, function, arg):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = function(arg)
+        times[name].append((time.perf_counter() - wall, time.process_time() - cpu))
+        return result
+
+    for i in range(repeat):
+        _run_pipeline(pages, measure_time)
+
+    peaks = {}
+    def measure_memory(name, function, arg):
+        tracemalloc.start()
+        try:
+            return function(arg)
+        finally:
+            peaks[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    if memory:
+        _run_pipeline(pages, measure_memory)
+
+    megapixels = pageCount * size[0] * size[1] / 1e6
+    stages = {}
+    for name in STAGES:
+        wall = min(wall for wall, cpu in times[name])
+        stats = dict(wall = wall, cpu = min(cpu for wall, cpu in times[name]),
+                     pagesPerSecond = pageCount / wall if wall else None,
+                     megapixelsPerSecond = megapixels / wall if wall else None)
+        if name in peaks:
+            stats['peakMemory'] = peaks[name]
+        stages[name] = stats
+
+    return dict(size = list(size), pages = pageCount, repeat = repeat,
+                stages = stages)
+
+
+_STARTUP_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import pdf_decanter
+imported = time.perf_counter()
+if sys.argv[1]:
+    pdf_decanter.cache.readCache(sys.argv[1])
+json.dump(dict(importTime = imported - start,
+               cacheTime = time.perf_counter() - imported,
+               eager = [name for name in sys.argv[2:] if name in sys.modules]),
+          sys.stdout)
+"""
+
+def _package_import_times(importtime):
+    """Sum up the self times from python's -X importtime output per
+    top-level package; returns dict mapping names to seconds."""
+    result = {}
+    for line in importtime.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        selfTime, cumulative, name = line[len('import time:'):].split('|')
+        if not selfTime.strip().isdigit():
+            continue # (header line)
+        package = name.strip().split('.')[0]
+        result[package] = result.get(package, 0.0) + int(selfTime) * 1e-6
+    return result
+
+
+def startup_benchmark(cacheFilename = None, repeat = REPEAT):
+    """Measure start-up time in fresh interpreters: importing
+    pdf_decanter and reading the given cache file (if any).  Returns a
+    JSON-serializable dict with the best 'total' (including the
+    interpreter start), 'importTime' and 'cacheTime' (s), the import
+    times of the TOP_PACKAGES slowest 'packages' (from -X importtime)
+    and the list of LAZY_MODULES that were imported ('eager')."""
+    env = dict(os.environ)
+    packageParent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, (packageParent, env.get('PYTHONPATH'))))
+
+    runs = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        child = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT,
+             cacheFilename or ''] + list(LAZY_MODULES),
+            env = env, stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+            universal_newlines = True, check = True)
+        total = time.perf_counter() - start
+        run = json.loads(child.stdout)
+        run.update(total = total, packages = _package_import_times(child.stderr))
+        runs.append(run)
+
+    best = min(runs, key = lambda run: run['total'])
+    packages = sorted(best['packages'].items(), key = lambda item: -item[1])
+    return dict(total = best['total'], importTime = best['importTime'],
+                cacheTime = best['cacheTime'], repeat = repeat,
+                packages = dict(packages[:TOP_PACKAGES]),
+                eager = sorted(set(name for run in runs for name in run['eager'])))
+
+
+def write_synthetic_cache(cacheFilename, size = (1024, 768), pageCount = PAGE_COUNTS[-1]):
+    """Decompose a synthetic presentation and write it to the given
+    cache file (e.g. for startup_benchmark())."""
+    slideCount = -(-pageCount // FRAMES_PER_SLIDE)
+    pages = list(synthetic_deck.generate_pages(slideCount, FRAMES_PER_SLIDE, size))[:pageCount]
+    slides = decomposer.decompose_pages(pages, progress = Progress())
+    cache.writeCache(cacheFilename, slides)
+
+
+def check_startup(result, budget = STARTUP_BUDGET, stream = None):
+    """Write startup_benchmark() result to stream (default:
+    sys.stdout); returns whether it is within budget and no
+    LAZY_MODULES were imported."""
+    stream = stream or sys.stdout
+    stream.write("start-up: %.3fs. total (budget %.3fs.), %.3fs. import, %.3fs. reading cache\n" % (
+        result['total'], budget, result['importTime'], result['cacheTime']))
+    for package, seconds in sorted(result['packages'].items(), key = lambda item: -item[1]):
+        stream.write("  %-20s %8.3fs.\n" % (package, seconds))
+    ok = result['total'] <= budget
+    if not ok:
+        stream.write("FAILED: start-up exceeds budget\n")
+    if result['eager']:
+        stream.write("FAILED: imported on start-up: %s\n" % ", ".join(result['eager']))
+    stream.flush()
+    return ok and not result['eager']
+
+
+def run(sizes = SIZES, pageCounts = PAGE_COUNTS, repeat = REPEAT,
+        memory = True, stream = None):
+    """Run benchmark() for all combinations of sizes and pageCounts,
+    writing a table to stream (default: sys.stdout) and returning the
+    list of results."""
+    stream = stream or sys.stdout
+    results = []
+    for size in sizes:
+        for pageCount in pageCounts:
+            result = benchmark(size, pageCount, repeat, memory)
+            results.append(result)
+            _write_result("%dx%d, %d pages" % (size[0], size[1], pageCount), result, stream)
+    return results
+
+
+def run_page_caches(pageCacheFilenames, repeat = REPEAT, memory = True, stream = None):
+    """Like run(), but for the presentations in the given page caches."""
+    stream = stream or sys.stdout
+    results = []
+    for pageCacheFilename in pageCacheFilenames:
+        result = benchmark_page_cache(pageCacheFilename, repeat, memory)
+        results.append(result)
+        _write_result("%s (%dx%d, %d pages)" % (
+            (pageCacheFilename, ) + tuple(result['size']) + (result['pages'], )),
+                      result, stream)
+    return results
+
+
+def _write_result(title, result, stream):
+    stream.write("%s:\n" % title)
+    for name in STAGES:
+        stats = result['stages'][name]
+        stream.write("  %-20s %8.3fs. %8.1f pages/s %8.1f MP/s%s\n" % (
+            name, stats['wall'], stats['pagesPerSecond'] or 0,
+            stats['megapixelsPerSecond'] or 0,
+            " %8.1f MB peak" % (stats['peakMemory'] / 1024.0**2)
+            if 'peakMemory' in stats else ""))
+    stream.flush()
+
+
+def _parse_list(text, parse):
+    return [parse(item) for item in text.split(',') if item]
+
+def main(argv = None):
+    op = OptionParser(usage = "%prog [options]")
+    op.add_option("--sizes", default = ",".join("%dx%d" % size for size in SIZES),
+                  help = "comma-separated slide sizes (default: %default)")
+    op.add_option("--pages", default = ",".join(map(str, PAGE_COUNTS)),
+                  help = "comma-separated page counts (default: %default)")
+    op.add_option("--repeat", type = "int", default = REPEAT,
+                  help = "number of timed runs, best is reported (default: %default)")
+    op.add_option("--no-memory", action = "store_false", dest = "memory", default = True,
+                  help = "skip the (slower) peak memory measurement run")
+    op.add_option("--page-caches", default = None, metavar = "FILENAMES",
+                  help = "comma-separated page cache files to benchmark instead of synthetic presentations")
+    op.add_option("--startup-budget", type = "float", default = STARTUP_BUDGET, metavar = "SECONDS",
+                  help = "maximum start-up time with a cached presentation (default: %default)")
+    op.add_option("--startup-only", action = "store_true", default = False,
+                  help = "only run the start-up benchmark")
+    op.add_option("--json", default = None, metavar = "FILENAME",
+                  help = "write results to JSON file (e.g. for regression tracking)")
+    options, args = op.parse_args(argv)
+
+    sizes = _parse_list(options.sizes, lambda size: tuple(map(int, size.split('x'))))
+    pageCounts = _parse_list(options.pages, int)
+
+    from .dynqt import QtGui
+    app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication(sys.argv[:1])
+
+    tempDir = tempfile.mkdtemp()
+    cacheFilename = os.path.join(tempDir, 'startup_cache.bz2')
+    try:
+        write_synthetic_cache(cacheFilename)
+        startup = startup_benchmark(cacheFilename, options.repeat)
+    finally:
+        if os.path.exists(cacheFilename):
+            os.remove(cacheFilename)
+        os.rmdir(tempDir)
+    ok = check_startup(startup, options.startup_budget)
+
+    results = []
+    if options.startup_only:
+        pass
+    elif options.page_caches:
+        results = run_page_caches(_parse_list(options.page_caches, str),
+                                  options.repeat, options.memory)
+    else:
+        results = run(sizes, pageCounts, options.repeat, options.memory)
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(dict(startup = startup, decomposition = results), f, indent = 1)
+
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
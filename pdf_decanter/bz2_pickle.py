@@ -27,9 +27,9 @@ def unpickle(filename):
 def iter_unpickle(filename):
     '''Uncompress and unpickle objects from the given file (generator function).'''
     with bz2.BZ2File(filename) as f:
-        up = pkl.Unpickler(f)
         while True:
+            # (one Unpickler per object, since pickle() uses separate memos)
             try:
-                yield up.load()
+                yield pkl.load(f)
             except EOFError:
                 break
@@ -0,0 +1,58 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Cache files storing decomposed presentations (plus precomputed
+transition plans) next to the PDF files."""
+
+import os
+from . import bz2_pickle, transitions, tracing
+
+
+def cacheFilename(pdfFilename, slideSize):
+    """Return default cache filename for the given PDF and slide size."""
+    dirname, basename = os.path.split(os.path.abspath(pdfFilename))
+    w, h = slideSize
+    return os.path.join(
+        dirname, "pdf_decanter_cache_%s_%dx%d.bz2" % (
+            os.path.splitext(basename)[0], w, h))
+
+
+def isCurrent(cacheFilename, pdfFilename):
+    """Return whether the cache file exists and is not older than the PDF."""
+    return (os.path.exists(cacheFilename) and
+            os.path.getmtime(cacheFilename) >= os.path.getmtime(pdfFilename))
+
+
+def readCache(cacheFilename):
+    """Return (slides, transitionPlans) from the given cache file;
+    transitionPlans (cf. TransitionPlanner.exportState()) is None for
+    caches written without them."""
+    with tracing.span('read cache', 'cache', filename = cacheFilename):
+        cached = bz2_pickle.iter_unpickle(cacheFilename)
+        slides = next(cached)
+        # (optional) precomputed transition plans:
+        transitionPlans = next(cached, None)
+    return slides, transitionPlans
+
+
+def writeCache(cacheFilename, slides, transitionPlanner = None):
+    """Write slides to the given cache file, together with plans for
+    all transitions between consecutive frames (computed using the
+    given TransitionPlanner, or a temporary one)."""
+    if transitionPlanner is None:
+        transitionPlanner = transitions.TransitionPlanner()
+    with tracing.span('plan transitions', 'cache'):
+        transitionPlanner.computeAll(slides)
+    with tracing.span('write cache', 'cache', filename = cacheFilename):
+        bz2_pickle.pickle(cacheFilename, slides, transitionPlanner.exportState(slides))
@@ -15,10 +15,11 @@
 """Module containing code for decomposing frames into page components,
 i.e. creating a Presentation instance from a sequence of images."""
 
-import os, sys, time, hashlib, numpy
+import os, sys, hashlib, numpy
 from .dynqt import QtCore, QtGui, qimage2ndarray
-from . import pdf_infos, pdf_renderer, bz2_pickle
+from . import pdf_infos, page_cache, bz2_pickle
 from . import alpha
+from .progress import Progress, ConsoleReporter
 
 from .presentation import ObjectWithFlags, Patch, Frame, Presentation
 
@@ -283,28 +284,23 @@ class BackgroundDetection(object):
         return numpy.choose(maxpos[...,None], self._weighted_occurrences['color'])
 
 
-def detectBackground(raw_frames, useFrames = 15):
+def detectBackground(raw_frames, useFrames = 15, progress = None):
+    progress = progress or Progress()
     bgd = BackgroundDetection()
 
     if len(raw_frames) > useFrames:
-        inc = len(raw_frames)/useFrames
+        inc = len(raw_frames) // useFrames
         end = 1 + inc * useFrames
         bgd.include_frame_indices(list(range(len(raw_frames)))[1:end:inc])
     else:
         useFrames = len(raw_frames)
 
-    t = time.clock()
-    for i in range(len(raw_frames)):
-        sys.stdout.write("\ranalyzing background sample frame %d / %d..." % (i + 1, len(raw_frames)))
-        sys.stdout.flush()
-        bgd.add_frame(raw_frames[i])
-    t = time.clock() - t
-    sys.stdout.write("\ranalyzing %d background sample frames took %.3gs.\n" % (useFrames, t))
-    
-    sys.stdout.write("\restimating background from samples...         ")
-    sys.stdout.flush()
-    canvas = bgd.current_estimate()
-    sys.stdout.write("\restimating background from samples... done.\n")
+    with progress.stage('background'):
+        for i in range(len(raw_frames)):
+            progress.update('analyzing background sample frame', i + 1, len(raw_frames))
+            bgd.add_frame(raw_frames[i])
+        canvas = bgd.current_estimate()
+    progress.count('backgroundSamples', useFrames)
     return canvas
 
 
@@ -388,13 +384,24 @@ def detect_background_color(rgb_or_rgba, rect = None, outer_color = None):
     return most_common_color(rgb_or_rgba[horizontal_lines,x1])
 
 
+def _ndimage():
+    # imported on first use, since it takes longer than all other
+    # imports needed for presenting a cached presentation:
+    try:
+        import scipy.ndimage
+    except ImportError:
+        raise RuntimeError("Could not import scipy.ndimage; frame decomposition not possible.")
+    return scipy.ndimage
+
+
 def changed_rects_ndimage(changed, original):
-    labelImage, cnt = scipy.ndimage.measurements.label(changed)
+    ndimage = _ndimage()
+    labelImage, cnt = ndimage.measurements.label(changed)
     alpha = numpy.empty(original.shape[:2], dtype = numpy.uint8)
     alpha[:] = 0
     
     result = []
-    for i, (y, x) in enumerate(scipy.ndimage.measurements.find_objects(labelImage, cnt)):
+    for i, (y, x) in enumerate(ndimage.measurements.find_objects(labelImage, cnt)):
         rect = QtCore.QRect(x.start, y.start,
                             x.stop - x.start, y.stop - y.start)
         labels = [i + 1]
@@ -403,22 +410,34 @@ def changed_rects_ndimage(changed, original):
     return result
 
 
-def create_frames(raw_pages):
+def create_frames(raw_pages, progress = None):
     """Create preliminary Frames from raw pages.  The Frame contents
-    will not be Patch instances yet, but ChangedRects."""
+    will not be Patch instances yet, but ChangedRects.  Times the
+    'render' (i.e. consuming raw_pages), 'background', 'labelling'
+    and 'alpha' stages (cf. progress module)."""
 
-    raw_pages = list(raw_pages)
+    progress = progress or Progress()
+
+    with progress.stage('render'):
+        raw_pages = list(raw_pages)
+    progress.count('pages', len(raw_pages))
+    progress.count('pageBytes', sum(page.nbytes for page in raw_pages))
 
     result = []
-    for page in raw_pages:
-        bgColor = detect_background_color(page)
+    for i, page in enumerate(raw_pages):
+        progress.update('analyzing page', i + 1, len(raw_pages))
+
+        with progress.stage('background'):
+            bgColor = detect_background_color(page)
+            changed = (page != bgColor).any(-1)
 
-        changed = (page != bgColor).any(-1)
-        rects = changed_rects_ndimage(changed, page)
+        with progress.stage('labelling'):
+            rects = changed_rects_ndimage(changed, page)
 
-        for r in rects:
-            #if not r.flag(Patch.FLAG_RECT):
-            r.detectAlpha(bgColor = bgColor)
+        with progress.stage('alpha'):
+            for r in rects:
+                #if not r.flag(Patch.FLAG_RECT):
+                r.detectAlpha(bgColor = bgColor)
         
         h, w = page.shape[:2]
         r, g, b = bgColor
@@ -431,14 +450,6 @@ def create_frames(raw_pages):
     return result
 
 
-try:
-    import scipy.ndimage
-except ImportError:
-    def create_frames_not_possible(raw_pages):
-        raise RuntimeError("Could not import scipy.ndimage; frame decomposition not possible.")
-    create_frames = create_frames_not_possible
-
-
 def find_identical_rects(frames):
     """Unify ChangedRects with identical key()s."""
     
@@ -494,36 +505,74 @@ def extract_patches(frames):
         content[:] = patches
 
 
-def decompose_pages(pages, infos = None):
-    frames = create_frames(pages)
+def decompose_pages(pages, infos = None, progress = None):
+    """Create Presentation from the given pages (RGB arrays).  Stage
+    times, counts, and progress are reported via the given Progress
+    instance (default: console output)."""
+    if progress is None:
+        progress = Progress(ConsoleReporter())
 
-    rawPatchCount, uniquePatchCount = find_identical_rects(frames)
+    frames = create_frames(pages, progress)
 
-    for frame in frames:
-        frame.content()[:] = join_close_rects(frame)
-        #content[:] = join_compatible_rects(content)
+    with progress.stage('dedup'):
+        rawPatchCount, uniquePatchCount = find_identical_rects(frames)
 
-    extract_patches(frames)
+    with progress.stage('merge'):
+        for frame in frames:
+            frame.content()[:] = join_close_rects(frame)
+            #content[:] = join_compatible_rects(content)
+
+    with progress.stage('extract'):
+        extract_patches(frames)
+
+    with progress.stage('classify'):
+        classify_navigation(frames)
 
-    classify_navigation(frames)
-    
     # could alternatively be done before filtering duplicates, but this is faster:
-    result = Presentation(infos)
-    result.addFrames(frames)
-
-    monochromePatchCount = sum(bool(patch.flag(Patch.FLAG_MONOCHROME))
-                               for patch in result.patchSet())
-    monochromeColorCount = len(set(patch.color().rgb()
-                                   for patch in result.patchSet()
-                                   if patch.flag(Patch.FLAG_MONOCHROME)))
-        
-    print("%d slides, %d frames, %d distinct patches (of %d) before merging, %d monochrome (%d colors)" % (
-        result.slideCount(), result.frameCount(),
-        uniquePatchCount, rawPatchCount, monochromePatchCount, monochromeColorCount))
+    with progress.stage('group'):
+        result = Presentation(infos)
+        result.addFrames(frames)
+
+    monochromePatchCount, monochromeColorCount = \
+        result.patchTable().monochromeStatistics()
+
+    for name, value in (('slides', result.slideCount()),
+                        ('frames', result.frameCount()),
+                        ('rawPatches', rawPatchCount),
+                        ('uniquePatches', uniquePatchCount),
+                        ('patches', len(result.patchTable())),
+                        ('monochromePatches', monochromePatchCount),
+                        ('monochromeColors', monochromeColorCount)):
+        progress.count(name, value)
+    progress.done()
+
     return result
 
 
-def decompose_pdf(pdfFilename, sizePX):
+def _read_page_cache(cached, progress):
+    with cached:
+        for page in cached.pages(progress):
+            yield page
+
+
+def render_pages(pdfFilename, sizePX, pageCacheFilename = None, progress = None):
+    """Return (pages, infos) for the given PDF, where pages is a
+    generator rendering the pages on demand.  If pageCacheFilename
+    is given, the pages are read from that page cache if it is
+    current (cf. page_cache module), or written to it while
+    rendering."""
+    if pageCacheFilename and page_cache.isCurrent(pageCacheFilename, pdfFilename):
+        try:
+            cached = page_cache.PageCache(pageCacheFilename)
+        except (IOError, OSError, ValueError) as e:
+            sys.stderr.write("%s reading page cache: %s\n" % (type(e).__name__, e))
+        else:
+            if cached.parameters().get('size') == list(sizePX):
+                return _read_page_cache(cached, progress), cached.infos()
+            cached.close()
+
+    from . import pdf_renderer # (imports poppler, or checks for pdftoppm)
+
     infos = pdf_infos.PDFInfos.create(pdfFilename)
 
     # if infos:
@@ -531,9 +580,34 @@ def decompose_pdf(pdfFilename, sizePX):
     #     dpi = self.slideSize()[0] / pageWidthInches
 
     pages = pdf_renderer.renderAllPages(pdfFilename, sizePX = sizePX,
-                                        pageCount = infos and infos.pageCount())
+                                        pageCount = infos and infos.pageCount(),
+                                        progress = progress)
+
+    if pageCacheFilename:
+        pages = page_cache.recordPages(
+            pageCacheFilename, pages, infos, pdf = os.path.basename(pdfFilename),
+            size = list(sizePX), renderer = pdf_renderer.renderAllPages.__module__)
+
+    return pages, infos
+
+
+def decompose_pdf(pdfFilename, sizePX, progress = None, pageCacheFilename = None):
+    if progress is None:
+        progress = Progress(ConsoleReporter())
+
+    pages, infos = render_pages(pdfFilename, sizePX, pageCacheFilename, progress)
     
-    return decompose_pages(pages, infos)
+    return decompose_pages(pages, infos, progress)
+
+
+def decompose_page_cache(pageCacheFilename, progress = None):
+    """Decompose the pages stored in the given page cache file (cf.
+    page_cache module), without rendering the PDF."""
+    if progress is None:
+        progress = Progress(ConsoleReporter())
+
+    cached = page_cache.PageCache(pageCacheFilename)
+    return decompose_pages(_read_page_cache(cached, progress), cached.infos(), progress)
 
 # --------------------------------------------------------------------
 
@@ -546,40 +620,120 @@ def _classificationKey(patch):
             patch.occurrenceCount())
 
 
-def add_navigation_example(patch):
-    navigation_examples[_classificationKey(patch)] = (
+def record_navigation_example(patch):
+    """Store the current header / footer flags of the given patch as
+    training example (without retraining); returns its key."""
+    _load_pending_classifier()
+    key = _classificationKey(patch)
+    navigation_examples[key] = (
       patch.flags() & (patch.FLAG_HEADER | patch.FLAG_FOOTER))
+    return key
 
+
+def add_navigation_example(patch):
+    record_navigation_example(patch)
     train_navigation_classifier()
 
 
+class NearestExampleClassifier(object):
+    """Lightweight alternative to scikit-learn's RandomForestClassifier
+    (same fit() / predict() interface) that predicts the class of the
+    nearest training example.  Examples can be added incrementally
+    (addExample()), without retraining."""
+
+    def __init__(self):
+        self._features = numpy.zeros((0, 5))
+        self._classes = numpy.zeros(0, int)
+
+    def __len__(self):
+        return len(self._classes)
+
+    def fit(self, features, classes):
+        self._features = numpy.array(features, float).reshape(-1, 5)
+        self._classes = numpy.array(classes, int)
+        return self
+
+    def addExample(self, features, klass):
+        """Add example, replacing any previous one with the same features."""
+        features = numpy.asarray(features, float)
+        same = numpy.all(self._features == features, axis = 1)
+        if same.any():
+            self._classes = numpy.where(same, klass, self._classes)
+        else:
+            self._features = numpy.vstack((self._features, features))
+            self._classes = numpy.append(self._classes, klass)
+
+    def predict(self, features):
+        features = numpy.asarray(features, float)
+        if not len(self._classes):
+            return numpy.zeros(len(features), int)
+        distances = ((features[:,None,:] - self._features[None]) ** 2).sum(-1)
+        return self._classes[distances.argmin(1)]
+
+
+def fit_navigation_classifier(examples, incremental = False):
+    """Return new classifier trained with the given examples (dict
+    mapping classification keys to flags, cf. navigation_examples).
+    Uses a RandomForestClassifier unless incremental is True (then a
+    NearestExampleClassifier)."""
+    if incremental:
+        model = NearestExampleClassifier()
+    else:
+        from sklearn.ensemble import RandomForestClassifier
+        model = RandomForestClassifier()
+    model.fit(list(examples.keys()), list(examples.values()))
+    return model
+
+
 classifier = None
 
 def train_navigation_classifier():
     global classifier
+    _load_pending_classifier()
+    classifier = fit_navigation_classifier(navigation_examples)
 
-    from sklearn.ensemble import RandomForestClassifier
-    rf = RandomForestClassifier()
 
-    rf.fit(list(navigation_examples.keys()), list(navigation_examples.values()))
-    
-    classifier = rf
+def unique_patches(frames):
+    """Return list of the distinct patches of the given frames (in
+    order of first occurrence) and array of the corresponding frame
+    heights."""
+    patches, frameHeights = [], []
+    seen = set()
+    for frame in frames:
+        frameHeight = frame.sizeF().height()
+        for patch in frame.content():
+            if patch not in seen:
+                seen.add(patch)
+                patches.append(patch)
+                frameHeights.append(frameHeight)
+    return patches, numpy.array(frameHeights)
+
+
+def predict_navigation_flags(patches, frameHeights):
+    """Return boolean arrays (isHeader, isFooter) for the given
+    patches (classified with a single predict() call)."""
+    features = numpy.array([_classificationKey(patch) for patch in patches], float)
+    klass = classifier.predict(features)
+
+    top, bottom = features[:,2], features[:,3]
+    isHeader = (klass == Patch.FLAG_HEADER) & (bottom < frameHeights / 2)
+    isFooter = (klass == Patch.FLAG_FOOTER) & (top > frameHeights / 2)
+    return isHeader, isFooter
 
 
 def classify_navigation(frames):
+    _load_pending_classifier()
     if classifier is None:
         return _classify_navigation_fallback(frames)
 
-    for frame in frames:
-        frameWidth  = frame.sizeF().width()
-        frameHeight = frame.sizeF().height()
-        for patch in frame.content():
-            key = _classificationKey(patch)
-
-            klass = classifier.predict([key])
-            top, bottom = key[2:4]
-            patch.setFlag(Patch.FLAG_HEADER, (klass == Patch.FLAG_HEADER) and (bottom < frameHeight / 2))
-            patch.setFlag(Patch.FLAG_FOOTER, (klass == Patch.FLAG_FOOTER) and (top > frameHeight / 2))
+    # classify every distinct patch once:
+    patches, frameHeights = unique_patches(frames)
+    if not patches:
+        return
+    isHeader, isFooter = predict_navigation_flags(patches, frameHeights)
+    for patch, header, footer in zip(patches, isHeader, isFooter):
+        patch.setFlag(Patch.FLAG_HEADER, bool(header))
+        patch.setFlag(Patch.FLAG_FOOTER, bool(footer))
             
 
 def _classify_navigation_fallback(frames):
@@ -615,16 +769,34 @@ def _classify_navigation_fallback(frames):
             patch.setFlag(Patch.FLAG_FOOTER)
 
             
-def save_classifier(basename):
+def save_classifier(basename, examples = None, model = None):
+    """Save navigation examples and classifier (default: the current
+    module-level ones).  Does not touch the module-level ones if
+    both are given (e.g. from a NavigationTrainer's worker thread)."""
+    if examples is None or model is None:
+        _load_pending_classifier()
     filename = basename + '.pkl.bz2'
     return bz2_pickle.pickle(
-        filename, navigation_examples, classifier)
+        filename,
+        navigation_examples if examples is None else examples,
+        classifier if model is None else model)
+
 
+_pendingClassifierFilename = None
 
 def load_classifier(basename):
-    global classifier, navigation_examples
-    filename = basename + '.pkl.bz2'
-    if os.path.exists(filename):
+    """Load navigation examples and classifier from the given file
+    when they are needed for the first time (unpickling a
+    RandomForestClassifier imports scikit-learn, which is not needed
+    for presenting cached presentations)."""
+    global _pendingClassifierFilename
+    _pendingClassifierFilename = basename + '.pkl.bz2'
+
+
+def _load_pending_classifier():
+    global classifier, navigation_examples, _pendingClassifierFilename
+    filename, _pendingClassifierFilename = _pendingClassifierFilename, None
+    if filename is not None and os.path.exists(filename):
         up = bz2_pickle.iter_unpickle(filename)
         try:
             navigation_examples = next(up)
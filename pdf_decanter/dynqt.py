@@ -101,7 +101,13 @@ qt = QtDriver()
 QtCore = qt.QtCore
 QtGui = qt.QtGui
 QtWidgets = qt.QtWidgets
-QtOpenGL = qt.QtOpenGL
 getprop = qt.getprop()
 
+def __getattr__(name):
+	# QtOpenGL is only needed for the QGLWidget fallback, so it is
+	# imported on first access:
+	if name == 'QtOpenGL':
+		return qt.QtOpenGL
+	raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 import qimage2ndarray
@@ -0,0 +1,220 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Frame-time and input-latency measurements for the presentation view."""
+
+import collections, json, time
+from .dynqt import QtCore, QtWidgets
+from . import pixmap_cache
+
+# number of painted frames kept in Instrumentation.frames():
+FRAME_HISTORY = 1000
+# frame intervals (ms) above this count as dropped frames (60Hz):
+FRAME_BUDGET = 1000.0 / 60
+# update interval (ms) of the overlay:
+OVERLAY_INTERVAL = 500
+
+
+class Instrumentation(QtCore.QObject):
+    """Collects (cf. PDFDecanter.enableInstrumentation()):
+
+    * input latencies, i.e. the times from keyPressEvent() to the
+      next paint of the view (inputs()),
+    * the frame intervals (paint to paint) during each transition
+      animation (animations()), and
+    * pixmap counts for each painted frame (frames()); the number
+      of scene items is only counted for summary() (i.e. when the
+      overlay or log is updated).
+
+    Paint times are taken when the view's viewport receives its
+    paint event (i.e. right before painting).  Optionally, a summary
+    is shown in an on-screen overlay, and all records can be written
+    to a JSON log (e.g. when the application quits)."""
+
+    def __init__(self, decanter, overlay = False, logFilename = None):
+        QtCore.QObject.__init__(self, decanter)
+        self._decanter = decanter
+
+        self._startTime = time.perf_counter()
+        self._lastPaint = None
+        self._pendingInput = None
+        self._animation = None
+
+        self._inputs = []
+        self._animations = []
+        self._frames = collections.deque(maxlen = FRAME_HISTORY)
+
+        self._overlay = None
+        self._overlayTimer = None
+        self.setOverlayVisible(overlay)
+
+        self._logFilename = logFilename
+        if logFilename:
+            QtCore.QCoreApplication.instance().aboutToQuit.connect(self.writeLog)
+
+    def _now(self):
+        """Return milliseconds since creation."""
+        return (time.perf_counter() - self._startTime) * 1000
+
+    def inputStarted(self, key):
+        """Called at the beginning of PDFDecanter.keyPressEvent()."""
+        self._pendingInput = dict(
+            key = key, time = self._now(),
+            frameIndex = self._decanter.currentFrameIndex())
+
+    def inputHandled(self):
+        """Called at the end of PDFDecanter.keyPressEvent()."""
+        if self._pendingInput is not None:
+            self._pendingInput['handling'] = self._now() - self._pendingInput['time']
+            self._pendingInput['targetFrameIndex'] = self._decanter.currentFrameIndex()
+
+    def animationStarted(self, animation, frameIndex):
+        """Track frame intervals until the given (transition)
+        animation stops.  Overlay updates are paused meanwhile, in
+        order not to measure their repaints."""
+        self._finishAnimation()
+        if self._overlayTimer is not None:
+            self._overlayTimer.stop()
+        record = self._animation = dict(
+            frameIndex = frameIndex, start = self._now(),
+            duration = animation.totalDuration(), paints = [])
+
+        def stateChanged(newState, oldState):
+            if newState == QtCore.QAbstractAnimation.Stopped:
+                animation.stateChanged.disconnect(stateChanged)
+                self._finishAnimation(record)
+        animation.stateChanged.connect(stateChanged)
+
+    def _finishAnimation(self, record = None):
+        """Finish the record of the current animation (if it is the
+        given one, which may have been finished already)."""
+        if record is None:
+            record = self._animation
+        if record is None or record is not self._animation:
+            return
+        self._animation = None
+        if self.overlayVisible():
+            self._updateOverlay()
+            self._overlayTimer.start()
+
+        paints = record.pop('paints')
+        intervals = [b - a for a, b in zip(paints[:-1], paints[1:])]
+        record['end'] = self._now()
+        record['frames'] = len(paints)
+        record['intervals'] = intervals
+        record['maxInterval'] = max(intervals) if intervals else None
+        record['meanInterval'] = sum(intervals) / len(intervals) if intervals else None
+        # (an interval of n frame budgets means that n-1 frames were missed)
+        record['droppedFrames'] = sum(int(round(interval / FRAME_BUDGET)) - 1
+                                      for interval in intervals if interval > 1.5 * FRAME_BUDGET)
+        self._animations.append(record)
+
+    def framePainted(self):
+        """Called when the view is about to be painted."""
+        now = self._now()
+
+        record = dict(time = now,
+                      interval = now - self._lastPaint if self._lastPaint is not None else None,
+                      pixmaps = len(pixmap_cache.cache),
+                      pixmapBytes = pixmap_cache.cache.bytes())
+        self._frames.append(record)
+        self._lastPaint = now
+
+        if self._pendingInput is not None and 'handling' in self._pendingInput:
+            input = self._pendingInput
+            input['latency'] = now - input['time']
+            self._inputs.append(input)
+            self._pendingInput = None
+
+        if self._animation is not None:
+            self._animation['paints'].append(now)
+
+    def inputs(self):
+        return list(self._inputs)
+
+    def animations(self):
+        return list(self._animations)
+
+    def frames(self):
+        return list(self._frames)
+
+    def summary(self):
+        """Return dict with the most recent measurements."""
+        result = dict(frames = len(self._frames),
+                      items = len(self._decanter.view().scene().items()))
+        if self._frames:
+            result.update(pixmaps = self._frames[-1]['pixmaps'],
+                          pixmapBytes = self._frames[-1]['pixmapBytes'])
+        if self._inputs:
+            result['inputLatency'] = self._inputs[-1]['latency']
+            result['maxInputLatency'] = max(input['latency'] for input in self._inputs)
+        if self._animations:
+            last = self._animations[-1]
+            result.update(animationMaxInterval = last['maxInterval'],
+                          animationDroppedFrames = last['droppedFrames'])
+        return result
+
+    def overlayText(self):
+        summary = self.summary()
+        lines = ["items: %s, pixmaps: %s (%.1f MB)" % (
+            summary.get('items'), summary.get('pixmaps'),
+            summary.get('pixmapBytes', 0) / 1024.0**2)]
+        if 'inputLatency' in summary:
+            lines.append("input latency: %.1f ms (max. %.1f ms)" % (
+                summary['inputLatency'], summary['maxInputLatency']))
+        if summary.get('animationMaxInterval') is not None:
+            lines.append("last transition: max. frame interval %.1f ms, %d dropped" % (
+                summary['animationMaxInterval'], summary['animationDroppedFrames']))
+        return "\n".join(lines)
+
+    def overlayVisible(self):
+        return self._overlay is not None and self._overlay.isVisible()
+
+    def setOverlayVisible(self, onoff):
+        if onoff and self._overlay is None:
+            self._overlay = QtWidgets.QGraphicsSimpleTextItem()
+            self._overlay.setBrush(QtCore.Qt.green)
+            self._overlay.setZValue(1000)
+            self._overlay.setPos(4, 4)
+            self._decanter.view().scene().addItem(self._overlay)
+
+            # (updating the text from framePainted() would trigger
+            # another paint event, so use a timer:)
+            self._overlayTimer = QtCore.QTimer(self)
+            self._overlayTimer.setInterval(OVERLAY_INTERVAL)
+            self._overlayTimer.timeout.connect(self._updateOverlay)
+
+        if self._overlay is not None:
+            self._overlay.setVisible(onoff)
+            if onoff:
+                self._updateOverlay()
+                if self._animation is None:
+                    self._overlayTimer.start()
+            else:
+                self._overlayTimer.stop()
+
+    def _updateOverlay(self):
+        self._overlay.setText(self.overlayText())
+
+    def log(self):
+        """Return all records as JSON-serializable dict."""
+        return dict(inputs = self.inputs(), animations = self.animations(),
+                    frames = self.frames(), summary = self.summary())
+
+    def writeLog(self, filename = None):
+        """Write log() to the given file (default: logFilename)."""
+        filename = filename or self._logFilename
+        self._finishAnimation()
+        with open(filename, 'w') as f:
+            json.dump(self.log(), f, indent = 1)
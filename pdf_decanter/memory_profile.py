@@ -0,0 +1,149 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Memory measurements at the decomposition stage boundaries (as a
+progress.Progress callback) and at checkpoints like
+PDFDecanter.setSlides(), cf. PDFDecanter.enableMemoryProfiling()."""
+
+import os, sys, json, tracemalloc
+from . import pixmap_cache
+
+# number of allocation sites (file:line) reported per stage:
+TOP_SITES = 10
+
+
+def rss():
+    """Return resident set size of this process in bytes (on systems
+    without /proc, the peak RSS; None if unknown)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def slidesMemory(slides):
+    """Return dict with (approximate) bytes of the patch images (ARGB32
+    QImages, which are not seen by tracemalloc) and the pixmaps of the
+    given Presentation."""
+    table = slides.patchTable()
+    pixmapPatches = [patch for patch in table.patches() if patch.hasPixmap()]
+    return dict(patches = len(table),
+                patchImageBytes = int(table.pixelCount.sum()) * 4,
+                pixmaps = len(pixmapPatches),
+                pixmapBytes = sum(patch.pixmapBytes() for patch in pixmapPatches),
+                pixmapCacheBytes = pixmap_cache.cache.bytes())
+
+
+def _siteName(frame):
+    filename = frame.filename
+    package = os.path.dirname(os.path.abspath(__file__))
+    if filename.startswith(package):
+        filename = 'pdf_decanter' + filename[len(package):]
+    return "%s:%d" % (filename, frame.lineno)
+
+
+class MemoryProfiler(object):
+    """Progress callback recording, for each stage, the increase of
+    memory traced by tracemalloc (i.e. Python objects and NumPy
+    arrays), the peak during a single run of the stage, and the RSS
+    afterwards.  For the first run of each stage, the top allocation
+    sites are determined by comparing tracemalloc snapshots (so that
+    e.g. label images and uint32 copies show up with their source
+    lines).  checkpoint() records the same numbers at arbitrary
+    points, and attributes bytes to pages, patches and pixmaps.
+
+    Starts tracemalloc if it is not running yet (which slows down
+    decomposition considerably)."""
+
+    def __init__(self, nframes = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+        self._stages = {}
+        self._running = {} # stage -> (traced, snapshot or None)
+        self._sites = {}
+        self._checkpoints = []
+        self._attribution = {}
+
+    def __call__(self, event):
+        if event['type'] == 'started':
+            stage = event['stage']
+            snapshot = tracemalloc.take_snapshot() if stage not in self._sites else None
+            if hasattr(tracemalloc, 'reset_peak'): # (Python >= 3.9)
+                tracemalloc.reset_peak()
+            self._running[stage] = (tracemalloc.get_traced_memory()[0], snapshot)
+        elif event['type'] == 'finished':
+            self._stageFinished(event['stage'])
+        elif event['type'] == 'done':
+            # (taken from the page arrays, since e.g. the pages of the
+            # poppler_renderer are allocated by Qt, invisible to tracemalloc)
+            counts = event['statistics']['counts']
+            if counts.get('pages'):
+                self._attribution.update(pageBytes = counts['pageBytes'],
+                                         bytesPerPage = counts['pageBytes'] // counts['pages'])
+            self.checkpoint('decomposed')
+
+    def _stageFinished(self, stage):
+        traced, peak = tracemalloc.get_traced_memory()
+        before, snapshot = self._running.pop(stage)
+
+        stats = self._stages.setdefault(stage, dict(
+            runs = 0, tracedIncrease = 0, maxPeakIncrease = 0))
+        stats['runs'] += 1
+        stats['tracedIncrease'] += traced - before
+        stats['maxPeakIncrease'] = max(stats['maxPeakIncrease'], peak - before)
+        stats['rss'] = rss()
+
+        if snapshot is not None:
+            ignore = (tracemalloc.Filter(False, tracemalloc.__file__), )
+            differences = tracemalloc.take_snapshot().filter_traces(ignore).compare_to(
+                snapshot.filter_traces(ignore), 'lineno')
+            differences.sort(key = lambda diff: -abs(diff.size_diff))
+            self._sites[stage] = [
+                dict(site = _siteName(diff.traceback[0]), bytes = diff.size_diff,
+                     count = diff.count_diff)
+                for diff in differences[:TOP_SITES] if diff.size_diff]
+
+    def checkpoint(self, label, slides = None):
+        """Record memory usage at the given point; if slides are
+        given, also attribute bytes to their patches and pixmaps
+        (cf. slidesMemory())."""
+        traced, peak = tracemalloc.get_traced_memory()
+        record = dict(label = label, traced = traced, peak = peak, rss = rss())
+        if slides is not None:
+            record.update(slidesMemory(slides))
+            self._attribution.update(
+                (key, record[key]) for key in ('patchImageBytes', 'pixmapBytes', 'pixmapCacheBytes'))
+        self._checkpoints.append(record)
+
+    def stages(self):
+        return dict((stage, dict(stats)) for stage, stats in self._stages.items())
+
+    def report(self):
+        """Return JSON-serializable dict with 'stages', 'sites' (top
+        allocation sites per stage), 'checkpoints' and 'attribution'
+        (bytes of pages, patch images and pixmaps)."""
+        return dict(stages = self.stages(), sites = dict(self._sites),
+                    checkpoints = list(self._checkpoints),
+                    attribution = dict(self._attribution))
+
+    def writeReport(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent = 1, sort_keys = True)
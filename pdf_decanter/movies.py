@@ -0,0 +1,178 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Playback of movies embedded via links (e.g. file:anim.mng).  The
+decoded frames of each movie file are shared (cf. MovieSource), and
+players only decode / animate while they are playing."""
+
+from .dynqt import QtCore, QtGui, QtWidgets
+from . import pixmap_cache
+
+# minimum delay (ms) between movie frames (some files specify 0):
+MIN_FRAME_DELAY = 20
+# number of movie frames decoded in advance by prefetch():
+PREFETCH_FRAMES = 5
+
+
+def movieLinks(frame):
+    """Return list of (QRectF, link) pairs for all movie links of the
+    given Frame (the filename is link[5:])."""
+    return [(rect, link) for rect, link in frame.linkRects()
+            if link.startswith('file:') and link.endswith('.mng')]
+
+
+class MovieSource(object):
+    """Decoded frames of one movie file, shared by all MoviePlayers
+    showing it.  Frames are decoded sequentially on demand.  The
+    decoded frames count against the budget of the pixmap_cache
+    (which may release them again, cf. releasePixmap())."""
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._reader = None
+        self._frames = [] # (QPixmap, delay) pairs
+        self._complete = False
+
+    def filename(self):
+        return self._filename
+
+    def decodedFrameCount(self):
+        return len(self._frames)
+
+    def frameCount(self):
+        """Return number of frames, or None if not completely decoded yet."""
+        return len(self._frames) if self._complete else None
+
+    def _decodeNext(self):
+        if self._complete:
+            return False
+        if self._reader is None:
+            self._reader = QtGui.QImageReader(self._filename)
+        image = self._reader.read()
+        if image.isNull():
+            self._complete = True
+            self._reader = None
+            return False
+        delay = max(self._reader.nextImageDelay(), MIN_FRAME_DELAY)
+        self._frames.append((QtGui.QPixmap.fromImage(image), delay))
+        pixmap_cache.cache.account(self)
+        return True
+
+    def frame(self, index):
+        """Return (QPixmap, delay) of the given frame (looping), or
+        None if the movie could not be decoded."""
+        while index >= len(self._frames):
+            if not self._decodeNext():
+                if not self._frames:
+                    return None
+                index %= len(self._frames)
+        return self._frames[index]
+
+    def prefetch(self, count = PREFETCH_FRAMES):
+        """Decode the first count frames (if not done already)."""
+        while len(self._frames) < count and self._decodeNext():
+            pass
+
+    def clear(self):
+        self._reader = None
+        self._frames = []
+        self._complete = False
+
+    def pixmapBytes(self):
+        return sum(pixmap.width() * pixmap.height() * 4 for pixmap, delay in self._frames)
+
+    def releasePixmap(self):
+        """Called by the PixmapCache; frames are decoded again when
+        needed."""
+        self.clear()
+
+
+_sources = {}
+
+def source(filename):
+    """Return shared MovieSource for the given movie file."""
+    result = _sources.get(filename)
+    if result is None:
+        result = _sources[filename] = MovieSource(filename)
+    return result
+
+def prefetch(frame):
+    """Decode the first frames of all movies of the given Frame."""
+    for rect, link in movieLinks(frame):
+        source(link[5:]).prefetch()
+
+def clear():
+    """Forget all decoded movie frames."""
+    _sources.clear()
+
+
+class MoviePlayer(QtWidgets.QGraphicsObject):
+    """Graphics item showing a MovieSource scaled to a rect.  Nothing
+    is decoded (and shown) before the first play(); a paused player
+    keeps showing its current frame."""
+
+    def __init__(self, source, rect, parentItem = None):
+        QtWidgets.QGraphicsObject.__init__(self, parentItem)
+        self._source = source
+        self._rect = QtCore.QRectF(QtCore.QPointF(0, 0), rect.size())
+        self.setPos(rect.topLeft())
+
+        self._frameIndex = 0
+        self._started = False
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._nextFrame)
+
+    def source(self):
+        return self._source
+
+    def isPlaying(self):
+        return self._timer.isActive()
+
+    def play(self):
+        if self.isPlaying():
+            return
+        self._started = True
+        pixmap_cache.cache.touch(self._source)
+        frame = self._source.frame(self._frameIndex)
+        if frame is not None:
+            self._timer.start(frame[1])
+        self.update()
+
+    def pause(self):
+        self._timer.stop()
+
+    def _nextFrame(self):
+        self._frameIndex += 1
+        pixmap_cache.cache.touch(self._source)
+        frame = self._source.frame(self._frameIndex)
+        if frame is None:
+            return
+        frameCount = self._source.frameCount()
+        if frameCount:
+            self._frameIndex %= frameCount
+        if frameCount != 1: # (no need to animate still images)
+            self._timer.start(frame[1])
+        self.update()
+
+    def boundingRect(self):
+        return self._rect
+
+    def paint(self, painter, option, widget = None):
+        if not self._started:
+            return
+        frame = self._source.frame(self._frameIndex)
+        if frame is not None:
+            pixmap = frame[0]
+            painter.drawPixmap(self._rect, pixmap, QtCore.QRectF(pixmap.rect()))
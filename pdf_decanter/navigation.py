@@ -0,0 +1,176 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Training of the header / footer (navigation) classifier from
+examples given interactively, without blocking the GUI."""
+
+import os, sys, copy
+import concurrent.futures
+from .dynqt import QtCore
+from . import decomposer
+
+# training starts after no further examples came in for this long (ms):
+DEBOUNCE_INTERVAL = 500
+# interval (ms) for checking whether the background training finished:
+POLL_INTERVAL = 50
+# use the decomposer.NearestExampleClassifier instead of a random forest:
+INCREMENTAL = False
+
+
+def _fitAndSave(examples, incremental, model, filename):
+    """Background job: fit new model (unless given) and save it."""
+    if model is None:
+        model = decomposer.fit_navigation_classifier(examples, incremental)
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    decomposer.save_classifier(filename, examples, model)
+    return model
+
+
+class NavigationTrainer(QtCore.QObject):
+    """Collects navigation examples (addExample()), and retrains and
+    saves the classifier in a background thread once no further
+    examples came in for DEBOUNCE_INTERVAL ms.  Afterwards, all
+    patches are reclassified, and the change handler is called with
+    the list of frames containing patches whose flags changed.
+
+    In incremental mode, examples are added to a
+    decomposer.NearestExampleClassifier (so that reclassification
+    happens right after the debounce interval); only saving is done
+    in the background then."""
+
+    def __init__(self, classifierFilename, parent = None, incremental = INCREMENTAL):
+        QtCore.QObject.__init__(self, parent)
+        self._classifierFilename = classifierFilename
+        self._incremental = incremental
+        self._slides = None
+        self._changeHandler = None
+
+        self._newExamples = []
+        self._future = None
+        self._retrain = False
+        self._executor = concurrent.futures.ThreadPoolExecutor(1)
+
+        self._debounceTimer = QtCore.QTimer(self)
+        self._debounceTimer.setSingleShot(True)
+        self._debounceTimer.setInterval(DEBOUNCE_INTERVAL)
+        self._debounceTimer.timeout.connect(self._train)
+
+        self._pollTimer = QtCore.QTimer(self)
+        self._pollTimer.setInterval(POLL_INTERVAL)
+        self._pollTimer.timeout.connect(self._poll)
+
+        # don't lose examples given right before quitting:
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.flush)
+
+    def setSlides(self, slides):
+        self._slides = slides
+
+    def setChangeHandler(self, handler):
+        """Set callable to be called with a list of frames whose
+        patches' header / footer flags changed by reclassification."""
+        self._changeHandler = handler
+
+    def isIncremental(self):
+        return self._incremental
+
+    def setIncremental(self, onoff):
+        self._incremental = onoff
+
+    def addExample(self, patch):
+        """Record the current flags of the given patch as example and
+        (re)start the debounce interval."""
+        self._newExamples.append(decomposer.record_navigation_example(patch))
+        self._debounceTimer.start()
+
+    def isBusy(self):
+        """Return whether training is pending or running."""
+        return (self._debounceTimer.isActive() or self._future is not None)
+
+    def _train(self):
+        if self._future is not None:
+            self._retrain = True # (will be started again when finished)
+            return
+
+        examples = dict(decomposer.navigation_examples)
+        newExamples, self._newExamples = self._newExamples, []
+
+        model = None
+        if self._incremental:
+            model = decomposer.classifier
+            if not isinstance(model, decomposer.NearestExampleClassifier):
+                model = decomposer.fit_navigation_classifier(examples, incremental = True)
+            else:
+                for key in newExamples:
+                    model.addExample(key, examples[key])
+            self._classifierChanged(model)
+            model = copy.deepcopy(model) # (saved in the background)
+
+        self._future = self._executor.submit(
+            _fitAndSave, examples, self._incremental, model, self._classifierFilename)
+        self._pollTimer.start()
+
+    def _poll(self):
+        if not self._future.done():
+            return
+        self._pollTimer.stop()
+        future, self._future = self._future, None
+
+        try:
+            model = future.result()
+        except Exception as e:
+            sys.stderr.write("%s training / saving navigation classifier: %s\n" % (type(e).__name__, e))
+        else:
+            if not self._incremental:
+                self._classifierChanged(model)
+
+        if self._retrain:
+            self._retrain = False
+            self._train()
+
+    def flush(self):
+        """Start pending training immediately and wait for it to
+        finish (e.g. before quitting)."""
+        while self.isBusy():
+            if self._debounceTimer.isActive():
+                self._debounceTimer.stop()
+                self._train()
+            concurrent.futures.wait([self._future]) # (errors are reported by _poll())
+            self._poll()
+
+    def _classifierChanged(self, model):
+        decomposer.classifier = model
+        if self._slides is None:
+            return
+
+        frames = self._slides.frames()
+        patches, frameHeights = decomposer.unique_patches(frames)
+        if not patches:
+            return
+        isHeader, isFooter = decomposer.predict_navigation_flags(patches, frameHeights)
+
+        changed = set()
+        for patch, header, footer in zip(patches, isHeader, isFooter):
+            if (bool(patch.flag(patch.FLAG_HEADER)) != bool(header) or
+                bool(patch.flag(patch.FLAG_FOOTER)) != bool(footer)):
+                patch.setFlag(patch.FLAG_HEADER, bool(header))
+                patch.setFlag(patch.FLAG_FOOTER, bool(footer))
+                changed.add(patch)
+
+        if changed and self._changeHandler is not None:
+            self._changeHandler([frame for frame in frames
+                                 if not changed.isdisjoint(frame.content())])
@@ -0,0 +1,194 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Optional cache of the raw rendered pages of a PDF, stored
+losslessly compressed (as .npz file, one array per page) together
+with the render parameters and the PDFInfos.  Decomposition can then
+be re-run from the cache (cf. decomposer.decompose_page_cache()),
+e.g. for tuning parameters of the decomposition, for benchmarks with
+real presentations, or on machines without a PDF renderer.  Run as
+
+  python -m pdf_decanter.page_cache [--size 1024x768] talk1.pdf talk2.pdf ...
+  python -m pdf_decanter.page_cache --replay [--timings FILENAME] pdf_decanter_pages_talk1_1024x768.npz ...
+
+to render (resp. decompose) the given files."""
+
+import os, sys, json, pickle, zipfile
+import numpy
+from optparse import OptionParser
+from . import tracing
+
+FORMAT_VERSION = 1
+
+
+def pageCacheFilename(pdfFilename, sizePX):
+    """Return default page cache filename for the given PDF and size."""
+    dirname, basename = os.path.split(os.path.abspath(pdfFilename))
+    w, h = sizePX
+    return os.path.join(
+        dirname, "pdf_decanter_pages_%s_%dx%d.npz" % (
+            os.path.splitext(basename)[0], w, h))
+
+
+def isCurrent(pageCacheFilename, pdfFilename):
+    """Return whether the page cache exists and is not older than the PDF."""
+    return (os.path.exists(pageCacheFilename) and
+            os.path.getmtime(pageCacheFilename) >= os.path.getmtime(pdfFilename))
+
+
+def _writeArray(archive, name, array):
+    with archive.open(name + '.npy', 'w', force_zip64 = True) as f:
+        numpy.lib.format.write_array(f, numpy.asanyarray(array), allow_pickle = False)
+
+
+def recordPages(pageCacheFilename, pages, infos = None, **parameters):
+    """Generator passing on the given pages while writing them to the
+    given page cache file, together with infos (PDFInfos or None) and
+    the render parameters (e.g. pdf, size, renderer; the pageCount is
+    added automatically).  The file is only created once all pages
+    have been consumed."""
+    tempFilename = pageCacheFilename + '.part'
+    pageCount = 0
+    try:
+        with tracing.span('write page cache', 'cache', filename = pageCacheFilename), \
+             zipfile.ZipFile(tempFilename, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for page in pages:
+                _writeArray(archive, 'page%04d' % pageCount, page)
+                pageCount += 1
+                yield page
+
+            if infos is not None:
+                _writeArray(archive, 'infos', numpy.frombuffer(
+                    pickle.dumps(infos, pickle.HIGHEST_PROTOCOL), numpy.uint8))
+            parameters.update(version = FORMAT_VERSION, pageCount = pageCount)
+            _writeArray(archive, 'parameters', numpy.array(json.dumps(parameters)))
+        os.replace(tempFilename, pageCacheFilename)
+    finally:
+        if os.path.exists(tempFilename):
+            os.remove(tempFilename)
+
+
+def writePageCache(pageCacheFilename, pages, infos = None, **parameters):
+    """Write all pages to the given page cache file (cf. recordPages())."""
+    for page in recordPages(pageCacheFilename, pages, infos, **parameters):
+        pass
+
+
+class PageCache(object):
+    """Read access to a page cache file written by recordPages().
+    Pages are decompressed one at a time (cf. pages())."""
+
+    def __init__(self, pageCacheFilename):
+        self._filename = pageCacheFilename
+        self._npz = numpy.load(pageCacheFilename, allow_pickle = False)
+        if 'parameters' not in self._npz.files:
+            self.close()
+            raise ValueError("%r is not a complete page cache" % pageCacheFilename)
+        self._parameters = json.loads(str(self._npz['parameters']))
+        if self._parameters.get('version') != FORMAT_VERSION:
+            self.close()
+            raise ValueError("%r has unsupported page cache version %r" % (
+                pageCacheFilename, self._parameters.get('version')))
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def filename(self):
+        return self._filename
+
+    def parameters(self):
+        """Return dict of render parameters (cf. recordPages())."""
+        return dict(self._parameters)
+
+    def pageCount(self):
+        return self._parameters['pageCount']
+
+    def __len__(self):
+        return self.pageCount()
+
+    def size(self):
+        """Return (width, height) of the pages in pixels."""
+        h, w = self.page(0).shape[:2]
+        return w, h
+
+    def infos(self):
+        """Return stored PDFInfos (or None)."""
+        if 'infos' not in self._npz.files:
+            return None
+        return pickle.loads(self._npz['infos'].tobytes())
+
+    def page(self, pageIndex):
+        return self._npz['page%04d' % pageIndex]
+
+    def pages(self, progress = None):
+        """Generator for all pages (as passed to
+        decomposer.decompose_pages())."""
+        pageCount = self.pageCount()
+        for pageIndex in range(pageCount):
+            if progress is not None:
+                progress.update('reading page', pageIndex + 1, pageCount)
+            with tracing.span('read page', 'cache', page = pageIndex + 1):
+                page = self.page(pageIndex)
+            yield page
+
+
+def _parse_size(text):
+    w, h = text.split('x')
+    return int(w), int(h)
+
+def main(argv = None):
+    op = OptionParser(usage = "%prog [options] <filename.pdf>... | --replay <filename.npz>...")
+    op.add_option("--size", "-s", default = '1024x768',
+                  help = "target rendering size in pixels (default: %default)")
+    op.add_option("--replay", action = "store_true", default = False,
+                  help = "decompose the given page cache files")
+    op.add_option("--timings", default = None, metavar = "FILENAME",
+                  help = "with --replay, write per-stage times and counts to JSON file")
+    options, args = op.parse_args(argv)
+    if not args:
+        op.error("no files given")
+
+    from .dynqt import QtGui
+    app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication(sys.argv[:1])
+
+    from . import decomposer
+    from .progress import Progress, ConsoleReporter
+
+    statistics = {}
+    for filename in args:
+        if options.replay:
+            progress = Progress(ConsoleReporter())
+            decomposer.decompose_page_cache(filename, progress)
+            statistics[filename] = progress.statistics()
+        else:
+            size = _parse_size(options.size)
+            cacheFilename = pageCacheFilename(filename, size)
+            pages, infos = decomposer.render_pages(filename, size, cacheFilename)
+            for page in pages:
+                pass
+            print("%s written." % cacheFilename)
+
+    if options.timings:
+        with open(options.timings, 'w') as f:
+            json.dump(statistics, f, indent = 1)
+
+
+if __name__ == '__main__':
+    main()
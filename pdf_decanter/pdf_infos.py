@@ -12,7 +12,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import numpy, os.path, itertools, sys
+import numpy, os.path, re, sys
 
 # TODO:
 # - let Presentation store copy of outline, with page indices replaced by Frame references
@@ -48,7 +48,8 @@ class PDFInfos(object):
     on the availability of the information within the PDF file plus
     the ability of the available backend(s) to extract it."""
     
-    __slots__ = ('_metaInfo', '_pageCount', '_outline', '_pageInfos', '_names')
+    __slots__ = ('_metaInfo', '_pageCount', '_outline', '_pageInfos', '_names',
+                 '_beamerFrames')
     
     def __init__(self):
         self._metaInfo = None
@@ -56,6 +57,7 @@ class PDFInfos(object):
         self._outline = None
         self._pageInfos = None
         self._names = {}
+        self._beamerFrames = None
 
     def metaInfo(self):
         """Return dict with meta information about PDF document, e.g. keys like Title, Author, Creator, ..."""
@@ -73,6 +75,15 @@ class PDFInfos(object):
         (key = name, value = 0-based page index)"""
         return self._names
 
+    def beamerFrames(self):
+        """Return dictionary mapping 0-based page indices to (label,
+        subIndex) pairs for all pages belonging to labeled beamer
+        frames (cf. labeledBeamerFrames()).  Computed once, on first
+        access."""
+        if self._beamerFrames is None:
+            self._beamerFrames = _beamerFrameIndex(self._names)
+        return self._beamerFrames
+
     def __len__(self):
         return self._pageCount
 
@@ -217,6 +228,45 @@ class PDFInfos(object):
 
     def __setstate__(self, state):
         self._metaInfo, self._pageCount, self._outline, self._pageInfos, self._names = state
+        self._beamerFrames = None
+
+
+_SUBFRAME_NAME = {
+    bytes : re.compile(br'^(.*)<([0-9]+)>$', re.DOTALL),
+    str   : re.compile(r'^(.*)<([0-9]+)>$', re.DOTALL),
+}
+
+def _labeledPages(names):
+    """Single pass over the named destinations, collecting the pages
+    of 'name<1>', 'name<2>', ... for every 'name' that is also present
+    itself.  Returns dictionary label -> list_of_pages, which only
+    contains the consecutive sub-frames starting with <1>."""
+    subFrames = {}
+    for name, page in names.items():
+        ma = _SUBFRAME_NAME[type(name)].match(name)
+        if ma is None:
+            continue
+        label, subframe = ma.group(1), int(ma.group(2))
+        if label in names:
+            subFrames.setdefault(label, {})[subframe] = page
+
+    result = {}
+    for label, pageOfSubframe in subFrames.items():
+        pages = []
+        while len(pages) + 1 in pageOfSubframe:
+            pages.append(pageOfSubframe[len(pages) + 1])
+        if pages:
+            result[label] = pages
+    return result
+
+
+def _beamerFrameIndex(names):
+    result = {}
+    for label, pages in sorted(_labeledPages(names).items(),
+                               key = lambda label_pages: label_pages[1][0]):
+        for subIndex, page in enumerate(pages):
+            result.setdefault(page, (label, subIndex))
+    return result
 
 
 def labeledBeamerFrames(pdfInfos):
@@ -224,18 +274,9 @@ def labeledBeamerFrames(pdfInfos):
     \frame{}s with [label=name]s.  For every named frame, return a
     pair (name, list_of_pages) in a list.  If the PDF does not contain
     corresponding named link targets (with names like 'name',
-    'name<1>', 'name<2>' etc.), returns an empty list."""
-    result = []
-    names = pdfInfos.names()
-    for name in names:
-        pages = []
-        for subframe in itertools.count(1):
-            page = names.get(name + b'<%d>' % subframe)
-            if page is None:
-                break
-            pages.append(page)
-        if pages:
-            result.append((name, pages))
-    print("%d pages out of %d belong to labeled beamer slides." % (
-        sum(len(pages) for name, pages in result), pdfInfos.pageCount()))
-    return sorted(result, key = lambda name_pages: name_pages[1][0])
+    'name<1>', 'name<2>' etc.), returns an empty list.
+
+    See PDFInfos.beamerFrames() for a precomputed page -> (name,
+    subIndex) mapping."""
+    return sorted(_labeledPages(pdfInfos.names()).items(),
+                  key = lambda name_pages: name_pages[1][0])
@@ -1,4 +1,6 @@
-import subprocess, numpy, string, sys
+import subprocess, numpy, string
+from .progress import Progress, ConsoleReporter
+from . import tracing
 
 def startRenderer(pdfFilename, pageIndex, sizePX = None, dpi = None):
     command = ['pdftoppm']
@@ -30,21 +32,19 @@ def renderPDFPage(pdfFilename, pageIndex, **kwargs):
     return result
 
 def renderAllPages(pdfFilename, **kwargs):
-    pageCount = None
-    if 'pageCount' in kwargs:
-        pageCount = kwargs['pageCount']
-        kwargs = dict(kwargs)
-        del kwargs['pageCount']
+    kwargs = dict(kwargs)
+    pageCount = kwargs.pop('pageCount', None)
+    progress = kwargs.pop('progress', None) or Progress(ConsoleReporter())
     
     pdftoppm = startRenderer(pdfFilename, None, **kwargs)
 
     pageIndex = 1
     while pageCount is None or pageIndex <= pageCount:
-        sys.stdout.write("\rrendering page %d%s..." % (pageIndex, " / %d" % pageCount if pageCount is not None else ""))
-        sys.stdout.flush()
+        progress.update('rendering page', pageIndex, pageCount)
 
         try:
-            page = readPPM(pdftoppm.stdout)
+            with tracing.span('render page', 'render', page = pageIndex):
+                page = readPPM(pdftoppm.stdout)
         except IOError as e:
             if e.errno == 4:
                 break
@@ -54,7 +54,6 @@ def renderAllPages(pdfFilename, **kwargs):
         yield page
         pageIndex += 1
 
-    print()
     rest, _ = pdftoppm.communicate()
     assert not rest, "pdftoppm returned more than the expected PPM data (%d extra bytes)" % len(rest)
     assert pdftoppm.returncode == 0
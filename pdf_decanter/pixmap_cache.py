@@ -0,0 +1,158 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Memory budget for Patch pixmaps (and other pixmaps, cf.
+PixmapCache.account()) with LRU eviction."""
+
+import collections, weakref
+
+
+class PixmapCache(object):
+    """Keeps track of the Patch pixmaps created via pixmap() in LRU
+    order (touch() marks patches as shown).  If the total size
+    exceeds budget() bytes, the pixmaps of the least recently shown
+    patches are released (they will be re-created from the Patch's
+    QImage on demand), and registered owners (e.g. FrameRenderers)
+    are asked to drop their items for them (releasePatchItems()).
+    Pixmaps of items that are still displayed on screen are not
+    evicted (and remain accounted for); they are set aside and only
+    reconsidered after checkInUse().
+
+    Patches are only weakly referenced, so that entries of replaced
+    presentations disappear together with their patches."""
+
+    def __init__(self, budget = 256 * 1024**2):
+        self._budget = budget
+        self._entries = collections.OrderedDict() # weakref to Patch -> bytes
+        self._inUse = {} # same, for entries found in use by _evict()
+        self._bytes = 0
+        self._owners = weakref.WeakSet()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def budget(self):
+        return self._budget
+
+    def setBudget(self, budget):
+        self._budget = budget
+        self._evict()
+
+    def bytes(self):
+        """Return total size of all pixmaps managed by this cache."""
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries) + len(self._inUse)
+
+    def __contains__(self, patch):
+        key = weakref.ref(patch)
+        return key in self._entries or key in self._inUse
+
+    def statistics(self):
+        return dict(hits = self.hits, misses = self.misses,
+                    evictions = self.evictions,
+                    pixmaps = len(self), bytes = self._bytes,
+                    budget = self._budget)
+
+    def addOwner(self, owner):
+        """Register object with a releasePatchItems(patch) method
+        (weakly referenced), which shall return True iff the patch's
+        pixmap is still in use (i.e. displayed on screen)."""
+        self._owners.add(owner)
+
+    def pixmap(self, patch):
+        """Return patch.pixmap(), accounting for it in the cache."""
+        key = weakref.ref(patch)
+        if key in self._entries or key in self._inUse:
+            self.hits += 1
+            self.touch(patch)
+            return patch.pixmap()
+
+        self.misses += 1
+        result = patch.pixmap()
+        bytes = patch.pixmapBytes()
+        self._entries[weakref.ref(patch, self._forget)] = bytes
+        self._bytes += bytes
+        self._evict(keep = patch) # (probably about to be used)
+        return result
+
+    def account(self, item):
+        """Add (or update the size of) the entry for an object with
+        pixmapBytes() and releasePixmap() methods whose pixmaps are
+        not created via pixmap() (e.g. a MovieSource), marking it as
+        recently shown."""
+        self._forget(weakref.ref(item))
+        bytes = item.pixmapBytes()
+        self._entries[weakref.ref(item, self._forget)] = bytes
+        self._bytes += bytes
+        self._evict(keep = item)
+
+    def touch(self, patch):
+        """Mark patch as recently shown."""
+        key = weakref.ref(patch)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+
+    def checkInUse(self):
+        """Reconsider the pixmaps found in use for eviction (to be
+        called when items may have disappeared from the screen)."""
+        if self._inUse and self._bytes > self._budget:
+            self._entries.update(self._inUse)
+            self._inUse.clear()
+            self._evict()
+
+    def _forget(self, key):
+        # (also used as weakref callback, i.e. when a patch has been garbage-collected)
+        bytes = self._entries.pop(key, None)
+        if bytes is None:
+            bytes = self._inUse.pop(key, None)
+        if bytes is not None:
+            self._bytes -= bytes
+
+    def _evict(self, keep = None):
+        # (each entry is checked at most once, since entries in use
+        # are moved to self._inUse)
+        while self._bytes > self._budget and self._entries:
+            key = next(iter(self._entries))
+            patch = key()
+            if patch is keep:
+                break # (the only remaining candidate)
+            bytes = self._entries.pop(key)
+            if patch is None:
+                self._bytes -= bytes
+                continue
+            inUse = False
+            for owner in list(self._owners):
+                if owner.releasePatchItems(patch):
+                    inUse = True
+            if inUse:
+                self._inUse[key] = bytes
+                continue
+            self._bytes -= bytes
+            self.evictions += 1
+            patch.releasePixmap()
+
+    def clear(self):
+        for key in list(self._entries) + list(self._inUse):
+            patch = key()
+            if patch is not None:
+                patch.releasePixmap()
+        self._entries.clear()
+        self._inUse.clear()
+        self._bytes = 0
+
+
+cache = PixmapCache()
@@ -16,17 +16,19 @@
 import popplerqt5 as QtPoppler
 from PyQt5 import QtCore
 import qimage2ndarray
-import sys
+from .progress import Progress, ConsoleReporter
+from . import tracing
 
 
 class PopplerRenderer(object):
-    def __init__(self, pdfFilename, sizePX = None, dpi = None, pageCount = None):
+    def __init__(self, pdfFilename, sizePX = None, dpi = None, pageCount = None, progress = None):
         self._doc = QtPoppler.Poppler.Document.load(pdfFilename)
         self._doc.setRenderHint(QtPoppler.Poppler.Document.Antialiasing |
                                 QtPoppler.Poppler.Document.TextAntialiasing)
 
         self._sizePX = sizePX
         self._dpi = dpi
+        self._progress = progress or Progress(ConsoleReporter())
 
         self._pageIndex = 0
 
@@ -39,8 +41,7 @@ class PopplerRenderer(object):
         if self._pageIndex >= pageCount:
             raise StopIteration
         
-        sys.stdout.write("\rrendering page %d / %d..." % (self._pageIndex + 1, pageCount))
-        sys.stdout.flush()
+        self._progress.update('rendering page', self._pageIndex + 1, pageCount)
 
         page = self._doc.page(self._pageIndex)
         assert page
@@ -50,12 +51,11 @@ class PopplerRenderer(object):
             widthPX, heightPX = self._sizePX
             renderSize.scale(widthPX, heightPX, QtCore.Qt.KeepAspectRatio)
         scale = renderSize.width() / page.pageSize().width()
-        qImg = page.renderToImage(scale * 72, scale * 72)
-        result = qimage2ndarray.rgb_view(qImg)
+        with tracing.span('render page', 'render', page = self._pageIndex + 1):
+            qImg = page.renderToImage(scale * 72, scale * 72)
+            result = qimage2ndarray.rgb_view(qImg)
 
         self._pageIndex += 1
-        if self._pageIndex == pageCount:
-            print()
 
         return result
 
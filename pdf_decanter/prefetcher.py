@@ -0,0 +1,149 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Idle-time preparation of frames that are likely to be shown next."""
+
+import weakref
+from .dynqt import QtCore
+from . import presentation, pixmap_cache, slide_renderer, texture_atlas, movies
+
+# time (ms) to wait after gotoFrame() before starting, in order not to
+# compete with the transition animation:
+PREFETCH_DELAY = 300
+
+
+class Prefetcher(QtCore.QObject):
+    """Warms Patch pixmaps (QImage -> QPixmap conversion) and lets
+    existing SlideRenderers prepare their items (cf.
+    FrameRenderer.prepareFrame()) for frames that are likely to be
+    shown after the current one, i.e.
+
+    * the next lookAhead() frames,
+    * the current frames of the next lookAhead() slides, and
+    * up to lookAhead() link targets of the current frame.
+
+    The work is done on the GUI thread (pixmaps must be created
+    there), one frame per event loop iteration.  Each round stops
+    when the pixmaps created in it exceed memoryBudget() bytes.
+    Prepared items of slides that are no candidates anymore are
+    discarded when the next round is scheduled."""
+
+    def __init__(self, decanter, lookAhead = 3, memoryBudget = 64 * 1024**2):
+        QtCore.QObject.__init__(self, decanter)
+        self._decanter = decanter
+        self._lookAhead = lookAhead
+        self._memoryBudget = memoryBudget
+
+        self._queue = []
+        self._usedBytes = 0
+        self._preparedRenderers = weakref.WeakSet()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._processNext)
+
+    def lookAhead(self):
+        return self._lookAhead
+
+    def setLookAhead(self, lookAhead):
+        """Set number of frames / slides / link targets to prepare
+        (0 disables prefetching)."""
+        self._lookAhead = lookAhead
+
+    def memoryBudget(self):
+        return self._memoryBudget
+
+    def setMemoryBudget(self, bytes):
+        self._memoryBudget = bytes
+
+    def candidates(self, frameIndex):
+        """Return list of Frames that are likely to be shown after the
+        given one (most likely ones first)."""
+        slides = self._decanter.slides()
+        frame = slides.frame(frameIndex)
+        result = []
+
+        for i in range(frameIndex + 1, min(frameIndex + 1 + self._lookAhead, slides.frameCount())):
+            result.append(slides.frame(i))
+
+        slideIndex = frame.slide().slideIndex()
+        for i in range(slideIndex + 1, min(slideIndex + 1 + self._lookAhead, len(slides))):
+            slide = slides[i]
+            result.append(slide.currentFrame() if slide.currentSubIndex() is not None else slide[0])
+
+        linkTargets = [link for rect, link in frame.linkRects(onlyExternal = False)
+                       if isinstance(link, int)]
+        for link in linkTargets[:self._lookAhead]:
+            if 0 <= link < slides.frameCount():
+                result.append(slides.frame(link))
+
+        unique = []
+        for candidate in result:
+            if candidate is not frame and candidate not in unique:
+                unique.append(candidate)
+        return unique
+
+    def schedule(self, frameIndex):
+        """Restart prefetching for the situation after gotoFrame(frameIndex)."""
+        self.cancel()
+        candidates = self.candidates(frameIndex) if self._lookAhead > 0 else []
+        self._discardPreparedItems([frame.slide() for frame in candidates])
+        if not candidates:
+            return
+        self._queue = candidates
+        self._timer.start(PREFETCH_DELAY)
+
+    def _discardPreparedItems(self, keepSlides):
+        for renderer in list(self._preparedRenderers):
+            if renderer.slide() not in keepSlides:
+                renderer.discardPreparedItems()
+                self._preparedRenderers.discard(renderer)
+
+    def cancel(self):
+        self._timer.stop()
+        self._queue = []
+        self._usedBytes = 0
+
+    def isActive(self):
+        return bool(self._queue)
+
+    def _processNext(self):
+        if not self._queue:
+            return
+        frame = self._queue.pop(0)
+        self.prepare(frame)
+        if self._usedBytes > self._memoryBudget:
+            self._queue = []
+        if self._queue:
+            self._timer.start(0)
+
+    def prepare(self, frame):
+        """Warm all pixmaps (or texture atlas entries) and the first
+        movie frames of the given frame and let its renderer
+        (if one exists) prepare its items."""
+        for patch in slide_renderer.frameContent(frame):
+            if slide_renderer.USE_TEXTURE_ATLAS:
+                if not patch.flag(presentation.Patch.FLAG_RECT):
+                    texture_atlas.atlas.location(patch)
+            elif not patch.flag(presentation.Patch.FLAG_RECT):
+                if not patch.hasPixmap():
+                    self._usedBytes += patch.pixmapBytes()
+                pixmap_cache.cache.pixmap(patch)
+
+        movies.prefetch(frame)
+
+        renderer = self._decanter.existingRenderer(frame.slide().slideIndex())
+        if renderer is not None:
+            renderer.prepareFrame(frame)
+            self._preparedRenderers.add(renderer)
@@ -12,9 +12,8 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import numpy, itertools
+import numpy
 from .dynqt import QtCore, QtGui, qimage2ndarray
-from . import pdf_infos
 
 
 def boundingRect(rects):
@@ -29,11 +28,15 @@ class ObjectWithFlags(object):
 
     __slots__ = ('_flags', )
 
+    # incremented by every setFlag() call (cf. PatchTable.rowsWithFlags()):
+    flagGeneration = 0
+
     def __init__(self):
         super(ObjectWithFlags, self).__init__()
         self._flags = 0
 
     def setFlag(self, flag, onoff = True):
+        ObjectWithFlags.flagGeneration += 1
         if onoff:
             self._flags |= flag
         else:
@@ -53,7 +56,7 @@ class Patch(ObjectWithFlags):
     pos() will be a QPointF instead of an integer QPoint).
     May appear on multiple frames / slides."""
     
-    __slots__ = ('_pos', '_image', '_pixmap', '_occurrenceCount', '_color')
+    __slots__ = ('_pos', '_image', '_pixmap', '_occurrenceCount', '_color', '__weakref__')
 
     FLAG_HEADER     = 1
     FLAG_FOOTER     = 2
@@ -73,6 +76,10 @@ class Patch(ObjectWithFlags):
     def pos(self):
         return self._pos
 
+    def image(self):
+        """Return ARGB32 QImage (or QSizeF if FLAG_RECT is set)."""
+        return self._image
+
     def boundingRect(self):
         if self.flag(self.FLAG_RECT):
             return QtCore.QRectF(self._pos, self._image)
@@ -96,6 +103,21 @@ class Patch(ObjectWithFlags):
             self._pixmap = QtGui.QPixmap.fromImage(self._image)
         return self._pixmap
 
+    def hasPixmap(self):
+        """Return whether pixmap() has already been created."""
+        return self._pixmap is not None
+
+    def releasePixmap(self):
+        """Drop reference to pixmap(), which will be re-created from
+        the image on demand."""
+        self._pixmap = None
+
+    def pixmapBytes(self):
+        """Return (approximate) memory size of pixmap() in bytes."""
+        if self.flag(self.FLAG_RECT):
+            return 0
+        return self._image.width() * self._image.height() * 4
+
     def pixelCount(self):
         """Return number of pixels as some kind of measurement of memory usage."""
         if self.flag(self.FLAG_RECT):
@@ -111,6 +133,13 @@ class Patch(ObjectWithFlags):
     def isSuccessorOf(self, other):
         return self.boundingRect() == other.boundingRect()
 
+    def rectKey(self):
+        """Return hashable tuple that is equal for two patches iff
+        their boundingRect()s are equal (cf. isSuccessorOf())."""
+        if self.flag(self.FLAG_RECT):
+            return (True, self._pos.x(), self._pos.y(), self._image.width(), self._image.height())
+        return (False, self._pos.x(), self._pos.y(), self._image.width(), self._image.height())
+
     def __iter__(self):
         yield self._pos
         yield self._image
@@ -158,26 +187,82 @@ class Patch(ObjectWithFlags):
             self.xy() + self.sizePair() + (flags, ))
 
 
+class FrameLinks(object):
+    """Link geometry of a Frame in frame pixel coordinates,
+    precomputed from PDFPageInfos.relativeLinks().
+
+    Keeps the QRectFs for rendering (cf. Frame.linkRects()) and an
+    Nx4 array of hit test bounds (x1, y1, x2, y2) sorted by y1, which
+    serves as a simple spatial index: with the maximum link height
+    known, the candidates for a hit test are found by binary search."""
+
+    __slots__ = ('_links', '_rects', '_bounds', '_order', '_tops', '_maxHeight')
+
+    def __init__(self, pageInfos, frameSize):
+        w, h = frameSize.width(), frameSize.height()
+
+        self._links = []
+        self._rects = []
+        bounds = numpy.empty((len(pageInfos.links()), 4))
+        for i, (rect, link) in enumerate(pageInfos.relativeLinks()):
+            (x1, y1), (x2, y2) = rect
+            self._links.append(link)
+            self._rects.append((QtCore.QRectF(x1 * w, (1 - y2) * h - 1,
+                                              (x2 - x1) * w, (y2 - y1) * h),
+                                link))
+            # PDF coordinates have their origin at the bottom:
+            bounds[i] = (x1 * w, (1 - y2) * h, x2 * w, (1 - y1) * h)
+
+        self._order = numpy.argsort(bounds[:,1], kind = 'stable')
+        self._bounds = bounds[self._order]
+        self._tops = self._bounds[:,1]
+        heights = self._bounds[:,3] - self._tops
+        self._maxHeight = max(0.0, heights.max()) if len(heights) else 0.0
+
+    def __len__(self):
+        return len(self._links)
+
+    def linkRects(self):
+        """Return list of (QRectF, link) pairs."""
+        return self._rects
+
+    def linkAt(self, x, y):
+        """Return first link (in PDF order) whose rect contains the
+        given point, or None."""
+        begin = numpy.searchsorted(self._tops, y - self._maxHeight, 'left')
+        end = numpy.searchsorted(self._tops, y, 'right')
+        candidates = self._bounds[begin:end]
+        hits = numpy.nonzero((candidates[:,0] <= x) & (x <= candidates[:,2]) &
+                             (y <= candidates[:,3]))[0]
+        if not len(hits):
+            return None
+        return self._links[self._order[begin + hits].min()]
+
+
 class Frame(object):
     """Single frame (PDF page) with content, header, footer.  Belongs
     to a parent Slide."""
 
-    __slots__ = ('_size', '_content', '_slide', '_pdfPageInfos')
+    __slots__ = ('_size', '_content', '_slide', '_subIndex', '_pdfPageInfos', '_links')
 
     def __init__(self, size, contentPatches, slide = None):
         self._size = size
         self._content = contentPatches
         self._slide = slide
+        self._subIndex = None
         self._pdfPageInfos = None
+        self._links = None
 
     def __repr__(self):
         return "<Frame %s, size %sx%s, %d patches>" % (
             self.frameIndex() if self._slide is not None else 'at %0xd' % id(self),
             self.sizeF().width(), self.sizeF().height(), len(self.content()))
 
-    def setSlide(self, slide):
-        """Set parent slide; expected to be called by Slide.addFrame()."""
+    def setSlide(self, slide, subIndex = None):
+        """Set parent slide; expected to be called by Slide.addFrame().
+        The optional subIndex is cached for subIndex()."""
         self._slide = slide
+        self._subIndex = subIndex
 
     def slide(self):
         """Return slide this frame belongs to (one level up in the
@@ -226,35 +311,29 @@ class Frame(object):
 
     def setPDFPageInfos(self, infos):
         self._pdfPageInfos = infos
+        self._links = None
+
+    def links(self):
+        """Return FrameLinks (or None without PDFPageInfos); computed on first use."""
+        if self._links is None and self._pdfPageInfos:
+            self._links = FrameLinks(self._pdfPageInfos, self._size)
+        return self._links
 
     def linkRects(self, onlyExternal = True):
-        if not self._pdfPageInfos:
+        links = self.links()
+        if not links:
             return
 
-        frameSize = self.sizeF()
-
-        for rect, link in self._pdfPageInfos.relativeLinks():
+        for rect, link in links.linkRects():
             if onlyExternal and isinstance(link, int):
                 continue
-            x1, y1 = rect[0]
-            w, h = rect[1] - rect[0]
-            yield (QtCore.QRectF(x1 * frameSize.width(),
-                                 (1 - y1 - h) * frameSize.height() - 1,
-                                 w * frameSize.width(),
-                                 h * frameSize.height()),
-                   link)
+            yield rect, link
 
     def linkAt(self, pos):
-        if not self._pdfPageInfos:
+        links = self.links()
+        if not links:
             return None
-        
-        frameSize = self.sizeF()
-        relPos = (pos.x() / frameSize.width(),
-                  (frameSize.height() - pos.y()) / frameSize.height())
-        for rect, link in self._pdfPageInfos.relativeLinks():
-            if numpy.all((relPos >= rect[0]) * (relPos <= rect[1])):
-                return link
-        return None
+        return links.linkAt(pos.x(), pos.y())
 
     def isSuccessorOf(self, other):
         """Return whether this Frame is likely to be the 'successor'
@@ -268,15 +347,11 @@ class Frame(object):
 
         if self.header() == other.header():
             return True
-        
+
+        patches = set(self._content)
+        rectKeys = set(patch.rectKey() for patch in self._content)
         for patch in other.content():
-            found = patch in self._content
-            if not found:
-                for replacement in self._content:
-                    if replacement.isSuccessorOf(patch):
-                        found = True
-                        break
-            if not found:
+            if patch not in patches and patch.rectKey() not in rectKeys:
                 return False
 
         return True
@@ -291,7 +366,9 @@ class Frame(object):
         self._size = QtCore.QSizeF(w, h)
         self._content = content
         self._slide = slide
+        self._subIndex = None
         self._pdfPageInfos = None
+        self._links = None
 
 
 class Slide(object):
@@ -299,11 +376,13 @@ class Slide(object):
     represent transition states of the same presentation slide.  It is
     assumed that all frames have the same size."""
     
-    __slots__ = ('_presentation', '_frames', '_currentSubIndex', '_seen')
+    __slots__ = ('_presentation', '_slideIndex', '_frames', '_currentSubIndex', '_seen',
+                 '__weakref__') # (cf. slide_renderer.staticLayers())
     
     def __init__(self, presentation):
         assert presentation is not None
         self._presentation = presentation
+        self._slideIndex = None
         self._frames = []
 
         self._currentSubIndex = None
@@ -316,7 +395,12 @@ class Slide(object):
         return self._presentation
 
     def slideIndex(self):
-        return self._presentation.index(self)
+        # index cached by Presentation.structureChanged(), verified
+        # in O(1) before use:
+        i = self._slideIndex
+        if i is None or i >= len(self._presentation) or self._presentation[i] is not self:
+            i = self._slideIndex = self._presentation.index(self)
+        return i
 
     def __len__(self):
         return len(self._frames)
@@ -325,7 +409,11 @@ class Slide(object):
         return self.frame(subIndex)
 
     def index(self, frame):
-        return self._frames.index(frame)
+        i = frame._subIndex if frame._slide is self else None
+        if i is None or i >= len(self._frames) or self._frames[i] is not frame:
+            i = self._frames.index(frame)
+            frame._subIndex = i
+        return i
 
     def contentRect(self, margin = 0):
         result = QtCore.QRectF(QtCore.QPointF(0, 0), self.sizeF())
@@ -348,8 +436,8 @@ class Slide(object):
         if len(self._frames):
             assert frame.sizeF() == self.sizeF()
         
+        frame.setSlide(self, len(self._frames))
         self._frames.append(frame)
-        frame.setSlide(self)
 
     def frame(self, subIndex):
         return self._frames[subIndex]
@@ -383,12 +471,130 @@ class Slide(object):
     def __setstate__(self, state):
         frames, = state
         self._presentation = None
+        self._slideIndex = None
         self._frames = frames
         # __init__ is not called:
         self._currentSubIndex = None
         self._seen = None
 
 
+class PatchTable(object):
+    """Struct-of-arrays table of all distinct Patches of a sequence of
+    Frames, for vectorized whole-presentation queries.
+
+    Row i describes patches()[i]; the columns are NumPy arrays x, y,
+    w, h (float, since FLAG_RECT patches have float geometry), flags,
+    color (QColor.rgb() or 0), occurrenceCount, pixelCount and
+    imageOffset (offset of the patch's pixels within a virtual buffer
+    containing all patch images one after another).  The patch rows of
+    each frame are stored in CSR fashion (cf. frameRows()).
+
+    The table is a snapshot; the Patch objects still own the image
+    data.  The flags column is re-read by all flag-based queries if any
+    flag has been changed in the meantime (or explicitly by
+    updateFlags())."""
+
+    def __init__(self, frames):
+        self._patches = []
+        rowOfPatch = {}
+        frameRows = []
+        frameOffsets = [0]
+        for frame in frames:
+            for patch in frame.content():
+                row = rowOfPatch.get(patch)
+                if row is None:
+                    row = rowOfPatch[patch] = len(self._patches)
+                    self._patches.append(patch)
+                frameRows.append(row)
+            frameOffsets.append(len(frameRows))
+        self._rowOfPatch = rowOfPatch
+        self._frameRows = numpy.array(frameRows, dtype = numpy.int32)
+        self.frameOffsets = numpy.array(frameOffsets, dtype = numpy.int64)
+
+        n = len(self._patches)
+        self.x = numpy.empty(n)
+        self.y = numpy.empty(n)
+        self.w = numpy.empty(n)
+        self.h = numpy.empty(n)
+        self.flags = numpy.empty(n, dtype = numpy.uint32)
+        self.color = numpy.zeros(n, dtype = numpy.uint32)
+        self.occurrenceCount = numpy.empty(n, dtype = numpy.int32)
+        for i, patch in enumerate(self._patches):
+            pos = patch.pos()
+            self.x[i], self.y[i] = pos.x(), pos.y()
+            size = patch._image.size() if not patch.flag(Patch.FLAG_RECT) else patch._image
+            self.w[i], self.h[i] = size.width(), size.height()
+            self.occurrenceCount[i] = patch.occurrenceCount()
+            if patch.color() is not None:
+                self.color[i] = patch.color().rgb()
+        self.updateFlags()
+
+        self.pixelCount = numpy.where(
+            self.flags & Patch.FLAG_RECT, 0, self.w * self.h).astype(numpy.int64)
+        self.imageOffset = numpy.concatenate(([0], numpy.cumsum(self.pixelCount)[:-1]))
+
+    def updateFlags(self):
+        """Re-read the flags of all patches (e.g. after navigation
+        classification)."""
+        self.flags[:] = [patch.flags() for patch in self._patches]
+        self._flagGeneration = ObjectWithFlags.flagGeneration
+
+    def _currentFlags(self):
+        """Return the flags column, re-reading it first if any flag
+        has been changed since the last updateFlags()."""
+        if self._flagGeneration != ObjectWithFlags.flagGeneration:
+            self.updateFlags()
+        return self.flags
+
+    def __len__(self):
+        return len(self._patches)
+
+    def patches(self):
+        return self._patches
+
+    def row(self, patch):
+        return self._rowOfPatch[patch]
+
+    def frameRows(self, frameIndex):
+        """Return array of rows of the patches of the given frame (in
+        content() order)."""
+        return self._frameRows[self.frameOffsets[frameIndex]:self.frameOffsets[frameIndex+1]]
+
+    def rowsWithFlags(self, mask):
+        """Return array of rows of all patches with any of the given flags set."""
+        return numpy.nonzero(self._currentFlags() & mask)[0]
+
+    def rowsAt(self, x, y, rows = None):
+        """Return (sub-)array of given rows (default: all) whose patch
+        contains the given point (QRect semantics for image patches,
+        QRectF semantics for FLAG_RECT patches)."""
+        if rows is None:
+            rows = numpy.arange(len(self))
+        x1, y1 = self.x[rows], self.y[rows]
+        # integer QRects have right() == left() + width() - 1:
+        inclusive = (self._currentFlags()[rows] & Patch.FLAG_RECT) != 0
+        x2 = x1 + self.w[rows] - (~inclusive)
+        y2 = y1 + self.h[rows] - (~inclusive)
+        return rows[(x >= x1) & (x <= x2) & (y >= y1) & (y <= y2)]
+
+    def patchesAt(self, frameIndex, pos):
+        """Vectorized variant of Frame.patchesAt() (returns list)."""
+        return [self._patches[row] for row in
+                self.rowsAt(pos.x(), pos.y(), self.frameRows(frameIndex))]
+
+    def weightedPixelCount(self):
+        """Sum of Patch.pixelCount() over all patches (monochrome
+        patches count one quarter)."""
+        weights = numpy.where(self._currentFlags() & Patch.FLAG_MONOCHROME, 0.25, 1.0)
+        return (self.pixelCount * weights).sum()
+
+    def monochromeStatistics(self):
+        """Return (number of monochrome patches, number of distinct
+        colors used by them)."""
+        monochrome = self.rowsWithFlags(Patch.FLAG_MONOCHROME)
+        return len(monochrome), len(numpy.unique(self.color[monochrome]))
+
+
 class Presentation(list):
     """List of slides."""
 
@@ -398,37 +604,36 @@ class Presentation(list):
 
     def structureChanged(self):
         """Update internal structures after Slides or Frames have been
-        added, removed, or reordered.  This function is not automatically called, but must be called for several functions to work, e.g. frameCount() or frame(idx)."""
+        added, removed, or reordered.  This function is not automatically called, but must be called for several functions to work, e.g. frameCount() or frame(idx).
+
+        Also caches the indices returned by Slide.slideIndex() and
+        Frame.subIndex(), which makes these (and frameIndex()) O(1)."""
         self._frame2Slide = []
         self._slide2Frame = []
+        self._patchTable = None
         for i, s in enumerate(self):
             self._slide2Frame.append(len(self._frame2Slide))
             self._frame2Slide.extend([(i, j) for j in range(len(s))])
             s._presentation = self
+            s._slideIndex = i
+            for j, frame in enumerate(s._frames):
+                frame.setSlide(s, j)
 
     def pdfInfos(self):
         return self._pdfInfos
 
-    def _beamerSubIndices(self):
-        if self._pdfInfos:
-            try:
-                it = iter(pdf_infos.labeledBeamerFrames(self._pdfInfos))
-                name, pages = next(it)
-                for pageNumber in itertools.count():
-                    if pageNumber > pages[-1]:
-                        name, pages = next(it)
-                    if pageNumber in pages:
-                        yield pages.index(pageNumber)
-                    else:
-                        yield None
-            except StopIteration:
-                pass
-        while True:
-            yield None
+    def _beamerSubIndex(self, pageIndex):
+        """Return sub-index of the given page within its labeled
+        beamer frame, or None if unknown (cf. PDFInfos.beamerFrames())."""
+        if not self._pdfInfos:
+            return None
+        label, subIndex = self._pdfInfos.beamerFrames().get(pageIndex, (None, None))
+        return subIndex
 
     def addFrames(self, frames):
         prevFrame = None
-        for frame, subIndex in zip(frames, self._beamerSubIndices()):
+        for pageIndex, frame in enumerate(frames):
+            subIndex = self._beamerSubIndex(pageIndex)
             # new Slide?
             if not prevFrame or subIndex == 0 or (
                     subIndex is None and not frame.isSuccessorOf(prevFrame)):
@@ -467,7 +672,7 @@ class Presentation(list):
         return self[slideIndex][subIndex]
 
     def frameIndex(self, frame):
-        slideIndex = self.index(frame.slide())
+        slideIndex = frame.slide().slideIndex()
         return self._slide2Frame[slideIndex] + frame.subIndex()
 
     def setPDFInfos(self, infos):
@@ -477,15 +682,19 @@ class Presentation(list):
             for frame, pageInfos in zip(self.frames(), infos):
                 frame.setPDFPageInfos(pageInfos)
 
+    def patchTable(self):
+        """Return PatchTable of all frames (built on first use after
+        structureChanged())."""
+        if self._patchTable is None:
+            self._patchTable = PatchTable(self.frames())
+        return self._patchTable
+
     def patchSet(self):
         """mostly for debugging/statistics: set of Patch objects"""
-        return set.union(*[frame.patchSet() for frame in self.frames()])
+        return set(self.patchTable().patches())
 
     def pixelCount(self):
-        result = 0
-        for patch in self.patchSet():
-            result += patch.pixelCount()
-        return result
+        return self.patchTable().weightedPixelCount()
 
     def __getnewargs__(self):
         return (list(self), )
@@ -0,0 +1,138 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Progress reporting and per-stage timing for the decomposition
+pipeline."""
+
+import collections, contextlib, json, sys, time
+from . import tracing
+
+# stages of decompose_pdf() / decompose_pages(), in pipeline order:
+STAGES = ('render', 'background', 'labelling', 'alpha', 'dedup',
+          'merge', 'extract', 'classify', 'group')
+
+
+class Progress(object):
+    """Collects wall clock and CPU times per stage (accumulated over
+    all times a stage() is entered) and named counts, and passes
+    events to the registered callbacks.  Each event is a dict with a
+    'type' and further entries:
+
+    * 'started' / 'finished': 'stage' (plus 'wall' and 'cpu' seconds
+      for this run of the stage when finished),
+    * 'progress': 'name', 'current' and 'total' (may be None),
+    * 'done': 'statistics' (cf. statistics())."""
+
+    def __init__(self, *callbacks):
+        self._callbacks = list(callbacks)
+        self._stages = collections.OrderedDict()
+        self._counts = collections.OrderedDict()
+        self._position = {} # last progress update (for tracing)
+
+    def addCallback(self, callback):
+        self._callbacks.append(callback)
+
+    def removeCallback(self, callback):
+        self._callbacks.remove(callback)
+
+    def _emit(self, **event):
+        for callback in self._callbacks:
+            callback(event)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Context manager for timing one run of the given stage."""
+        self._emit(type = 'started', stage = name)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            with tracing.span(name, 'decompose', **self._position):
+                yield self
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            stats = self._stages.setdefault(name, dict(wall = 0.0, cpu = 0.0, runs = 0))
+            stats['wall'] += wall
+            stats['cpu'] += cpu
+            stats['runs'] += 1
+            self._emit(type = 'finished', stage = name, wall = wall, cpu = cpu)
+
+    def update(self, name, current, total = None):
+        """Report progress (e.g. current page of total pages)."""
+        self._position = {name: current}
+        self._emit(type = 'progress', name = name, current = current, total = total)
+
+    def count(self, name, value):
+        """Record a count (e.g. number of patches)."""
+        self._counts[name] = value
+
+    def counts(self):
+        return dict(self._counts)
+
+    def stages(self):
+        """Return OrderedDict mapping stage names to dicts with the
+        accumulated 'wall' and 'cpu' times and number of 'runs'."""
+        return collections.OrderedDict(
+            (name, dict(stats)) for name, stats in self._stages.items())
+
+    def statistics(self):
+        """Return JSON-serializable dict with stages, counts and totals."""
+        stages = self.stages()
+        return dict(stages = stages, counts = self.counts(),
+                    wall = sum(stats['wall'] for stats in stages.values()),
+                    cpu = sum(stats['cpu'] for stats in stages.values()))
+
+    def done(self):
+        """Emit final 'done' event with the statistics()."""
+        self._emit(type = 'done', statistics = self.statistics())
+
+    def writeJSON(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.statistics(), f, indent = 1)
+
+
+class ConsoleReporter(object):
+    """Progress callback writing progress lines and a summary to a
+    stream (default: sys.stdout)."""
+
+    def __init__(self, stream = None):
+        self._stream = stream
+        self._pendingLine = None # name of progress shown in current line
+
+    def _write(self, text):
+        stream = self._stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    def __call__(self, event):
+        if event['type'] == 'progress':
+            if self._pendingLine not in (None, event['name']):
+                self._write("\n")
+            total = " / %d" % event['total'] if event['total'] is not None else ""
+            self._write("\r%s %d%s..." % (event['name'], event['current'], total))
+            self._pendingLine = event['name']
+        elif event['type'] == 'done':
+            if self._pendingLine is not None:
+                self._write("\n")
+                self._pendingLine = None
+            statistics = event['statistics']
+            counts = statistics['counts']
+            if 'slides' in counts:
+                self._write("%d slides, %d frames, %d distinct patches (of %d) before merging, %d monochrome (%d colors)\n" % (
+                    counts['slides'], counts['frames'],
+                    counts['uniquePatches'], counts['rawPatches'],
+                    counts['monochromePatches'], counts['monochromeColors']))
+            self._write("%s\ncomplete decomposition took %.3gs. (%.3gs. real time)\n" % (
+                ", ".join("%s: %.3gs." % (name, stats['cpu'])
+                          for name, stats in statistics['stages'].items()),
+                statistics['cpu'], statistics['wall']))
@@ -0,0 +1,364 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Local HTTP service decomposing PDFs for other machines, and the
+corresponding client (cf. PDFDecanter.setDecompositionService()).
+Run the server as
+
+  python -m pdf_decanter.service [--port 8765] [--workers N] [--queue N]
+
+Protocol (all responses except cache downloads are JSON):
+
+* POST /jobs?width=W&height=H with the PDF as body submits a job
+  (202, 503 if the job queue is full, or 413 if the PDF is too
+  large); identical submissions share one job,
+* GET /jobs/<id>?since=N returns 'status' (queued, running, done or
+  failed), 'error', and the progress events (cf. progress.Progress)
+  starting at index N,
+* GET /jobs/<id>/cache downloads the resulting cache file.
+
+Finished jobs (and their files) are forgotten after JOB_EXPIRY seconds."""
+
+import os, json, time, hashlib, tempfile, threading, queue
+import concurrent.futures, multiprocessing
+import urllib.request, urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from optparse import OptionParser
+from . import cache, decomposer
+from .progress import Progress
+
+DEFAULT_PORT = 8765
+# maximum number of queued or running jobs:
+MAX_QUEUED_JOBS = 16
+# maximum size (bytes) of uploaded PDFs:
+MAX_UPLOAD_SIZE = 100 * 1024**2
+# seconds after which finished jobs (and their cache files) are removed:
+JOB_EXPIRY = 3600
+# seconds between two status requests of fetch_cache():
+POLL_INTERVAL = 0.5
+
+
+def _decompose(jobId, pdfFilename, slideSize, cacheFilename, events):
+    """Job function (run in the worker pool): decompose the PDF and
+    write the cache file, putting (jobId, event) pairs into events."""
+    def forward(event):
+        if event['type'] != 'started':
+            events.put((jobId, event))
+    progress = Progress(forward)
+    slides = decomposer.decompose_pdf(pdfFilename, sizePX = slideSize, progress = progress)
+    cache.writeCache(cacheFilename, slides)
+
+
+class Job(object):
+    def __init__(self, jobId, slideSize):
+        self.id = jobId
+        self.slideSize = slideSize
+        self.status = 'queued'
+        self.error = None
+        self.events = []
+        self.finishedTime = None
+
+    def state(self, since = 0):
+        return dict(id = self.id, size = list(self.slideSize), status = self.status,
+                    error = self.error, events = self.events[since:])
+
+
+class DecompositionService(object):
+    """Job queue with a bounded pool of worker processes (or threads,
+    if processes is False) and an HTTP server for submitting jobs,
+    polling their progress and downloading the resulting caches."""
+
+    def __init__(self, address = ('127.0.0.1', DEFAULT_PORT), workers = None,
+                 maxQueuedJobs = MAX_QUEUED_JOBS, directory = None, processes = True,
+                 maxUploadSize = MAX_UPLOAD_SIZE, jobExpiry = JOB_EXPIRY):
+        self._directory = directory or tempfile.mkdtemp(prefix = 'pdf_decanter_service_')
+        self._maxQueuedJobs = maxQueuedJobs
+        self._maxUploadSize = maxUploadSize
+        self._jobExpiry = jobExpiry
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+        if processes:
+            self._executor = concurrent.futures.ProcessPoolExecutor(workers)
+            self._manager = multiprocessing.Manager()
+            self._events = self._manager.Queue()
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+            self._manager = None
+            self._events = queue.Queue()
+
+        self._eventThread = threading.Thread(target = self._collectEvents)
+        self._eventThread.daemon = True
+        self._eventThread.start()
+
+        self._server = ThreadingHTTPServer(address, _requestHandler(self))
+        self._serverThread = None
+
+    def address(self):
+        return self._server.server_address
+
+    def directory(self):
+        """Return directory containing uploaded PDFs and cache files."""
+        return self._directory
+
+    def maxUploadSize(self):
+        return self._maxUploadSize
+
+    def url(self):
+        host, port = self.address()[:2]
+        return "http://%s:%d" % (host, port)
+
+    def serveForever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self._serverThread = threading.Thread(target = self._server.serve_forever)
+        self._serverThread.daemon = True
+        self._serverThread.start()
+
+    def shutdown(self):
+        if self._serverThread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+        self._executor.shutdown(wait = True)
+        self._events.put(None) # stops _collectEvents()
+        self._eventThread.join()
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    def _collectEvents(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                break
+            jobId, event = item
+            with self._lock:
+                job = self._jobs[jobId]
+                if event is None:
+                    # queued by _jobFinished() after all of the job's
+                    # events, so clients see them before the status:
+                    job.status = 'failed' if job.error else 'done'
+                    job.finishedTime = time.time()
+                    self._removeFile(self.pdfFilename(jobId))
+                    continue
+                if job.status == 'queued':
+                    job.status = 'running'
+                job.events.append(event)
+
+    def _removeFile(self, filename):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    def _pruneJobs(self):
+        """Forget expired jobs and remove their cache files (called
+        with self._lock held)."""
+        expired = time.time() - self._jobExpiry
+        for jobId, job in list(self._jobs.items()):
+            if job.finishedTime is not None and job.finishedTime <= expired:
+                del self._jobs[jobId]
+                self._removeFile(self.cacheFilename(jobId))
+
+    def pendingJobCount(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values()
+                       if job.status in ('queued', 'running'))
+
+    def submit(self, pdfData, slideSize):
+        """Queue decomposition of the given PDF contents (bytes) and
+        return the Job, or None if the queue is full."""
+        slideSize = tuple(slideSize)
+        jobId = "%s_%dx%d" % ((hashlib.sha1(pdfData).hexdigest(), ) + slideSize)
+        with self._lock:
+            self._pruneJobs()
+            job = self._jobs.get(jobId)
+            if job is not None and job.status != 'failed':
+                return job
+            if sum(1 for job in self._jobs.values()
+                   if job.status in ('queued', 'running')) >= self._maxQueuedJobs:
+                return None
+
+            pdfFilename = self.pdfFilename(jobId)
+            with open(pdfFilename, 'wb') as f:
+                f.write(pdfData)
+            job = self._jobs[jobId] = Job(jobId, slideSize)
+
+        future = self._executor.submit(
+            _decompose, jobId, pdfFilename, slideSize, self.cacheFilename(jobId), self._events)
+        future.add_done_callback(lambda future: self._jobFinished(job, future))
+        return job
+
+    def _jobFinished(self, job, future):
+        error = future.exception()
+        if error is not None:
+            with self._lock:
+                job.error = str(error) or type(error).__name__
+        # (the status is set by _collectEvents())
+        self._events.put((job.id, None))
+
+    def jobState(self, jobId, since = 0):
+        with self._lock:
+            self._pruneJobs()
+            job = self._jobs.get(jobId)
+            return job and job.state(since)
+
+    def pdfFilename(self, jobId):
+        return os.path.join(self._directory, jobId + '.pdf')
+
+    def cacheFilename(self, jobId):
+        return os.path.join(self._directory, jobId + '.bz2')
+
+
+def _requestHandler(service):
+    class RequestHandler(BaseHTTPRequestHandler):
+        def _sendJSON(self, code, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _parts(self):
+            url = urllib.parse.urlsplit(self.path)
+            return ([part for part in url.path.split('/') if part],
+                    dict(urllib.parse.parse_qsl(url.query)))
+
+        def do_POST(self):
+            parts, query = self._parts()
+            if parts != ['jobs']:
+                return self._sendJSON(404, dict(error = 'not found'))
+            try:
+                slideSize = (int(query['width']), int(query['height']))
+            except (KeyError, ValueError):
+                return self._sendJSON(400, dict(error = 'width and height required'))
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                return self._sendJSON(400, dict(error = 'invalid Content-Length'))
+            if length > service.maxUploadSize():
+                self.close_connection = True # (body is not read)
+                return self._sendJSON(413, dict(error = 'PDF too large'))
+            pdfData = self.rfile.read(length)
+            job = service.submit(pdfData, slideSize)
+            if job is None:
+                return self._sendJSON(503, dict(error = 'job queue full'))
+            self._sendJSON(202, service.jobState(job.id))
+
+        def do_GET(self):
+            parts, query = self._parts()
+            if len(parts) < 2 or parts[0] != 'jobs':
+                return self._sendJSON(404, dict(error = 'not found'))
+            state = service.jobState(parts[1], int(query.get('since', 0)))
+            if state is None:
+                return self._sendJSON(404, dict(error = 'unknown job'))
+            if parts[2:] == ['cache']:
+                if state['status'] != 'done':
+                    return self._sendJSON(409, dict(error = 'job is %s' % state['status']))
+                try:
+                    with open(service.cacheFilename(parts[1]), 'rb') as f:
+                        data = f.read()
+                except IOError:
+                    return self._sendJSON(404, dict(error = 'job expired'))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif not parts[2:]:
+                self._sendJSON(200, state)
+            else:
+                self._sendJSON(404, dict(error = 'not found'))
+
+        def log_message(self, format, *args):
+            pass # no logging of every status request
+
+    return RequestHandler
+
+
+def _requestJSON(url, data = None, timeout = None):
+    with urllib.request.urlopen(url, data, timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def fetch_cache(serviceURL, pdfFilename, slideSize, cacheFilename,
+                progress = None, timeout = None, pollInterval = POLL_INTERVAL):
+    """Let the service at serviceURL decompose the given PDF and
+    download the resulting cache file to cacheFilename.  Progress
+    events of the service are passed on to the given Progress.
+    Raises IOError (e.g. urllib.error.URLError) if the service is not
+    reachable, the job fails, or the timeout (seconds) expires."""
+    with open(pdfFilename, 'rb') as f:
+        pdfData = f.read()
+    w, h = slideSize
+    state = _requestJSON("%s/jobs?width=%d&height=%d" % (serviceURL, w, h),
+                         pdfData, timeout)
+    jobURL = "%s/jobs/%s" % (serviceURL, state['id'])
+
+    startTime = time.time()
+    eventCount = 0
+    while True:
+        state = _requestJSON("%s?since=%d" % (jobURL, eventCount), timeout = timeout)
+        eventCount += len(state['events'])
+        if progress is not None:
+            for event in state['events']:
+                if event['type'] == 'progress':
+                    progress.update(event['name'], event['current'], event['total'])
+        if state['status'] == 'done':
+            break
+        if state['status'] == 'failed':
+            raise IOError("decomposition service failed: %s" % state['error'])
+        if timeout is not None and time.time() - startTime > timeout:
+            raise IOError("decomposition service timed out")
+        time.sleep(pollInterval)
+
+    with urllib.request.urlopen(jobURL + '/cache', timeout = timeout) as response:
+        data = response.read()
+    with open(cacheFilename, 'wb') as f:
+        f.write(data)
+
+
+def main(argv = None):
+    op = OptionParser(usage = "%prog [options]")
+    op.add_option("--host", default = '127.0.0.1',
+                  help = "address to listen on (default: %default)")
+    op.add_option("--port", "-p", type = "int", default = DEFAULT_PORT,
+                  help = "port to listen on (default: %default)")
+    op.add_option("--workers", "-j", type = "int", default = None,
+                  help = "number of worker processes (default: number of CPUs)")
+    op.add_option("--queue", type = "int", default = MAX_QUEUED_JOBS,
+                  help = "maximum number of queued or running jobs (default: %default)")
+    op.add_option("--directory", default = None,
+                  help = "directory for uploaded PDFs and cache files (default: temporary)")
+    op.add_option("--max-upload", type = "int", default = MAX_UPLOAD_SIZE // 1024**2, metavar = "MB",
+                  help = "maximum size of uploaded PDFs (default: %default)")
+    op.add_option("--expiry", type = "int", default = JOB_EXPIRY, metavar = "SECONDS",
+                  help = "time after which finished jobs and their caches are removed (default: %default)")
+    options, args = op.parse_args(argv)
+
+    service = DecompositionService((options.host, options.port), options.workers,
+                                   options.queue, options.directory,
+                                   maxUploadSize = options.max_upload * 1024**2,
+                                   jobExpiry = options.expiry)
+    print("serving on %s (files in %s)" % (service.url(), service.directory()))
+    try:
+        service.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,13 +12,24 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import collections
+import collections, weakref
 from .dynqt import QtCore, QtGui, QtWidgets, getprop as p
-from . import presentation
+from . import presentation, pixmap_cache, transitions, texture_atlas, movies
 
 UNSEEN_OPACITY = 0.5
 FADE_DURATION = 150
 SLIDE_DURATION = 250
+# resolution of thumbnails, which are used (instead of one item per
+# Patch) when renderers are displayed at smaller scales (overview):
+THUMBNAIL_SCALE = 0.5
+# flatten Patches that are present in all frames of a Slide into one
+# pixmap per layer (cf. StaticLayer, setCompositeStaticLayers()):
+COMPOSITE_STATIC_LAYERS = False
+# minimum number of patches for flattening a layer:
+MIN_STATIC_LAYER_PATCHES = 2
+# draw Patch images from shared texture atlases, batched per layer
+# (cf. AtlasPatchItem, PatchBatchItem, setUseTextureAtlas()):
+USE_TEXTURE_ATLAS = False
 
 def _frameBoundingRect(item):
     result = QtCore.QRectF(item.boundingRect())
@@ -31,6 +42,298 @@ def _frameBoundingRect(item):
     result.translate(pos)
     return result
 
+def renderFrame(frame, scale = 1.0):
+    """Render Patches of given frame into a QImage of the given scale
+    (i.e. without movies or custom content)."""
+    size = (frame.sizeF() * scale).toSize()
+    result = QtGui.QImage(size, QtGui.QImage.Format_ARGB32_Premultiplied)
+    result.fill(0)
+
+    painter = QtGui.QPainter(result)
+    painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+    painter.scale(scale, scale)
+
+    # same stacking order as with items ('bg' layer at the bottom):
+    def isBackground(patch):
+        return (patch.flag(presentation.Patch.FLAG_RECT) and
+                not patch.flag(presentation.Patch.MASK_NAVIGATION))
+    content = frame.content()
+    for patch in ([patch for patch in content if isBackground(patch)] +
+                  [patch for patch in content if not isBackground(patch)]):
+        if patch.flag(presentation.Patch.FLAG_RECT):
+            painter.fillRect(patch.boundingRect(), patch.color())
+        else:
+            painter.drawImage(QtCore.QPointF(patch.pos()), patch.image())
+
+    painter.end()
+    return result
+
+
+class StaticLayer(object):
+    """Patches of one layer (cf. FrameRenderer._patchLayer()) that are
+    present in all frames of a Slide, flattened into a single pixmap.
+    Provides the part of the Patch API needed for rendering and by
+    the PixmapCache."""
+
+    __slots__ = ('_layer', '_patches', '_rect', '_pixmap', '__weakref__')
+
+    def __init__(self, layer, patches):
+        self._layer = layer
+        self._patches = patches
+        self._rect = presentation.boundingRect(
+            patch.boundingRect() for patch in patches)
+        self._pixmap = None
+
+    def __repr__(self):
+        return "<StaticLayer %r, %d patches at %d, %d, %dx%d>" % (
+            self._layer, len(self._patches), self._rect.x(), self._rect.y(),
+            self._rect.width(), self._rect.height())
+
+    def layer(self):
+        return self._layer
+
+    def patches(self):
+        return self._patches
+
+    def flag(self, flag):
+        return False
+
+    def pos(self):
+        return self._rect.topLeft()
+
+    def boundingRect(self):
+        return QtCore.QRect(self._rect)
+
+    def patchAt(self, pos):
+        """Return topmost patch at the given (frame) position, or None."""
+        for patch in reversed(self._patches):
+            if QtCore.QRectF(patch.boundingRect()).contains(pos):
+                return patch
+        return None
+
+    def image(self):
+        result = QtGui.QImage(self._rect.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        result.fill(0)
+
+        painter = QtGui.QPainter(result)
+        painter.translate(-QtCore.QPointF(self._rect.topLeft()))
+        for patch in self._patches:
+            painter.drawImage(QtCore.QPointF(patch.pos()), patch.image())
+        painter.end()
+
+        return result
+
+    def pixmap(self):
+        if self._pixmap is None:
+            self._pixmap = QtGui.QPixmap.fromImage(self.image())
+        return self._pixmap
+
+    def hasPixmap(self):
+        return self._pixmap is not None
+
+    def releasePixmap(self):
+        self._pixmap = None
+
+    def pixmapBytes(self):
+        return self._rect.width() * self._rect.height() * 4
+
+
+def _createStaticLayers(slide):
+    frames = [slide[i] for i in range(len(slide))]
+    static = set(frames[0].content())
+    for frame in frames[1:]:
+        static.intersection_update(frame.content())
+
+    # patches that also occur in neighbouring slides (or have a
+    # successor there) are not animated when changing slides, so
+    # keep them separate from the (sliding) content layer:
+    slides = slide.presentation()
+    slideIndex = slide.slideIndex()
+    neighbourRects = set()
+    for i in (slideIndex - 1, slideIndex + 1):
+        if 0 <= i < len(slides):
+            for subIndex in range(len(slides[i])):
+                neighbourRects.update(patch.rectKey() for patch in slides[i].frame(subIndex).content())
+
+    candidates = set(
+        patch for patch in static
+        if not patch.flag(presentation.Patch.FLAG_RECT) and not (
+            FrameRenderer._patchLayer(patch) == 'content' and
+            patch.rectKey() in neighbourRects))
+
+    # flattened patches are rendered below the separate ones of the
+    # same layer, so the stacking order is only kept if they do not
+    # overlap separate patches that come before them:
+    changed = True
+    while changed:
+        changed = False
+        for frame in frames:
+            separateRects = collections.defaultdict(list)
+            for patch in frame.content():
+                layer = FrameRenderer._patchLayer(patch)
+                rect = QtCore.QRectF(patch.boundingRect())
+                if patch in candidates:
+                    if not any(rect.intersects(r) for r in separateRects[layer]):
+                        continue
+                    candidates.discard(patch)
+                    changed = True
+                separateRects[layer].append(rect)
+
+    layerPatches = collections.defaultdict(list)
+    for patch in frames[0].content():
+        if patch in candidates:
+            layerPatches[FrameRenderer._patchLayer(patch)].append(patch)
+
+    return [StaticLayer(layer, patches)
+            for layer, patches in sorted(layerPatches.items())
+            if len(patches) >= MIN_STATIC_LAYER_PATCHES]
+
+# (weak keys, so that layers of replaced presentations are freed)
+_staticLayers = weakref.WeakKeyDictionary()
+
+def staticLayers(slide):
+    """Return (cached) list of StaticLayers for the given slide."""
+    result = _staticLayers.get(slide)
+    if result is None:
+        result = _staticLayers[slide] = _createStaticLayers(slide)
+    return result
+
+def clearStaticLayers(slides = None):
+    """Forget StaticLayers of the given slides (default: all),
+    e.g. after header / footer flags changed."""
+    for slide in list(_staticLayers) if slides is None else slides:
+        for staticLayer in _staticLayers.pop(slide, ()):
+            staticLayer.releasePixmap()
+            texture_atlas.atlas.release(staticLayer)
+
+def setCompositeStaticLayers(onoff):
+    """Switch COMPOSITE_STATIC_LAYERS mode (existing FrameRenderers
+    need to resetItems())."""
+    global COMPOSITE_STATIC_LAYERS
+    COMPOSITE_STATIC_LAYERS = bool(onoff)
+    clearStaticLayers()
+
+def frameContent(frame):
+    """Return list of Patches and StaticLayers to be rendered for the
+    given frame (in stacking order within each layer)."""
+    if not COMPOSITE_STATIC_LAYERS or frame.slide() is None:
+        return frame.content()
+    layers = staticLayers(frame.slide())
+    if not layers:
+        return frame.content()
+    flattened = set()
+    for staticLayer in layers:
+        flattened.update(staticLayer.patches())
+    return layers + [patch for patch in frame.content() if patch not in flattened]
+
+
+def setUseTextureAtlas(onoff):
+    """Switch USE_TEXTURE_ATLAS mode (existing FrameRenderers need
+    to resetItems())."""
+    global USE_TEXTURE_ATLAS
+    USE_TEXTURE_ATLAS = bool(onoff)
+
+
+class AtlasPatchItem(QtWidgets.QGraphicsItem):
+    """Item representing a Patch (or StaticLayer) whose image is
+    stored in the texture_atlas.  Usually, it does not paint itself;
+    instead, the parent PatchBatchItem draws all its AtlasPatchItem
+    children with few batched calls.  Only items stacked above other
+    (non-atlas) children paint themselves (cf. setBatched())."""
+
+    def __init__(self, patch):
+        QtWidgets.QGraphicsItem.__init__(self)
+        self._patch = patch
+        self._rect = QtCore.QRectF(QtCore.QPointF(0, 0), QtCore.QSizeF(patch.boundingRect().size()))
+        self.setFlag(QtWidgets.QGraphicsItem.ItemHasNoContents)
+        self.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+        self.setPos(QtCore.QPointF(patch.pos()))
+
+    def patch(self):
+        return self._patch
+
+    def boundingRect(self):
+        return self._rect
+
+    def isBatched(self):
+        return bool(self.flags() & QtWidgets.QGraphicsItem.ItemHasNoContents)
+
+    def setBatched(self, onoff):
+        """Set whether the item is drawn by its parent PatchBatchItem
+        (default) or paints itself."""
+        if onoff != self.isBatched():
+            self.setFlag(QtWidgets.QGraphicsItem.ItemHasNoContents, onoff)
+
+    def paint(self, painter, option, widget = None):
+        atlas = texture_atlas.atlas
+        location = atlas.location(self._patch)
+        if location is None:
+            painter.drawPixmap(QtCore.QPointF(0, 0), pixmap_cache.cache.pixmap(self._patch))
+        else:
+            pageIndex, sourceRect = location
+            painter.drawPixmap(self._rect, atlas.pixmap(pageIndex), sourceRect)
+        atlas.countDrawCall(1)
+
+    def itemChange(self, change, value):
+        if change == QtWidgets.QGraphicsItem.ItemParentHasChanged:
+            parentItem = self.parentItem()
+            if isinstance(parentItem, PatchBatchItem):
+                parentItem.setFlag(QtWidgets.QGraphicsItem.ItemHasNoContents, False)
+        return QtWidgets.QGraphicsItem.itemChange(self, change, value)
+
+
+class PatchBatchItem(QtWidgets.QGraphicsWidget):
+    """Container for the items of one layer (cf.
+    FrameRenderer._contentItem()) that draws its visible
+    AtlasPatchItem children with one QPainter.drawPixmapFragments()
+    call per run of children on the same atlas page (in stacking
+    order).  Since the container is painted below all its children,
+    only the AtlasPatchItems stacked below the first other visible
+    child are batched; the remaining ones paint themselves, so that
+    the stacking order is preserved."""
+
+    def __init__(self, parentItem):
+        QtWidgets.QGraphicsWidget.__init__(self, parentItem)
+        # (until the first AtlasPatchItem child is added:)
+        self.setFlag(QtWidgets.QGraphicsItem.ItemHasNoContents)
+
+    def paint(self, painter, option, widget = None):
+        atlas = texture_atlas.atlas
+        fragments = []
+        fragmentPage = None
+        batching = True
+
+        def flush():
+            if fragments:
+                painter.drawPixmapFragments(fragments, atlas.pixmap(fragmentPage))
+                atlas.countDrawCall(len(fragments))
+                del fragments[:]
+
+        for child in self.childItems():
+            if not child.isVisible():
+                continue
+            if not isinstance(child, AtlasPatchItem):
+                batching = False
+                continue
+            child.setBatched(batching)
+            if not batching:
+                continue
+            location = atlas.location(child.patch())
+            if location is None:
+                # too large for the atlas:
+                flush()
+                painter.drawPixmap(child.pos(), pixmap_cache.cache.pixmap(child.patch()))
+                atlas.countDrawCall(1)
+                continue
+            pageIndex, sourceRect = location
+            if pageIndex != fragmentPage:
+                flush()
+                fragmentPage = pageIndex
+            fragments.append(QtGui.QPainter.PixmapFragment.create(
+                child.pos() + sourceRect.center() - sourceRect.topLeft(), sourceRect))
+        flush()
+
+
 class FrameRenderer(QtWidgets.QGraphicsWidget):
     """QGraphicsWidget that renders a Frame instance.
 
@@ -39,11 +342,17 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
     child graphics items for rendering the Frame:
 
     * one QGraphicsRectItem with the Frame.backgroundColor()
-    * one QGraphicsPixmapItem per Patch
-    * one QGraphicsProxyWidget per .mng link (movie player)
+    * one QGraphicsPixmapItem per Patch (or per StaticLayer; or an
+      AtlasPatchItem, painted by its parent PatchBatchItem)
+    * one MoviePlayer per .mng link (only playing while
+      setMoviesPlaying(True), e.g. for the current frame)
     * one QGraphicsRectItem for implementing the 'covered' state
     * custom items
-    * optionally, QGraphicsRectItems for debugging link rects"""
+    * optionally, QGraphicsRectItems for debugging link rects
+
+    In thumbnail mode (cf. setThumbnailMode()), the Patch items are
+    hidden and a single, downscaled QGraphicsPixmapItem of the whole
+    frame is shown instead."""
 
     BACKGROUND_LAYER = -1
     # CONTENT_LAYER = 0
@@ -65,8 +374,14 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
 
         self._frame = None
         self._linkHandler = None
+        self._transitionPlanner = None
         self._helperItems = {}
         self._items = {}
+        # items created in advance by prepareFrame(), same structure:
+        self._preparedItems = {}
+        pixmap_cache.cache.addOwner(self)
+        self._itemsReleased = False
+        self._changingFrame = False
         # possible keys:
         # - Patch instances
         # - links (as string)
@@ -77,9 +392,19 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
         self._animation = None
         self._staticParents = {}
 
+        self._thumbnailMode = False
+        self._thumbnailFrame = None
+
+        self._moviesPlaying = False
+
     def setLinkHandler(self, linkHandler):
         self._linkHandler = linkHandler
 
+    def setTransitionPlanner(self, planner):
+        """Use precomputed plans of the given TransitionPlanner in
+        animatedTransition() (cf. transitions module)."""
+        self._transitionPlanner = planner
+
     @classmethod
     def addCustomFrameContent(cls, items, frame):
         """Add given custom items for the given frame."""
@@ -98,6 +423,92 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
             assert item.parentItem() is not None
             cls._originalCustomItemState[item] = item.parentItem()
 
+    @staticmethod
+    def _patchLayer(patch):
+        if isinstance(patch, StaticLayer):
+            return patch.layer()
+        if patch.flag(presentation.Patch.FLAG_HEADER):
+            return 'header'
+        elif patch.flag(presentation.Patch.FLAG_FOOTER):
+            return 'footer'
+        elif patch.flag(presentation.Patch.FLAG_RECT):
+            return 'bg'
+        return 'content'
+
+    @staticmethod
+    def _createPatchItem(patch):
+        if patch.flag(presentation.Patch.FLAG_RECT):
+            item = QtWidgets.QGraphicsRectItem()
+            item.setRect(patch.boundingRect())
+            item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+            item.setBrush(patch.color())
+            item.setPen(QtGui.QPen(QtCore.Qt.NoPen))
+        elif USE_TEXTURE_ATLAS:
+            item = AtlasPatchItem(patch)
+        else:
+            item = QtWidgets.QGraphicsPixmapItem()
+            item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+            item.setPos(QtCore.QPointF(patch.pos()))
+            item.setPixmap(pixmap_cache.cache.pixmap(patch))
+            item.setTransformationMode(QtCore.Qt.SmoothTransformation)
+        return item
+
+    def prepareFrame(self, frame):
+        """Create the Patch items for the given frame in advance (for
+        prefetching), so that a later transition to it does not have
+        to.  (Since prepared items are shared with the frames of the
+        same slide, there are never more of them than patches in the
+        slide.)  Returns number of newly created items."""
+        result = 0
+        for patch in frameContent(frame):
+            if patch not in self._items and patch not in self._preparedItems:
+                self._preparedItems[patch] = (
+                    self._patchLayer(patch), self._createPatchItem(patch))
+                result += 1
+        return result
+
+    def discardPreparedItems(self):
+        """Drop all items created by prepareFrame() (e.g. when the
+        prefetched frames are unlikely to be shown anymore)."""
+        self._preparedItems = {}
+
+    def releasePatchItems(self, patch):
+        """Called by the PixmapCache when the pixmap of the given
+        patch is to be evicted; drops a prepared item.  If the patch
+        is displayed, but the renderer is not on screen, its item is
+        released as well (cf. restoreItems()).  Returns True iff the
+        pixmap is still in use."""
+        if self._changingFrame:
+            return True # (new items may not be in self._items yet)
+        self._preparedItems.pop(patch, None)
+        layer, item = self._items.get(patch, (None, None))
+        if not isinstance(item, QtWidgets.QGraphicsPixmapItem):
+            return False
+        if self._animation or self.isOnScreen():
+            return True
+        self._removeItems({patch: (layer, item)})
+        self._itemsReleased = True
+        return False
+
+    def restoreItems(self):
+        """Re-create the items released by releasePatchItems() (to
+        be called when the renderer becomes visible again)."""
+        if self._itemsReleased:
+            self._setFrame(self._frame)
+
+    def isOnScreen(self):
+        """Return whether the renderer intersects the viewport of
+        any view of its scene."""
+        scene = self.scene()
+        if scene is None or not self.isVisible():
+            return False
+        rect = self.sceneBoundingRect()
+        for view in scene.views():
+            visibleRect = view.mapToScene(view.viewport().rect()).boundingRect()
+            if visibleRect.intersects(rect):
+                return True
+        return False
+
     def _frameItems(self, frame):
         """Return list of (layer, item) pairs with all items necessary for
         rendering the given frame.  Each `layer` is a string that
@@ -107,14 +518,17 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
             """Local class, because this is closely tied to the algorithm of the
             surrounding function."""
             
-            def __init__(self, items):
+            def __init__(self, items, preparedItems):
                 self._existingItems = items
+                self._preparedItems = preparedItems
                 self._newItems = {}
                 self._lastQueriedKey = None
             
             def get_existing_item(self, key):
                 self._lastQueriedKey = key
                 layer, item = self._existingItems.get(key, (None, None))
+                if item is None:
+                    layer, item = self._preparedItems.get(key, (None, None))
                 return item
 
             def add(self, item, layer, key = None):
@@ -133,62 +547,37 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
             def added(self):
                 return self._newItems
         
-        result = ResultItems(self._items)
+        result = ResultItems(self._items, self._preparedItems)
 
         debugRects = []
 
         # frame contents
-        for patch in frame.content():
+        for patch in frameContent(frame):
             item = result.get_existing_item(key = patch)
             if item is None:
-                if patch.flag(presentation.Patch.FLAG_RECT):
-                    item = QtWidgets.QGraphicsRectItem()
-                    item.setRect(patch.boundingRect())
-                    item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
-                    item.setBrush(patch.color())
-                    item.setPen(QtGui.QPen(QtCore.Qt.NoPen))
-                else:
-                    item = QtWidgets.QGraphicsPixmapItem()
-                    item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
-                    item.setPos(QtCore.QPointF(patch.pos()))
-                    item.setPixmap(patch.pixmap())
-                    item.setTransformationMode(QtCore.Qt.SmoothTransformation)
-            if patch.flag(presentation.Patch.FLAG_HEADER):
-                layer = 'header'
-            elif patch.flag(presentation.Patch.FLAG_FOOTER):
-                layer = 'footer'
-            elif patch.flag(presentation.Patch.FLAG_RECT):
-                layer = 'bg'
-            else:
-                layer = 'content'
+                item = self._createPatchItem(patch)
+                if isinstance(patch, StaticLayer):
+                    item.setZValue(-1) # below separate patches of the layer
+            layer = self._patchLayer(patch)
             result.add(item, layer)
 
             debugRects.append(('DEBUG_%s' % patch, _frameBoundingRect(item), layer))
 
         # movies (.mng links)
-        for rect, link in frame.linkRects(): # FIXME: does not work anymore in MeVisLab? (Use AkademieDT for testing.)
-            if link.startswith('file:') and link.endswith('.mng'):
-                item = result.get_existing_item(key = link)
-                if item is None:
-                    if rect.width() < 1 and rect.height() < 1:
-                        # bug in XeLaTeX w.r.t. images used in hyperlinks?
-                        for patch in frame.patchesAt(QtCore.QPoint(rect.left() + 4, rect.top() - 4)):
-                            if not patch.flag(presentation.Patch.FLAG_RECT):
-                                rect = rect.united(QtCore.QRectF(patch.boundingRect()))
-
-                    movie = QtGui.QMovie(link[5:])
-                    player = QtWidgets.QLabel()
-                    player.setMovie(movie)
-                    movie.setScaledSize(rect.size().toSize())
-                    player.resize(round(rect.width()), round(rect.height()))
-
-                    item = QtWidgets.QGraphicsProxyWidget()
-                    item.setWidget(player)
-                    item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
-                    item.setPos(rect.topLeft())
-                    item.setZValue(1) # above non-custom content, independent from dictionary key
-                    movie.start()
-                result.add(item, layer = 'content')
+        for rect, link in movies.movieLinks(frame): # FIXME: does not work anymore in MeVisLab? (Use AkademieDT for testing.)
+            item = result.get_existing_item(key = link)
+            if item is None:
+                if rect.width() < 1 and rect.height() < 1:
+                    # bug in XeLaTeX w.r.t. images used in hyperlinks?
+                    for patch in frame.patchesAt(QtCore.QPoint(rect.left() + 4, rect.top() - 4)):
+                        if not patch.flag(presentation.Patch.FLAG_RECT):
+                            rect = rect.united(QtCore.QRectF(patch.boundingRect()))
+
+                # (starts decoding / playing in _updateMovies())
+                item = movies.MoviePlayer(movies.source(link[5:]), rect)
+                item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+                item.setZValue(1) # above non-custom content, independent from dictionary key
+            result.add(item, layer = 'content')
 
         staticItems = list(result.items())
 
@@ -240,18 +629,29 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
         
         self._resetAnimation()
         self._frame = frame
+        self._itemsReleased = False
         newGeometry = QtCore.QRectF(p(self.pos), frame.sizeF())
 
         addItems = {}
         removeItems = dict(self._items)
 
-        for key, (layer, item) in self._frameItems(frame).items():
+        for patch in frameContent(frame):
+            pixmap_cache.cache.touch(patch)
+
+        self._changingFrame = True # (creating pixmaps may trigger eviction)
+        try:
+            frameItems = self._frameItems(frame)
+        finally:
+            self._changingFrame = False
+
+        for key, (layer, item) in frameItems.items():
             try:
                 del removeItems[key]
             except KeyError:
                 parentItem = self._contentItem(layer)
                 item.setParentItem(parentItem)
                 addItems[key] = (layer, item)
+                self._preparedItems.pop(key, None)
 
         return newGeometry, addItems, removeItems
 
@@ -277,13 +677,83 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
         self._items.update(addItems)
         self._removeItems(removeItems)
 
+        if self._thumbnailMode:
+            self._updateThumbnail()
+        self._updateMovies()
+
+    def moviesPlaying(self):
+        return self._moviesPlaying
+
+    def setMoviesPlaying(self, onoff):
+        """Play (or pause) the movies of the rendered frame.  Movie
+        players do not decode anything before they are played for
+        the first time."""
+        self._moviesPlaying = bool(onoff)
+        self._updateMovies()
+
+    def _updateMovies(self):
+        play = self._moviesPlaying and not self._thumbnailMode
+        for key, (layer, item) in self._items.items():
+            if isinstance(item, movies.MoviePlayer):
+                if play:
+                    item.play()
+                else:
+                    item.pause()
+
+    def thumbnailMode(self):
+        return self._thumbnailMode
+
+    def setThumbnailMode(self, onoff):
+        """Switch between rendering the frame with one item per Patch
+        (default) and a single thumbnail pixmap (THUMBNAIL_SCALE),
+        which is much cheaper to paint at small scales.  Movies and
+        custom items are always displayed live."""
+        onoff = bool(onoff)
+        if onoff == self._thumbnailMode:
+            return
+        if onoff:
+            self._resetAnimation()
+        self._thumbnailMode = onoff
+        self._updateThumbnail()
+        self._updateMovies()
+
+    def _updateThumbnail(self):
+        item = self._helperItems.get('thumbnail')
+        if self._thumbnailMode:
+            if item is None:
+                item = QtWidgets.QGraphicsPixmapItem(self)
+                item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+                item.setTransformationMode(QtCore.Qt.SmoothTransformation)
+                item.setScale(1.0 / THUMBNAIL_SCALE)
+                item.setZValue(self.BACKGROUND_LAYER + 0.5) # below content (custom items)
+                self._helperItems['thumbnail'] = item
+            if self._thumbnailFrame is not self._frame:
+                item.setPixmap(QtGui.QPixmap.fromImage(
+                    renderFrame(self._frame, THUMBNAIL_SCALE)))
+                self._thumbnailFrame = self._frame
+            item.show()
+        elif item is not None:
+            item.hide()
+
+        live = not self._thumbnailMode
+        for layer in ('bg', 'header', 'footer'):
+            if layer in self._helperItems:
+                self._helperItems[layer].setVisible(live)
+        for key, (layer, item) in self._items.items():
+            if layer == 'content' and isinstance(key, (presentation.Patch, StaticLayer)):
+                item.setVisible(live)
+
     def _removeItems(self, items):
         for key, (layer, item) in items.items():
+            if isinstance(item, movies.MoviePlayer):
+                item.pause()
             # we must not remove custom items from the scene:
             if key is item:
                 item.hide() # just hide them
+            elif item.scene() is not None:
+                item.scene().removeItem(item)
             else:
-                self.scene().removeItem(item)
+                item.setParentItem(None)
             del self._items[key]
 
     def animatedTransition(self, sourceFrame, targetFrame):
@@ -310,77 +780,27 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
         self._animation = QtCore.QParallelAnimationGroup()
         self._animation.finished.connect(self._resetAnimation)
 
-        fadeOut = {}
-        fadeIn = {}
-        slideOut = {}
-        slideIn = {}
-
-        # decide which items to slide and which to fade out/in:
-        if not slideDirection:
-            # within-Slide animation, no sliding here:
-            fadeOut = dict(removeItems)
-            fadeIn = addItems
+        # decide which items to slide and which to fade out/in,
+        # preferably using a precomputed plan:
+        plan = None
+        if self._transitionPlanner is not None:
+            plan = self._transitionPlanner.plan(sourceFrame, targetFrame)
+        if plan is not None and plan.matches(removeItems, addItems):
+            keys = (plan.fadeOut, plan.fadeIn, plan.slideOut, plan.slideIn)
         else:
-            for oldKey, (oldLayer, oldItem) in removeItems.items():
-                # always slide custom items:
-                if oldKey is oldItem:
-                    slideOut[oldKey] = (oldLayer, oldItem)
-                    continue
-
-                # always fade non-Patches (e.g. backgrounds, movies, ...)
-                if not isinstance(oldKey, presentation.Patch):
-                    fadeOut[oldKey] = (oldLayer, oldItem)
-                    continue
-
-                # always fade header & footer:
-                if (isinstance(oldKey, presentation.Patch) and
-                    oldKey.flag(presentation.Patch.FLAG_HEADER | presentation.Patch.FLAG_FOOTER)):
-                    fadeOut[oldKey] = (oldLayer, oldItem)
-                    continue
-
-                slideOut[oldKey] = (oldLayer, oldItem)
-
-            for newKey, (newLayer, newItem) in addItems.items():
-                # always slide custom items:
-                if newKey is newItem:
-                    slideIn[newKey] = (newLayer, newItem)
-                    continue
-
-                # always fade non-Patches (e.g. backgrounds, movies, ...)
-                if not isinstance(newKey, presentation.Patch):
-                    fadeIn[newKey] = (newLayer, newItem)
-                    continue
-
-                # always fade header & footer:
-                if (isinstance(newKey, presentation.Patch) and
-                    newKey.flag(presentation.Patch.FLAG_HEADER | presentation.Patch.FLAG_FOOTER)):
-                    fadeIn[newKey] = (newLayer, newItem)
-                    continue
-
-                # look for pairs (oldItem, newItem) of Patches where
-                # newKey.isSuccessorOf(oldKey) => fade out/in
-                changed = False
-                for oldKey, (oldLayer, oldItem) in removeItems.items():
-                    if not isinstance(oldKey, presentation.Patch):
-                        continue
-                    if newKey.isSuccessorOf(oldKey):
-                        changed = True
-                        if oldKey in slideOut:
-                            del slideOut[oldKey]
-                        else:
-                            print("not found in slideOut (fadeOut: %s): %s" % (oldKey in fadeOut, oldKey))
-                        fadeOut[oldKey] = (oldLayer, oldItem)
-                        fadeIn[newKey] = (newLayer, newItem)
-                        break
-                if not changed:
-                    slideIn[newKey] = (newLayer, newItem)
-
-        # don't fade out items that are completely covered by items that fade in:
-        for newKey, (newLayer, newItem) in fadeIn.items():
-            coveredRect = _frameBoundingRect(newItem)
-            for oldKey, (oldLayer, oldItem) in list(fadeOut.items()):
-                if coveredRect.contains(_frameBoundingRect(oldItem)):
-                    del fadeOut[oldKey]
+            allItems = dict(removeItems)
+            allItems.update(addItems)
+            keys = transitions.classifyTransition(
+                list(removeItems), list(addItems), slideDirection,
+                rectOf = lambda key: _frameBoundingRect(allItems[key][1]),
+                alwaysSlides = lambda key: (
+                    key is allItems[key][1] or # custom items
+                    (isinstance(key, StaticLayer) and key.layer() == 'content')))
+
+        fadeOut, fadeIn, slideOut, slideIn = [
+            dict((key, removeItems[key] if key in removeItems else addItems[key])
+                 for key in keyList)
+            for keyList in keys]
 
         offset = self._frame.sizeF().width() * slideDirection
 
@@ -412,6 +832,7 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
 
         self._items.update(addItems)
         self._pendingRemove = removeItems
+        self._updateMovies()
 
         self._animation.start()
         return self._animation
@@ -445,20 +866,24 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
 
     def headerItems(self):
         return [item for key, (layer, item) in self._items.items()
-                if isinstance(key, presentation.Patch) and key.flag(presentation.Patch.FLAG_HEADER)]
+                if isinstance(key, (presentation.Patch, StaticLayer)) and layer == 'header']
 
     def footerItems(self):
         return [item for key, (layer, item) in self._items.items()
-                if isinstance(key, presentation.Patch) and key.flag(presentation.Patch.FLAG_FOOTER)]
+                if isinstance(key, (presentation.Patch, StaticLayer)) and layer == 'footer']
 
-    def patchOf(self, item):
+    def patchOf(self, item, pos = None):
         """Return corresponding Patch instance which is rendered by
         the given item.  Return None if the item does not represent a
-        Patch, or if the item does not belong to this renderer."""
+        Patch, or if the item does not belong to this renderer.  For
+        items rendering a StaticLayer, the patch at the given pos (in
+        renderer coordinates) is returned."""
         for key, (layer, thisItem) in self._items.items():
             if thisItem is item:
                 if isinstance(key, presentation.Patch):
                     return key
+                elif isinstance(key, StaticLayer) and pos is not None:
+                    return key.patchAt(pos)
                 else:
                     return None
         return None
@@ -468,7 +893,9 @@ class FrameRenderer(QtWidgets.QGraphicsWidget):
         result = self._helperItems.get(key, None)
 
         if result is None:
-            result = QtWidgets.QGraphicsWidget(self)
+            result = PatchBatchItem(self)
+            if self._frame is not None:
+                result.resize(self._frame.sizeF()) # bounding rect for batched painting
             result.setAcceptedMouseButtons(QtCore.Qt.NoButton)
             if isinstance(key, str) and key.startswith('bg'):
                 result.setZValue(self.BACKGROUND_LAYER)
@@ -496,7 +923,8 @@ class SlideRenderer(FrameRenderer):
         self._frameCallbacks = []
 
         assert len(slide) > 0
-        self.showFrame(0)
+        # (the slide may have been shown by an earlier, recycled renderer)
+        self.showFrame(slide.currentSubIndex() or 0)
         self._coverItem()
 
     def slide(self):
@@ -542,6 +970,15 @@ class SlideRenderer(FrameRenderer):
     def _customContent(self):
         return self._customItems[self.scene()][self._frame]
 
+    def isRecyclable(self):
+        """Return whether this renderer may be deleted and re-created
+        later without losing state, i.e. it has no custom content or
+        callbacks."""
+        if self._customReferences or self._frameCallbacks:
+            return False
+        customItems = self._customItems[self.scene()]
+        return not any(customItems.get(frame) for frame in self._slide)
+
     def showCustomContent(self):
         for item in self._customContent():
             item.show()
@@ -573,14 +1010,17 @@ class SlideRenderer(FrameRenderer):
     def showFrame(self, subIndex, animateFrom = None):
         self._slide.setCurrentSubIndex(subIndex)
 
+        animation = None
         if animateFrom is None:
             self.setFrame(self._slide.currentFrame())
         else:
-            self.animatedTransition(animateFrom, self._slide.currentFrame())
+            animation = self.animatedTransition(animateFrom, self._slide.currentFrame())
 
         for cb in self._frameCallbacks:
             cb(self, subIndex)
 
+        return animation
+
 def toggleDebug():
     global FADE_DURATION, SLIDE_DURATION
     
@@ -0,0 +1,136 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Generator for synthetic LaTeX-beamer-like presentation pages (RGB
+arrays as passed to decomposer.decompose_pages()), e.g. for
+benchmarking without PDF files or renderers.  Painting text requires
+a QGuiApplication instance."""
+
+import numpy
+from .dynqt import QtCore, QtGui, qimage2ndarray
+
+HEADER_COLOR = QtGui.QColor(51, 51, 178)
+TEXT_COLOR = QtGui.QColor(0, 0, 0)
+ALERT_COLOR = QtGui.QColor(204, 0, 0)
+
+_WORDS = ('frame', 'overlay', 'patch', 'slide', 'pixel', 'header', 'rendering',
+          'transition', 'animation', 'content', 'beamer', 'decomposition')
+
+
+def _paint_logo(painter, rect):
+    gradient = QtGui.QRadialGradient(rect.center(), rect.width() / 2)
+    gradient.setColorAt(0, QtGui.QColor(255, 200, 0))
+    gradient.setColorAt(1, QtGui.QColor(200, 60, 0))
+    painter.setPen(QtCore.Qt.NoPen)
+    painter.setBrush(gradient)
+    painter.drawEllipse(rect)
+
+
+def _photo(rs, w, h):
+    """Return QImage with smooth random colors plus per-pixel noise."""
+    coarse = rs.randint(0, 256, (4, 5, 3)).astype(numpy.uint8)
+    image = qimage2ndarray.array2qimage(coarse).scaled(
+        w, h, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+    rgb = qimage2ndarray.rgb_view(image)
+    noise = rs.randint(-12, 13, rgb.shape)
+    return qimage2ndarray.array2qimage(numpy.clip(rgb + noise, 0, 255))
+
+
+def _sentence(rs, length):
+    return " ".join(_WORDS[i] for i in rs.randint(0, len(_WORDS), length)).capitalize()
+
+
+def _paint_page(painter, rs, size, slideIndex, subIndex, framesPerSlide, pageNumber):
+    w, h = size
+    unit = h / 24.0
+
+    # header: gradient bar with slide title and logo
+    headerRect = QtCore.QRectF(0, 0, w, 2.5 * unit)
+    gradient = QtGui.QLinearGradient(headerRect.topLeft(), headerRect.bottomLeft())
+    gradient.setColorAt(0, HEADER_COLOR.lighter(150))
+    gradient.setColorAt(1, HEADER_COLOR)
+    painter.fillRect(headerRect, gradient)
+
+    font = QtGui.QFont('Sans')
+    font.setPixelSize(int(1.2 * unit))
+    painter.setFont(font)
+    painter.setPen(QtCore.Qt.white)
+    painter.drawText(headerRect.adjusted(unit, 0, 0, 0),
+                     QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter,
+                     "%d. %s" % (slideIndex + 1, _sentence(rs, 3)))
+    _paint_logo(painter, QtCore.QRectF(w - 2.3 * unit, 0.2 * unit, 2.1 * unit, 2.1 * unit))
+
+    # footer: author, logo and page number
+    footerRect = QtCore.QRectF(0, h - 1.2 * unit, w, 1.2 * unit)
+    painter.fillRect(footerRect, HEADER_COLOR.darker(150))
+    font.setPixelSize(int(0.7 * unit))
+    painter.setFont(font)
+    painter.setPen(QtCore.Qt.white)
+    painter.drawText(footerRect.adjusted(unit, 0, 0, 0),
+                     QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, "A. U. Thor")
+    painter.drawText(footerRect.adjusted(0, 0, -unit, 0),
+                     QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter, "%d" % pageNumber)
+    _paint_logo(painter, QtCore.QRectF(w / 2 - 0.5 * unit, h - 1.1 * unit, unit, unit))
+
+    # content: bullet items appearing one by one (overlays)
+    font.setPixelSize(int(unit))
+    painter.setFont(font)
+    kind = slideIndex % 3
+    textWidth = w * (0.55 if kind else 0.9)
+    y = 4 * unit
+    for i in range(framesPerSlide):
+        text = _sentence(rs, 4 if kind else 7)
+        if i > subIndex:
+            continue # not uncovered yet (random state advanced nevertheless)
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(HEADER_COLOR)
+        painter.drawEllipse(QtCore.QRectF(1.2 * unit, y + 0.35 * unit, 0.4 * unit, 0.4 * unit))
+        painter.setPen(ALERT_COLOR if i == subIndex > 0 else TEXT_COLOR)
+        painter.drawText(QtCore.QRectF(2 * unit, y, textWidth, 1.2 * unit),
+                         QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, text)
+        y += 1.8 * unit
+
+    # illustrations: photo or gradient box (static within the slide)
+    figureRect = QtCore.QRectF(w * 0.62, 4 * unit, w * 0.33, 12 * unit).toRect()
+    if kind == 1:
+        painter.drawImage(figureRect, _photo(rs, figureRect.width(), figureRect.height()))
+    elif kind == 2:
+        gradient = QtGui.QLinearGradient(QtCore.QPointF(figureRect.topLeft()),
+                                         QtCore.QPointF(figureRect.bottomRight()))
+        gradient.setColorAt(0, QtGui.QColor(0, 160, 80))
+        gradient.setColorAt(1, QtGui.QColor(240, 240, 120))
+        painter.fillRect(figureRect, gradient)
+
+
+def generate_pages(slideCount = 10, framesPerSlide = 3, size = (1024, 768), seed = 0):
+    """Generate slideCount * framesPerSlide pages (uint8 RGB arrays
+    of shape (h, w, 3)).  The frames of each slide share header and
+    footer graphics and uncover one more bullet item each; every
+    third slide contains a photo, every third a gradient.  Output is
+    deterministic for a given seed."""
+    w, h = size
+    pageNumber = 0
+    for slideIndex in range(slideCount):
+        for subIndex in range(framesPerSlide):
+            pageNumber += 1
+            # same random state for all frames of a slide:
+            rs = numpy.random.RandomState((seed, slideIndex))
+            image = QtGui.QImage(w, h, QtGui.QImage.Format_RGB32)
+            image.fill(QtCore.Qt.white)
+            painter = QtGui.QPainter(image)
+            painter.setRenderHints(QtGui.QPainter.Antialiasing |
+                                   QtGui.QPainter.TextAntialiasing)
+            _paint_page(painter, rs, size, slideIndex, subIndex, framesPerSlide, pageNumber)
+            painter.end()
+            yield qimage2ndarray.rgb_view(image).copy()
@@ -0,0 +1,11 @@
+"""Stand-ins shared by several test modules."""
+
+from .. import decomposer, synthetic_deck
+from ..progress import Progress
+
+
+def fake_decompose_pdf(pdfFilename, sizePX, progress = None, pageCacheFilename = None):
+    """Replacement for decomposer.decompose_pdf() (cf. monkeypatch)
+    that decomposes a synthetic deck of two slides with two frames."""
+    pages = synthetic_deck.generate_pages(2, 2, sizePX)
+    return decomposer.decompose_pages(pages, progress = progress or Progress())
@@ -0,0 +1,37 @@
+import io
+from ..dynqt import QtWidgets
+from .. import batch, cache, decomposer
+from .fakes import fake_decompose_pdf
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_warm_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(decomposer, 'decompose_pdf', fake_decompose_pdf)
+    pdfFilename = str(tmpdir.join('talk.pdf'))
+    open(pdfFilename, 'w').close()
+
+    result = batch.warm_cache(pdfFilename, (160, 120))
+    assert not result['skipped']
+    assert result['cache'] == cache.cacheFilename(pdfFilename, (160, 120))
+    assert (result['slides'], result['frames']) == (2, 4)
+    assert 0 < result['retained'] < 1
+    assert "2 slides, 4 frames" in batch.format_summary(result)
+
+    slides, transitionPlans = cache.readCache(result['cache'])
+    assert slides.frameCount() == 4
+    assert len(transitionPlans) == 6 # 3 consecutive pairs, both directions
+
+    # cache is current now:
+    assert batch.warm_cache(pdfFilename, (160, 120))['skipped']
+    assert not batch.warm_cache(pdfFilename, (160, 120), force = True)['skipped']
+
+
+def test_warm_caches_reports_errors(tmpdir):
+    stream = io.StringIO()
+    results = batch.warm_caches([str(tmpdir.join('missing.pdf'))], [(160, 120)],
+                                jobs = 1, stream = stream)
+    assert len(results) == 1 and 'error' in results[0]
+    assert "missing.pdf (160x120): FAILED" in stream.getvalue()
@@ -0,0 +1,14 @@
+from .. import bz2_pickle
+
+
+def test_multiple_objects(tmpdir):
+    filename = str(tmpdir.join('objects.bz2'))
+    shared = ['shared']
+    first = dict(a = shared, b = shared, c = ('x', 'y'))
+    second = [shared, shared, ('x', 'y'), 'z']
+    bz2_pickle.pickle(filename, first, second)
+
+    loaded = list(bz2_pickle.iter_unpickle(filename))
+    assert loaded == [first, second]
+    assert loaded[1][0] is loaded[1][1]
+    assert bz2_pickle.unpickle(filename) == first
@@ -0,0 +1,62 @@
+import numpy
+from ..presentation import Patch, Frame
+from .. import decomposer
+from .test_presentation import frameSize, patch, background
+
+
+class PositionClassifier(object):
+    """Stand-in for the RandomForestClassifier, counting predict() calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, features):
+        features = numpy.asarray(features)
+        self.calls.append(features.shape)
+        top = features[:,2]
+        return numpy.where(top < 5, Patch.FLAG_HEADER,
+                           numpy.where(top > 60, Patch.FLAG_FOOTER, 0))
+
+
+def test_batched_classification(monkeypatch):
+    classifier = PositionClassifier()
+    monkeypatch.setattr(decomposer, 'classifier', classifier)
+    monkeypatch.setattr(decomposer, '_pendingClassifierFilename', None)
+
+    bg = background()
+    header, footer, a, b = patch(0, 0), patch(0, 65), patch(20, 20), patch(40, 40)
+    frames = [Frame(frameSize, content) for content in (
+        [bg, header, a, footer],
+        [bg, header, a, b, footer],
+        [bg, header, b, footer])]
+    decomposer.classify_navigation(frames)
+
+    # one call for all 5 distinct patches:
+    assert classifier.calls == [(5, 5)]
+    assert header.flag(Patch.FLAG_HEADER) and not header.flag(Patch.FLAG_FOOTER)
+    assert footer.flag(Patch.FLAG_FOOTER) and not footer.flag(Patch.FLAG_HEADER)
+    # (bg is classified as header, but does not end in the upper half)
+    for p in (bg, a, b):
+        assert not p.flag(Patch.FLAG_HEADER) and not p.flag(Patch.FLAG_FOOTER)
+
+
+def test_lazy_classifier_loading(monkeypatch, tmpdir):
+    monkeypatch.setattr(decomposer, 'classifier', None)
+    monkeypatch.setattr(decomposer, 'navigation_examples', {})
+    basename = str(tmpdir.join('classifier'))
+    examples = {(0, 10, 0, 10, 3): Patch.FLAG_HEADER}
+    model = decomposer.fit_navigation_classifier(examples, incremental = True)
+    decomposer.save_classifier(basename, examples, model)
+
+    decomposer.load_classifier(basename)
+    assert decomposer.classifier is None # (not needed yet)
+
+    # saving explicitly given examples and model does not load it either:
+    decomposer.save_classifier(str(tmpdir.join('other')), examples, model)
+    assert decomposer.classifier is None
+
+    header = patch(0, 0)
+    decomposer.classify_navigation([Frame(frameSize, [background(), header])])
+    assert isinstance(decomposer.classifier, decomposer.NearestExampleClassifier)
+    assert decomposer.navigation_examples == examples
+    assert header.flag(Patch.FLAG_HEADER)
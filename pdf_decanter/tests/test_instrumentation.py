@@ -0,0 +1,84 @@
+import json
+from ..dynqt import QtCore, QtWidgets
+from .. import instrumentation
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+class Decanter(QtCore.QObject):
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        self._view = QtWidgets.QGraphicsView(QtWidgets.QGraphicsScene())
+        self.frameIndex = 0
+
+    def view(self):
+        return self._view
+
+    def currentFrameIndex(self):
+        return self.frameIndex
+
+
+def test_measurements(tmpdir, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(instrumentation.time, 'perf_counter', lambda: clock[0])
+
+    decanter = Decanter()
+    ins = instrumentation.Instrumentation(decanter, overlay = True)
+
+    ins.inputStarted(QtCore.Qt.Key_Right)
+    decanter.frameIndex = 1
+    animation = QtCore.QVariantAnimation()
+    animation.setDuration(100)
+    ins.animationStarted(animation, 1)
+    ins.inputHandled()
+    assert not ins._overlayTimer.isActive() # (paused during the animation)
+
+    for dt in (0.005, 0.016, 0.016, 0.050, 0.016):
+        clock[0] += dt
+        ins.framePainted()
+    animation.start()
+    animation.stop()
+    assert ins._overlayTimer.isActive()
+
+    input, = ins.inputs()
+    assert (input['frameIndex'], input['targetFrameIndex']) == (0, 1)
+    assert abs(input['latency'] - 5) < 1e-6
+
+    record, = ins.animations()
+    assert record['frames'] == 5
+    assert abs(record['maxInterval'] - 50) < 1e-6
+    assert record['droppedFrames'] == 2
+
+    assert ins.summary()['items'] == 1 # the overlay
+    assert 'items' not in ins.frames()[-1] # (not counted per paint)
+    assert 'dropped' in ins.overlayText()
+
+    filename = str(tmpdir.join('stats.json'))
+    ins.writeLog(filename)
+    assert json.load(open(filename))['summary']['animationDroppedFrames'] == 2
+
+
+def test_overlapping_animations(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(instrumentation.time, 'perf_counter', lambda: clock[0])
+
+    ins = instrumentation.Instrumentation(Decanter())
+    old, new = QtCore.QVariantAnimation(), QtCore.QVariantAnimation()
+    for animation in (old, new):
+        animation.setDuration(100)
+    old.start()
+    ins.animationStarted(old, 1)
+    new.start()
+    ins.animationStarted(new, 2)
+    old.stop() # must not finish the record of the new animation
+
+    for i in range(3):
+        clock[0] += 0.016
+        ins.framePainted()
+    new.stop()
+
+    first, second = ins.animations()
+    assert (first['frameIndex'], first['frames']) == (1, 0)
+    assert (second['frameIndex'], second['frames']) == (2, 3)
@@ -0,0 +1,36 @@
+import json
+from ..dynqt import QtWidgets
+from .. import memory_profile, synthetic_deck
+from ..decomposer import decompose_pages
+from ..progress import Progress
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_memory_profiler(tmpdir):
+    profiler = memory_profile.MemoryProfiler()
+    try:
+        slides = decompose_pages(synthetic_deck.generate_pages(2, 2, (160, 120)),
+                                 progress = Progress(profiler))
+        profiler.checkpoint('setSlides', slides)
+    finally:
+        memory_profile.tracemalloc.stop()
+
+    stages = profiler.stages()
+    assert stages['labelling']['runs'] == 4 # once per page
+    # the rendered pages (4 x 160x120 RGB) are attributed to 'render':
+    assert stages['render']['tracedIncrease'] >= 4 * 160 * 120 * 3
+
+    report = profiler.report()
+    assert report['attribution']['bytesPerPage'] == 160 * 120 * 3
+    assert report['attribution']['patchImageBytes'] > 0
+    assert [checkpoint['label'] for checkpoint in report['checkpoints']] == [
+        'decomposed', 'setSlides']
+    assert any(site['site'].startswith('pdf_decanter/decomposer.py:')
+               for site in report['sites']['labelling'])
+
+    filename = str(tmpdir.join('memory.json'))
+    profiler.writeReport(filename)
+    assert json.load(open(filename))['stages']['render']['runs'] == 1
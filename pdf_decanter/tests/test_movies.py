@@ -0,0 +1,62 @@
+from ..dynqt import QtCore, QtGui, QtWidgets
+from .. import movies, pixmap_cache
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def movieFile(tmpdir):
+    # (the image format is detected from the contents)
+    filename = str(tmpdir.join('still.mng'))
+    image = QtGui.QImage(8, 6, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor(255, 0, 0))
+    assert image.save(filename, b'png')
+    return filename
+
+
+def test_source(tmpdir):
+    filename = movieFile(tmpdir)
+    source = movies.source(filename)
+    assert movies.source(filename) is source
+    assert source.decodedFrameCount() == 0
+    assert source.frameCount() is None
+
+    pixmap, delay = source.frame(3) # loops
+    assert pixmap.size() == QtCore.QSize(8, 6)
+    assert delay >= movies.MIN_FRAME_DELAY
+    assert source.frameCount() == 1
+
+    assert movies.MovieSource(str(tmpdir.join('missing.mng'))).frame(0) is None
+    movies.clear()
+    assert movies.source(filename) is not source
+
+
+def test_player(tmpdir):
+    source = movies.MovieSource(movieFile(tmpdir))
+    player = movies.MoviePlayer(source, QtCore.QRectF(10, 20, 16, 12))
+    assert player.boundingRect() == QtCore.QRectF(0, 0, 16, 12)
+    assert player.pos() == QtCore.QPointF(10, 20)
+    assert source.decodedFrameCount() == 0 # lazy
+
+    player.play()
+    assert player.isPlaying()
+    assert source.decodedFrameCount() == 1
+    player.pause()
+    assert not player.isPlaying()
+
+
+def test_sources_count_against_budget(tmpdir):
+    cache = pixmap_cache.cache
+    budget = cache.budget()
+    cache.clear()
+    try:
+        source = movies.MovieSource(movieFile(tmpdir))
+        source.frame(0)
+        assert source in cache and cache.bytes() == 8 * 6 * 4
+        cache.setBudget(0)
+        assert source.decodedFrameCount() == 0 and cache.bytes() == 0
+        assert source.frame(0) is not None # decoded again
+    finally:
+        cache.setBudget(budget)
+        cache.clear()
@@ -0,0 +1,128 @@
+import os
+from ..dynqt import QtWidgets
+from ..presentation import Patch, Frame
+from .. import decomposer, navigation
+from .test_presentation import frameSize, patch, background
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_nearest_example_classifier():
+    model = decomposer.NearestExampleClassifier()
+    assert list(model.predict([(0, 10, 0, 5, 3)])) == [0]
+
+    model.fit([(0, 10, 0, 5, 3), (0, 10, 60, 65, 3)],
+              [Patch.FLAG_HEADER, Patch.FLAG_FOOTER])
+    assert list(model.predict([(1, 11, 1, 6, 3), (0, 9, 58, 64, 3)])) == [
+        Patch.FLAG_HEADER, Patch.FLAG_FOOTER]
+
+    model.addExample((20, 30, 20, 25, 1), 0)
+    model.addExample((0, 10, 60, 65, 3), 0) # (replaces previous example)
+    assert len(model) == 3
+    assert list(model.predict([(21, 30, 20, 25, 1), (0, 9, 58, 64, 3)])) == [0, 0]
+
+
+class FakeSlides(object):
+    def __init__(self, frames):
+        self._frames = frames
+
+    def frames(self):
+        return self._frames
+
+
+def test_incremental_trainer(monkeypatch, tmpdir):
+    monkeypatch.setattr(decomposer, 'classifier', None)
+    monkeypatch.setattr(decomposer, 'navigation_examples', {})
+    monkeypatch.setattr(decomposer, '_pendingClassifierFilename', None)
+
+    bg = background()
+    header, a, b = patch(0, 0), patch(25, 25), patch(40, 40)
+    frames = [Frame(frameSize, content) for content in (
+        [bg, header, a], [bg, a, b], [bg, b])]
+
+    changes = []
+    filename = os.path.join(str(tmpdir), 'config', 'navigation_classifier')
+    trainer = navigation.NavigationTrainer(filename, incremental = True)
+    trainer.setSlides(FakeSlides(frames))
+    trainer.setChangeHandler(changes.append)
+
+    header.setFlag(Patch.FLAG_HEADER)
+    trainer.addExample(header)
+    assert trainer.isBusy() and not changes # (debounced)
+    trainer.flush()
+    assert not trainer.isBusy()
+
+    assert isinstance(decomposer.classifier, decomposer.NearestExampleClassifier)
+    # all patches are predicted to be headers now (single example),
+    # but only a also ends in the upper half:
+    assert a.flag(Patch.FLAG_HEADER)
+    assert not bg.flag(Patch.FLAG_HEADER) and not b.flag(Patch.FLAG_HEADER)
+    assert changes == [frames[:2]]
+    assert os.path.exists(filename + '.pkl.bz2')
+
+    del changes[:]
+    for p in (bg, b):
+        p.setFlag(Patch.FLAG_HEADER, False)
+        trainer.addExample(p)
+    trainer.flush()
+    # a is no header anymore (b is nearest):
+    assert not a.flag(Patch.FLAG_HEADER)
+    assert header.flag(Patch.FLAG_HEADER)
+    assert changes == [frames[:2]]
+
+
+def test_unchanged_flags_are_not_reported(monkeypatch, tmpdir):
+    monkeypatch.setattr(decomposer, 'classifier', None)
+    monkeypatch.setattr(decomposer, 'navigation_examples', {})
+    monkeypatch.setattr(decomposer, '_pendingClassifierFilename', None)
+
+    bg = background()
+    header = patch(0, 0, flags = Patch.FLAG_HEADER)
+    footer = patch(0, 65, flags = Patch.FLAG_FOOTER)
+    frames = [Frame(frameSize, content) for content in (
+        [bg, header, patch(20, 20), footer], [bg, header, patch(40, 30), footer])]
+
+    changes = []
+    trainer = navigation.NavigationTrainer(
+        str(tmpdir.join('classifier')), incremental = True)
+    trainer.setSlides(FakeSlides(frames))
+    trainer.setChangeHandler(changes.append)
+
+    trainer.addExample(header)
+    trainer.addExample(footer)
+    trainer.flush()
+    assert footer.flag(Patch.FLAG_FOOTER) and header.flag(Patch.FLAG_HEADER)
+
+    del changes[:]
+    trainer.addExample(footer) # (same flags again)
+    trainer.flush()
+    assert changes == []
+
+
+def test_flush_on_quit(monkeypatch, tmpdir):
+    monkeypatch.setattr(decomposer, 'classifier', None)
+    monkeypatch.setattr(decomposer, 'navigation_examples', {})
+    monkeypatch.setattr(decomposer, '_pendingClassifierFilename', None)
+
+    filename = str(tmpdir.join('classifier'))
+    trainer = navigation.NavigationTrainer(filename, incremental = True)
+    trainer.addExample(patch(0, 0, flags = Patch.FLAG_HEADER))
+    QtWidgets.QApplication.instance().aboutToQuit.emit()
+    assert not trainer.isBusy()
+    assert os.path.exists(filename + '.pkl.bz2')
+
+
+def test_flush_reports_errors(monkeypatch, tmpdir, capsys):
+    monkeypatch.setattr(decomposer, 'classifier', None)
+    monkeypatch.setattr(decomposer, 'navigation_examples', {})
+    monkeypatch.setattr(decomposer, '_pendingClassifierFilename', None)
+
+    tmpdir.join('file').write('')
+    filename = str(tmpdir.join('file', 'classifier')) # (cannot be created)
+    trainer = navigation.NavigationTrainer(filename, incremental = True)
+    trainer.addExample(patch(0, 0, flags = Patch.FLAG_HEADER))
+    trainer.flush() # must not raise
+    assert not trainer.isBusy()
+    assert 'navigation classifier' in capsys.readouterr().err
@@ -0,0 +1,49 @@
+import os, numpy
+from ..dynqt import QtWidgets
+from .. import page_cache, pdf_infos, decomposer, synthetic_deck
+from ..progress import Progress
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_roundtrip(tmpdir):
+    pages = list(synthetic_deck.generate_pages(2, 2, (160, 120)))
+    filename = str(tmpdir.join('pages.npz'))
+    page_cache.writePageCache(filename, pages, pdf_infos.PDFInfos(),
+                              pdf = 'talk.pdf', size = [160, 120])
+
+    with page_cache.PageCache(filename) as cached:
+        assert cached.pageCount() == 4
+        assert cached.size() == (160, 120)
+        assert isinstance(cached.infos(), pdf_infos.PDFInfos)
+        parameters = cached.parameters()
+        assert (parameters['pdf'], parameters['size']) == ('talk.pdf', [160, 120])
+        # lossless:
+        for page, stored in zip(pages, cached.pages()):
+            assert stored.dtype == page.dtype
+            assert numpy.all(stored == page)
+
+
+def test_incomplete_recording(tmpdir):
+    filename = str(tmpdir.join('pages.npz'))
+    recorder = page_cache.recordPages(filename, synthetic_deck.generate_pages(2, 2, (160, 120)))
+    next(recorder)
+    recorder.close()
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_render_pages_uses_cache(tmpdir):
+    pdfFilename = str(tmpdir.join('talk.pdf'))
+    open(pdfFilename, 'w').close() # (cannot be rendered)
+    filename = page_cache.pageCacheFilename(pdfFilename, (160, 120))
+    page_cache.writePageCache(filename, synthetic_deck.generate_pages(1, 2, (160, 120)),
+                              size = [160, 120])
+
+    pages, infos = decomposer.render_pages(pdfFilename, (160, 120), filename)
+    assert infos is None
+    assert len(list(pages)) == 2
+
+    slides = decomposer.decompose_page_cache(filename, Progress())
+    assert slides.frameCount() == 2
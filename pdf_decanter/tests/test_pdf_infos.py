@@ -0,0 +1,37 @@
+from ..pdf_infos import PDFInfos, labeledBeamerFrames
+
+def _infos(names):
+    result = PDFInfos()
+    result._pageCount = 10
+    result._names = names
+    return result
+
+names = {
+    b'intro' : 0, b'intro<1>' : 0, b'intro<2>' : 1, b'intro<3>' : 2,
+    b'results' : 5, b'results<1>' : 5, b'results<2>' : 6,
+    b'results<4>' : 8, # gap after <2>, not part of the frame
+    b'orphan<1>' : 3, # base name missing
+    b'page.4' : 4,
+    }
+
+def test_labeledBeamerFrames():
+    assert labeledBeamerFrames(_infos(names)) == [
+        (b'intro', [0, 1, 2]),
+        (b'results', [5, 6]),
+        ]
+
+def test_beamerFrames():
+    infos = _infos(names)
+    index = infos.beamerFrames()
+    assert index == {
+        0 : (b'intro', 0), 1 : (b'intro', 1), 2 : (b'intro', 2),
+        5 : (b'results', 0), 6 : (b'results', 1),
+        }
+    assert infos.beamerFrames() is index
+
+def test_beamerFrames_str_names():
+    infos = _infos({'a' : 3, 'a<1>' : 3, 'a<2>' : 4})
+    assert infos.beamerFrames() == {3 : ('a', 0), 4 : ('a', 1)}
+
+def test_beamerFrames_empty():
+    assert _infos({}).beamerFrames() == {}
@@ -0,0 +1,129 @@
+import gc
+from ..dynqt import QtWidgets
+from ..pixmap_cache import PixmapCache
+from ..presentation import Frame, Presentation
+from .. import pixmap_cache, slide_renderer
+from .test_presentation import frameSize, patch, background
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+class Owner(object):
+    def __init__(self, inUse = ()):
+        self.released = []
+        self.inUse = inUse
+
+    def releasePatchItems(self, patch):
+        self.released.append(patch)
+        return patch in self.inUse
+
+
+def test_lru_eviction():
+    patches = [patch(i, 0) for i in range(4)] # 10x10 pixels = 400 bytes each
+    cache = PixmapCache(budget = 1000)
+    owner = Owner()
+    cache.addOwner(owner)
+
+    cache.pixmap(patches[0])
+    cache.pixmap(patches[1])
+    cache.pixmap(patches[0]) # hit, now most recent
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.pixmap(patches[2]) # evicts patches[1]
+    assert cache.bytes() == 800
+    assert patches[1] not in cache and not patches[1].hasPixmap()
+    assert owner.released == [patches[1]]
+
+    cache.touch(patches[0])
+    cache.pixmap(patches[3]) # evicts patches[2]
+    assert patches[0] in cache and patches[2] not in cache
+    assert cache.statistics()['evictions'] == 2
+
+    cache.pixmap(patches[1]) # re-created on demand
+    assert patches[1].hasPixmap()
+    assert cache.misses == 5
+
+
+def test_in_use_pixmaps_are_kept():
+    patches = [patch(i, 0) for i in range(3)]
+    cache = PixmapCache(budget = 500)
+    owner = Owner(inUse = patches[:1])
+    cache.addOwner(owner)
+    for p in patches:
+        cache.pixmap(p)
+    assert patches[0] in cache and patches[0].hasPixmap()
+    assert patches[1] not in cache
+    assert cache.bytes() == 800 # (in-use pixmap still accounted for)
+
+
+def test_entries_are_weak():
+    cache = PixmapCache()
+    a = patch(0, 0)
+    cache.pixmap(a)
+    assert cache.bytes() == 400
+    del a
+    gc.collect()
+    assert len(cache) == 0 and cache.bytes() == 0
+
+
+def pixmapItems(renderer):
+    return [item for layer, item in renderer._items.values()
+            if isinstance(item, QtWidgets.QGraphicsPixmapItem)]
+
+
+def test_offscreen_renderers_release_items():
+    a, b, c, d = [patch(i * 20, 0) for i in range(4)]
+    presentation = Presentation()
+    presentation.addFrames([Frame(frameSize, [background(), a, b]),
+                            Frame(frameSize, [background(), c, d])])
+    scene = QtWidgets.QGraphicsScene()
+    view = QtWidgets.QGraphicsView(scene)
+    view.setSceneRect(0, 0, 2000, 2000)
+    view.centerOn(0, 0)
+
+    cache = pixmap_cache.cache
+    budget = cache.budget()
+    cache.clear()
+    try:
+        onScreen, offScreen = slide_renderer.FrameRenderer(None), slide_renderer.FrameRenderer(None)
+        for renderer, pos, frame in ((onScreen, 0, 0), (offScreen, 1500, 1)):
+            scene.addItem(renderer)
+            renderer.setPos(pos, pos)
+            renderer.setFrame(presentation.frame(frame))
+        assert onScreen.isOnScreen() and not offScreen.isOnScreen()
+        assert cache.bytes() == 1600
+
+        cache.setBudget(1200) # only releases the item of c
+        assert len(pixmapItems(onScreen)) == 2
+        assert len(pixmapItems(offScreen)) == 1
+
+        cache.setBudget(800)
+        assert len(pixmapItems(onScreen)) == 2
+        assert not pixmapItems(offScreen)
+        assert not c.hasPixmap() and not d.hasPixmap()
+        assert cache.bytes() == 800
+
+        offScreen.setPos(0, 100)
+        offScreen.restoreItems()
+        assert len(pixmapItems(offScreen)) == 2
+        assert cache.bytes() == 1600 # (all displayed)
+    finally:
+        cache.setBudget(budget)
+        cache.clear()
+
+
+def test_in_use_pixmaps_are_checked_once():
+    patches = [patch(i, 0) for i in range(10)]
+    cache = PixmapCache(budget = 500)
+    owner = Owner(inUse = patches)
+    cache.addOwner(owner)
+    for p in patches:
+        cache.pixmap(p)
+    assert len(owner.released) == 9 # (no rescans of entries in use)
+    assert len(cache) == 10 and cache.bytes() == 4000
+
+    owner.inUse = patches[5:]
+    cache.checkInUse()
+    assert len(cache) == 5 and cache.bytes() == 2000
@@ -0,0 +1,28 @@
+from ..dynqt import QtWidgets
+from .. import start
+from .test_presentation import presentation
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_discard_prepared_items():
+    g = start(show = False, slideSize = (100, 80))
+    slides = presentation()
+    g.setSlides(slides)
+    prefetcher = g.prefetcher()
+    prefetcher.setLookAhead(1)
+    renderer = g.renderer(0)
+
+    prefetcher.schedule(0)
+    assert slides.frame(1) in prefetcher.candidates(0)
+    prefetcher.prepare(slides.frame(1))
+    assert renderer.prepareFrame(slides.frame(1)) == 0 # already prepared
+
+    prefetcher.schedule(0) # (slide 0 is still a candidate)
+    assert renderer.prepareFrame(slides.frame(1)) == 0
+
+    prefetcher.schedule(4) # last frame, nothing to prefetch
+    assert not prefetcher.isActive()
+    assert renderer.prepareFrame(slides.frame(1)) == 1 # had been discarded
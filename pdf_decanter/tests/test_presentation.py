@@ -0,0 +1,126 @@
+from ..dynqt import QtCore, QtGui
+from ..presentation import Patch, Frame, Presentation
+
+frameSize = QtCore.QSizeF(100, 80)
+
+def patch(x, y, w = 10, h = 10, flags = 0):
+    image = QtGui.QImage(w, h, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor(x, y, 0))
+    result = Patch(QtCore.QPoint(x, y), image, 1)
+    result.setFlag(flags)
+    return result
+
+def background():
+    result = Patch(QtCore.QPointF(0, 0), QtCore.QSizeF(frameSize),
+                   1, QtGui.QColor(255, 255, 255))
+    result.setFlag(Patch.FLAG_RECT)
+    return result
+
+def presentation():
+    """Two slides with two resp. three frames (the header changes
+    between them)."""
+    bg = background()
+    header1, header2 = patch(0, 0, flags = Patch.FLAG_HEADER), patch(0, 0, 20)
+    header2.setFlag(Patch.FLAG_HEADER)
+    a, b, c = patch(20, 20), patch(40, 40), patch(60, 20)
+    frames = [Frame(frameSize, content) for content in (
+        [bg, header1, a],
+        [bg, header1, a, b],
+        [bg, header2, c],
+        [bg, header2, c, a],
+        [bg, header2, c, a, b],
+        )]
+    result = Presentation()
+    result.addFrames(frames)
+    return result
+
+
+def test_grouping():
+    slides = presentation()
+    assert [len(slide) for slide in slides] == [2, 3]
+    assert slides.frameCount() == 5
+
+
+def test_indices():
+    slides = presentation()
+    for frameIndex, frame in enumerate(slides.frames()):
+        assert slides.frame(frameIndex) is frame
+        assert frame.frameIndex() == frameIndex
+        assert frame.slide().frame(frame.subIndex()) is frame
+    for slideIndex, slide in enumerate(slides):
+        assert slide.slideIndex() == slideIndex
+
+
+def test_indices_after_reordering():
+    slides = presentation()
+    slides.reverse()
+    assert slides[0].slideIndex() == 0 # still correct without structureChanged()
+    slides.structureChanged()
+    assert [frame.frameIndex() for frame in slides.frames()] == list(range(5))
+    assert slides.frame(0).subIndex() == 0
+    assert slides.frame(2).subIndex() == 2
+    assert slides.frame(3).subIndex() == 0
+
+
+def test_patchTable():
+    slides = presentation()
+    table = slides.patchTable()
+    patches = slides.patchSet()
+    assert len(table) == len(patches) == 6
+    assert slides.pixelCount() == sum(patch.pixelCount() for patch in patches)
+    for frameIndex, frame in enumerate(slides.frames()):
+        assert [table.patches()[row] for row in table.frameRows(frameIndex)] == frame.content()
+        for pos in (QtCore.QPoint(25, 25), QtCore.QPoint(29, 29), QtCore.QPoint(30, 30)):
+            assert table.patchesAt(frameIndex, pos) == list(frame.patchesAt(pos))
+    assert len(table.rowsWithFlags(Patch.FLAG_HEADER)) == 2
+
+    # flag changes are picked up without explicit updateFlags():
+    header = table.patches()[table.rowsWithFlags(Patch.FLAG_HEADER)[0]]
+    header.setFlag(Patch.FLAG_HEADER, False)
+    header.setFlag(Patch.FLAG_FOOTER)
+    assert len(table.rowsWithFlags(Patch.FLAG_HEADER)) == 1
+    assert list(table.rowsWithFlags(Patch.FLAG_FOOTER)) == [table.row(header)]
+    header.setFlag(Patch.FLAG_MONOCHROME)
+    assert table.weightedPixelCount() == sum(patch.pixelCount() for patch in patches)
+    assert table.monochromeStatistics() == (1, 1)
+
+
+def test_frame_isSuccessorOf():
+    bg, a, b = background(), patch(20, 20), patch(40, 40)
+    header1 = patch(0, 0, flags = Patch.FLAG_HEADER)
+    header2 = patch(50, 0, flags = Patch.FLAG_HEADER)
+    frame = Frame(frameSize, [bg, header1, a])
+    assert Frame(frameSize, [bg, header1, b]).isSuccessorOf(frame) # same header
+    assert Frame(frameSize, [bg, header2, header1, a, b]).isSuccessorOf(frame)
+    # same bounding rects, different patches:
+    assert Frame(frameSize, [bg, header2, patch(0, 0), patch(20, 20)]).isSuccessorOf(frame)
+    assert not Frame(frameSize, [bg, header2, header1, b]).isSuccessorOf(frame)
+    assert not Frame(frameSize, [bg, header2, header1, patch(20, 20, 11)]).isSuccessorOf(frame)
+
+
+def test_links():
+    import numpy
+    from ..pdf_infos import PDFPageInfos
+
+    pageBox = numpy.array([[0, 0], [200, 160]], float)
+    rng = numpy.random.RandomState(42)
+    links = []
+    for i in range(50):
+        x1, y1 = rng.uniform(0, 190), rng.uniform(0, 150)
+        rect = numpy.array([[x1, y1], [x1 + rng.uniform(1, 40), y1 + rng.uniform(1, 10)]])
+        links.append((rect, i if i % 2 else 'file:movie%d.mng' % i))
+    pageInfos = PDFPageInfos(pageBox, links)
+
+    frame = Frame(frameSize, [])
+    frame.setPDFPageInfos(pageInfos)
+    assert len(list(frame.linkRects(onlyExternal = False))) == 50
+    assert len(list(frame.linkRects())) == 25
+
+    def linkAt(x, y):
+        relPos = (x / frameSize.width(), (frameSize.height() - y) / frameSize.height())
+        for rect, link in pageInfos.relativeLinks():
+            if numpy.all((relPos >= rect[0]) * (relPos <= rect[1])):
+                return link
+
+    for x, y in rng.uniform(0, 100, (500, 2)):
+        assert frame.linkAt(QtCore.QPointF(x, y)) == linkAt(x, y)
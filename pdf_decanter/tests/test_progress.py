@@ -0,0 +1,76 @@
+import io, json
+from ..dynqt import QtWidgets
+from .. import start, decomposer
+from ..progress import Progress, ConsoleReporter
+from .fakes import fake_decompose_pdf
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_stage_times_and_events():
+    events = []
+    progress = Progress(events.append)
+    for i in range(2):
+        with progress.stage('render'):
+            progress.update('rendering page', i + 1, 2)
+    with progress.stage('merge'):
+        pass
+    progress.count('pages', 2)
+
+    assert [event['type'] for event in events] == [
+        'started', 'progress', 'finished', 'started', 'progress', 'finished',
+        'started', 'finished']
+    assert events[1] == dict(type = 'progress', name = 'rendering page', current = 1, total = 2)
+
+    stages = progress.stages()
+    assert list(stages) == ['render', 'merge']
+    assert stages['render']['runs'] == 2
+    assert stages['render']['wall'] >= 0 and stages['render']['cpu'] >= 0
+
+    progress.done()
+    assert events[-1]['type'] == 'done'
+    statistics = events[-1]['statistics']
+    assert statistics['counts'] == dict(pages = 2)
+    # must be JSON-serializable for regression tracking:
+    assert json.loads(json.dumps(statistics))['stages']['merge']['runs'] == 1
+
+
+def test_stage_timed_on_exception():
+    progress = Progress()
+    try:
+        with progress.stage('extract'):
+            raise ValueError
+    except ValueError:
+        pass
+    assert progress.stages()['extract']['runs'] == 1
+
+
+def test_console_reporter():
+    stream = io.StringIO()
+    progress = Progress(ConsoleReporter(stream))
+    with progress.stage('render'):
+        progress.update('rendering page', 1, 3)
+    progress.update('analyzing page', 1, None)
+    progress.done()
+    output = stream.getvalue()
+    assert output.startswith("\rrendering page 1 / 3...\n\ranalyzing page 1...\n")
+    assert "render: " in output
+    assert "complete decomposition took" in output
+
+
+def test_loadPDF_removes_its_callbacks(tmpdir, monkeypatch):
+    monkeypatch.setattr(decomposer, 'decompose_pdf', fake_decompose_pdf)
+    pdfFilename = str(tmpdir.join('talk.pdf'))
+    events = []
+    progress = Progress(events.append)
+    for i in range(2):
+        g = start(show = False, slideSize = (160, 120))
+        g.loadPDF(pdfFilename, progress = progress)
+        assert g.slides().frameCount() == 4
+
+    title = g.view().windowTitle()
+    progress.update('rendering page', 1)
+    assert events[-1]['type'] == 'progress'
+    assert g.view().windowTitle() == title # (not updated anymore)
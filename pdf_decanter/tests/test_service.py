@@ -0,0 +1,159 @@
+import os, json, threading, time, urllib.request, urllib.error
+import pytest
+from ..dynqt import QtWidgets
+from .. import start, cache, decomposer, service
+from ..progress import Progress
+from .fakes import fake_decompose_pdf
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def stand_in(tmpdir, monkeypatch):
+    monkeypatch.setattr(decomposer, 'decompose_pdf', fake_decompose_pdf)
+    result = service.DecompositionService(('127.0.0.1', 0), workers = 1, maxQueuedJobs = 1,
+                                          directory = str(tmpdir), processes = False)
+    result.start()
+    yield result
+    result.shutdown()
+
+
+def test_fetch_cache(stand_in, tmpdir):
+    pdfFilename = str(tmpdir.join('talk.pdf'))
+    with open(pdfFilename, 'wb') as f:
+        f.write(b'%PDF-1.4 fake')
+
+    events = []
+    progress = Progress(events.append)
+    cacheFilename = str(tmpdir.join('talk.bz2'))
+    service.fetch_cache(stand_in.url(), pdfFilename, (160, 120), cacheFilename,
+                        progress, timeout = 30, pollInterval = 0.05)
+
+    slides, transitionPlans = cache.readCache(cacheFilename)
+    assert slides.frameCount() == 4
+    assert transitionPlans
+    # progress of the remote stages has been forwarded:
+    assert ('analyzing page', 4, 4) in [
+        (event['name'], event['current'], event['total']) for event in events]
+
+    # resubmitting the same PDF returns the finished job:
+    state = json.loads(urllib.request.urlopen(
+        stand_in.url() + '/jobs?width=160&height=120', b'%PDF-1.4 fake').read().decode())
+    assert state['status'] == 'done'
+    assert state['events'][-1]['type'] == 'done'
+
+
+def test_bounded_queue(stand_in, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(service, '_decompose', lambda *args: release.wait(10))
+
+    assert stand_in.submit(b'first', (160, 120)) is not None
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(stand_in.url() + '/jobs?width=160&height=120', b'second')
+    assert e.value.code == 503
+    assert stand_in.pendingJobCount() == 1
+
+    release.set()
+    for i in range(100):
+        if not stand_in.pendingJobCount():
+            break
+        time.sleep(0.05)
+    assert stand_in.submit(b'second', (160, 120)) is not None
+
+
+def test_fetch_timeout_falls_back_to_local_decomposition(stand_in, tmpdir, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(service, '_decompose', lambda *args: release.wait(10))
+    pdfFilename = str(tmpdir.join('talk.pdf'))
+    with open(pdfFilename, 'wb') as f:
+        f.write(b'%PDF-1.4 fake')
+
+    try:
+        g = start(show = False, slideSize = (160, 120))
+        g.setDecompositionService(stand_in.url(), timeout = 0.5)
+        startTime = time.time()
+        g.loadPDF(pdfFilename, progress = Progress())
+        assert time.time() - startTime < 5
+        assert g.slides().frameCount() == 4
+    finally:
+        release.set()
+
+
+def test_failed_fetch_falls_back_to_local_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(decomposer, 'decompose_pdf', fake_decompose_pdf)
+    def corrupt_download(serviceURL, pdfFilename, size, cacheFilename, progress):
+        with open(cacheFilename, 'wb') as f:
+            f.write(b'garbage')
+    monkeypatch.setattr(service, 'fetch_cache', corrupt_download)
+
+    pdfFilename = str(tmpdir.join('talk.pdf'))
+    with open(pdfFilename, 'wb') as f:
+        f.write(b'%PDF-1.4 fake')
+
+    g = start(show = False, slideSize = (160, 120))
+    g.setDecompositionService('http://127.0.0.1:1')
+    g.loadPDF(pdfFilename, createCache = True, progress = Progress())
+
+    # the corrupt download has been removed, and the local
+    # decomposition has been cached instead:
+    assert sorted(tmpdir.listdir()) == [
+        tmpdir.join('pdf_decanter_cache_talk_160x120.bz2'), tmpdir.join('talk.pdf')]
+    slides, transitionPlans = cache.readCache(cache.cacheFilename(pdfFilename, (160, 120)))
+    assert slides.frameCount() == 4
+
+
+def _wait(condition, timeout = 10):
+    endTime = time.time() + timeout
+    while not condition():
+        assert time.time() < endTime, "timed out"
+        time.sleep(0.01)
+
+
+def test_done_after_last_event(stand_in, monkeypatch):
+    def decompose(jobId, pdfFilename, slideSize, cacheFilename, events):
+        events.put((jobId, dict(type = 'done', statistics = {})))
+    monkeypatch.setattr(service, '_decompose', decompose)
+
+    # hold back events after the next one:
+    gate = threading.Event()
+    events = stand_in._events
+    get = events.get
+    events.get = lambda: (gate.wait(10), get())[1]
+
+    job = stand_in.submit(b'pdf', (160, 120))
+    _wait(lambda: events.qsize() == 1) # (the job's end marker)
+    state = stand_in.jobState(job.id)
+    assert state['status'] == 'running'
+    assert [event['type'] for event in state['events']] == ['done']
+
+    gate.set()
+    _wait(lambda: stand_in.jobState(job.id)['status'] == 'done')
+
+
+def test_job_expiry(tmpdir, monkeypatch):
+    monkeypatch.setattr(decomposer, 'decompose_pdf', fake_decompose_pdf)
+    s = service.DecompositionService(('127.0.0.1', 0), workers = 1, directory = str(tmpdir),
+                                     processes = False, jobExpiry = 0)
+    try:
+        job = s.submit(b'%PDF-1.4 fake', (160, 120))
+        _wait(lambda: job.status == 'done')
+        assert os.listdir(str(tmpdir)) == [job.id + '.bz2'] # (PDF has been removed)
+        assert s.jobState(job.id) is None
+        assert os.listdir(str(tmpdir)) == []
+    finally:
+        s.shutdown()
+
+
+def test_upload_size_limit(tmpdir):
+    s = service.DecompositionService(('127.0.0.1', 0), workers = 1, directory = str(tmpdir),
+                                     processes = False, maxUploadSize = 10)
+    s.start()
+    try:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(s.url() + '/jobs?width=160&height=120', b'%PDF-1.4 fake')
+        assert e.value.code == 413
+        assert s.pendingJobCount() == 0
+    finally:
+        s.shutdown()
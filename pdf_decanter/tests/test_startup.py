@@ -0,0 +1,8 @@
+from .. import benchmark
+
+
+def test_lazy_imports():
+    result = benchmark.startup_benchmark(repeat = 1)
+    assert result['eager'] == []
+    assert 'pdf_decanter' in result['packages']
+    assert result['importTime'] <= result['total']
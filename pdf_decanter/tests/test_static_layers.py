@@ -0,0 +1,71 @@
+import gc, weakref
+from ..dynqt import QtCore, QtWidgets
+from ..presentation import Patch, Frame, Presentation
+from .. import start, slide_renderer
+from .test_presentation import frameSize, patch, background
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def slides():
+    """One slide with three frames (a, b, d static, c & e changing)
+    plus a neighbouring slide sharing patch d."""
+    bg = background()
+    header1, header2 = patch(0, 0, flags = Patch.FLAG_HEADER), patch(20, 0, flags = Patch.FLAG_HEADER)
+    a, b, c, d = patch(10, 20), patch(30, 20), patch(35, 25), patch(70, 60)
+    e = patch(60, 40)
+    result = Presentation()
+    result.addFrames([Frame(frameSize, content) for content in (
+        [bg, header1, header2, a, b, d],
+        [bg, header1, header2, a, c, b, d], # c is below b (overlapping)
+        [bg, header1, header2, a, b, d, e],
+        )])
+    result.addFrames([Frame(frameSize, [bg, d])])
+    return result
+
+
+def test_staticLayers():
+    presentation = slides()
+    assert len(presentation) == 2
+    frame = presentation.frame(1)
+    bg, header1, header2, a, c, b, d = frame.content()
+
+    layers = slide_renderer.staticLayers(presentation[0])
+    assert slide_renderer.staticLayers(presentation[0]) is layers
+    assert [layer.layer() for layer in layers] == ['header']
+    assert layers[0].patches() == [header1, header2]
+    assert layers[0].boundingRect() == QtCore.QRect(0, 0, 30, 10)
+    assert layers[0].patchAt(QtCore.QPointF(25, 5)) is header2
+    # a alone is not worth flattening, b overlaps c (which is below
+    # b), d also occurs in the next slide
+
+    slide_renderer.setCompositeStaticLayers(True)
+    try:
+        layers = slide_renderer.staticLayers(presentation[0]) # (cache was cleared)
+        assert slide_renderer.frameContent(frame) == layers + [bg, a, c, b, d]
+    finally:
+        slide_renderer.setCompositeStaticLayers(False)
+    assert slide_renderer.frameContent(frame) == frame.content()
+
+
+def test_staticLayers_are_released():
+    presentation = slides()
+    slide_renderer.staticLayers(presentation[0])
+    slide = weakref.ref(presentation[0])
+    del presentation
+    gc.collect()
+    assert slide() is None
+
+
+def test_composite_before_slides():
+    # (as done by main.py before loadPDF())
+    g = start(show = False, slideSize = (100, 80))
+    try:
+        g.setCompositeStaticLayers(True)
+        g.setSlides(slides())
+        g.view().resize(400, 300)
+        assert not g.view().grab().isNull()
+    finally:
+        g.setCompositeStaticLayers(False)
@@ -0,0 +1,32 @@
+import io, numpy
+from ..dynqt import QtWidgets
+from .. import synthetic_deck, benchmark
+from ..decomposer import decompose_pages
+from ..progress import Progress
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_generate_pages():
+    pages = list(synthetic_deck.generate_pages(2, 3, (320, 240)))
+    assert len(pages) == 6
+    assert pages[0].shape == (240, 320, 3) and pages[0].dtype == numpy.uint8
+    # deterministic:
+    again = list(synthetic_deck.generate_pages(2, 3, (320, 240)))
+    assert all(numpy.all(a == b) for a, b in zip(pages, again))
+    # overlays only add content:
+    assert (pages[1] != pages[0]).any()
+
+    slides = decompose_pages(pages, progress = Progress())
+    assert slides.slideCount() == 2
+    assert slides.frameCount() == 6
+
+
+def test_benchmark():
+    results = benchmark.run([(160, 120)], [3], repeat = 1, stream = io.StringIO())
+    stages = results[0]['stages']
+    assert sorted(stages) == sorted(benchmark.STAGES)
+    assert stages['create_frames']['pagesPerSecond'] > 0
+    assert stages['create_frames']['peakMemory'] > 0
@@ -0,0 +1,116 @@
+import gc
+from ..dynqt import QtCore, QtGui, QtWidgets
+from ..texture_atlas import TextureAtlas, PADDING
+from .. import start, slide_renderer, pixmap_cache
+from .test_presentation import patch, presentation
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_packing():
+    atlas = TextureAtlas(pageSize = 64)
+    patches = [patch(i, 0, 10 + i % 7, 5 + i % 11) for i in range(40)]
+    locations = [atlas.location(p) for p in patches]
+    assert atlas.location(patches[0]) == locations[0]
+    assert atlas.pageCount() > 1
+    assert atlas.location(patch(0, 0, 100, 10)) is None # too large
+
+    for i, (pageIndex, rect) in enumerate(locations):
+        assert rect.size() == QtCore.QSizeF(patches[i].image().size())
+        assert QtCore.QRectF(0, 0, 64, 64).contains(rect)
+        padded = rect.adjusted(-PADDING, -PADDING, PADDING, PADDING)
+        for otherPage, other in locations[:i]:
+            assert otherPage != pageIndex or not padded.intersects(other)
+        # image has been copied into the page:
+        page = atlas._pages[pageIndex].image
+        assert page.pixel(rect.topLeft().toPoint()) == patches[i].image().pixel(0, 0)
+
+
+def test_upload_statistics():
+    atlas = TextureAtlas(pageSize = 64)
+    a, b = patch(0, 0), patch(10, 0)
+    atlas.location(a)
+    pixmap = atlas.pixmap(0)
+    assert atlas.pixmap(0) is pixmap # no re-upload
+    atlas.countDrawCall(2)
+    atlas.beginFrame()
+    assert atlas.frameStatistics() == dict(uploadBytes = 64*64*4, drawCalls = 1, fragments = 2)
+
+    atlas.location(b)
+    assert atlas.pixmap(0) is not pixmap
+    atlas.beginFrame()
+    assert atlas.frameStatistics()['uploadBytes'] == 64*64*4
+    atlas.beginFrame()
+    assert atlas.frameStatistics()['uploadBytes'] == 0
+    assert atlas.statistics()['uploadBytes'] == 2 * 64*64*4
+
+
+def test_switch_before_slides():
+    # (as done by main.py before loadPDF())
+    g = start(show = False, slideSize = (100, 80))
+    try:
+        g.setUseTextureAtlas(True)
+        g.setSlides(presentation())
+        g.view().resize(400, 300)
+        assert g.renderers()
+        assert not g.view().grab().isNull()
+    finally:
+        g.setUseTextureAtlas(False)
+
+
+def test_released_patches():
+    atlas = TextureAtlas(pageSize = 64)
+    a, b = patch(0, 0), patch(10, 0)
+    atlas.location(a)
+    atlas.location(b)
+    assert len(atlas) == 2 and atlas.pageCount() == 1
+    del a
+    gc.collect()
+    assert len(atlas) == 1
+    atlas.release(b)
+    assert b not in atlas and atlas.pageCount() == 0
+    assert atlas.location(b)[0] == 0 # page slot is reused
+
+
+def test_pages_count_against_budget():
+    atlas = TextureAtlas(pageSize = 64)
+    a, b = patch(0, 0, 60, 60), patch(0, 0, 60, 60) # (one page each)
+    cache = pixmap_cache.cache
+    budget = cache.budget()
+    cache.clear()
+    try:
+        cache.setBudget(20000)
+        pageA, rect = atlas.location(a)
+        pageB, rect = atlas.location(b)
+        atlas.pixmap(pageA)
+        assert cache.bytes() == 64*64*4
+        atlas.pixmap(pageB) # evicts page of a
+        assert cache.bytes() == 64*64*4
+        assert not atlas._pages[pageA].hasPixmap()
+    finally:
+        cache.setBudget(budget)
+        cache.clear()
+
+
+def test_batching_keeps_stacking_order():
+    scene = QtWidgets.QGraphicsScene(0, 0, 100, 80)
+    container = slide_renderer.PatchBatchItem(None)
+    scene.addItem(container)
+    container.resize(100, 80)
+    a, b = patch(10, 10, 30, 30), patch(30, 30, 30, 30)
+    rect = QtWidgets.QGraphicsRectItem(20, 20, 30, 30)
+    rect.setBrush(QtGui.QColor(0, 0, 255))
+    rect.setPen(QtGui.QPen(QtCore.Qt.NoPen))
+    for item in (slide_renderer.AtlasPatchItem(a), rect, slide_renderer.AtlasPatchItem(b)):
+        item.setParentItem(container)
+
+    image = QtGui.QImage(100, 80, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor(255, 255, 255))
+    painter = QtGui.QPainter(image)
+    scene.render(painter)
+    painter.end()
+    assert image.pixelColor(15, 15) == QtGui.QColor(10, 10, 0) # a
+    assert image.pixelColor(25, 25) == QtGui.QColor(0, 0, 255) # rect above a
+    assert image.pixelColor(45, 45) == QtGui.QColor(30, 30, 0) # b above rect
@@ -0,0 +1,45 @@
+import json
+from ..dynqt import QtWidgets
+from .. import tracing, synthetic_deck
+from ..decomposer import decompose_pages
+from ..progress import Progress
+
+hasApp = QtWidgets.QApplication.instance()
+if not hasApp:
+    app = QtWidgets.QApplication([])
+
+
+def test_disabled():
+    assert not tracing.isEnabled()
+    with tracing.span('nothing', 'test'):
+        pass
+    tracing.instant('nothing', 'test')
+    assert tracing.events() == []
+
+
+def test_chrome_trace(tmpdir):
+    tracing.enable()
+    try:
+        with tracing.span('outer', 'test', answer = 42):
+            decompose_pages(synthetic_deck.generate_pages(1, 2, (160, 120)),
+                            progress = Progress())
+        tracing.begin('transition', 'animation', 1)
+        tracing.end('transition', 'animation', 1)
+
+        filename = str(tmpdir.join('trace.json'))
+        tracing.writeChromeTrace(filename)
+    finally:
+        tracing.disable()
+
+    events = json.load(open(filename))['traceEvents']
+    outer, = [event for event in events if event['name'] == 'outer']
+    assert outer['ph'] == 'X' and outer['args'] == dict(answer = 42)
+    assert set(outer) >= set(['ts', 'dur', 'pid', 'tid', 'cat'])
+    # one span per page for the per-page decomposition stages:
+    labelling = [event for event in events if event['name'] == 'labelling']
+    assert [event['args'] for event in labelling] == [
+        {'analyzing page': 1}, {'analyzing page': 2}]
+    assert all(outer['ts'] <= event['ts'] and
+               event['ts'] + event['dur'] <= outer['ts'] + outer['dur']
+               for event in labelling)
+    assert [event['ph'] for event in events if event['cat'] == 'animation'] == ['b', 'e']
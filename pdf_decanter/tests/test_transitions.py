@@ -0,0 +1,75 @@
+import random
+from ..dynqt import QtCore
+from ..presentation import Patch, Frame, Presentation
+from ..transitions import coveredKeys, TransitionPlan, TransitionPlanner
+from .test_presentation import frameSize, patch, background, presentation
+
+
+def test_coveredKeys():
+    rects = dict(a = QtCore.QRectF(0, 0, 50, 50),
+                 b = QtCore.QRectF(10, 10, 10, 10),
+                 c = QtCore.QRectF(40, 40, 20, 10),
+                 d = QtCore.QRectF(60, 0, 10, 10),
+                 e = QtCore.QRectF(5, 5, 0, 10)) # empty
+    assert coveredKeys(['a'], 'bcde', rects.get) == set('b')
+    assert coveredKeys(['a', 'd'], 'bcd', rects.get) == set('bd')
+    assert coveredKeys([], 'bcd', rects.get) == set()
+
+
+def test_coveredKeys_like_QRectF_contains():
+    # (small integer grid for many shared edges and empty rects)
+    rng = random.Random(42)
+    for trial in range(20):
+        rects = [QtCore.QRectF(rng.randint(0, 20), rng.randint(0, 20),
+                               rng.randint(0, 12), rng.randint(0, 12))
+                 for i in range(60)]
+        covering = rng.sample(range(len(rects)), 10)
+        keys = rng.sample(range(len(rects)), 40) # (may overlap covering)
+        expected = set(key for key in keys
+                       if any(rects[c].contains(rects[key]) for c in covering))
+        assert coveredKeys(covering, keys, rects.__getitem__) == expected
+
+
+def test_plan_between_slides():
+    slides = presentation()
+    source, target = slides.frame(1), slides.frame(2)
+    plan = TransitionPlan.create(source, target)
+    bg, header1, a, b = source.content()
+    header2, c = target.content()[1:3]
+    assert plan.removed == set([header1, a, b])
+    assert plan.added == set([header2, c])
+    # headers fade (header1 is covered by header2), other patches slide:
+    assert plan.fadeIn == [header2]
+    assert plan.fadeOut == []
+    assert plan.slideOut == [a, b]
+    assert plan.slideIn == [c]
+
+    # a patch with the same bounding rect is faded instead:
+    other = Presentation()
+    for content in ([bg, header1, a, b], [bg, header1, patch(20, 20)]):
+        other.addFrames([Frame(frameSize, content)]) # (one slide each)
+    plan = TransitionPlan.create(other.frame(0), other.frame(1))
+    assert plan.fadeIn == other.frame(1).content()[-1:]
+    assert plan.fadeOut == [] # (a is covered by its successor)
+    assert plan.slideOut == [b]
+
+
+def test_plan_within_slide():
+    slides = presentation()
+    plan = TransitionPlan.create(slides.frame(3), slides.frame(4))
+    assert plan.fadeIn == [slides.frame(4).content()[-1]]
+    assert plan.fadeOut == plan.slideOut == plan.slideIn == []
+
+
+def test_planner_state():
+    slides = presentation()
+    planner = TransitionPlanner()
+    planner.computeAll(slides)
+    assert len(planner) == 2 * (slides.frameCount() - 1)
+
+    restored = TransitionPlanner()
+    restored.importState(slides, planner.exportState(slides))
+    for source, target in zip(slides.frames(), list(slides.frames())[1:]):
+        plan, restoredPlan = planner.plan(source, target), restored.plan(source, target)
+        for attr in TransitionPlan.__slots__:
+            assert getattr(plan, attr) == getattr(restoredPlan, attr)
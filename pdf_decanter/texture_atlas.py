@@ -0,0 +1,194 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Texture atlases for Patch images, i.e. few large shared pixmaps
+(which become textures when painting on an OpenGL viewport) instead of
+one pixmap per Patch."""
+
+import weakref
+from .dynqt import QtCore, QtGui
+from . import pixmap_cache
+
+# width and height of atlas pages in pixels:
+PAGE_SIZE = 1024
+# transparent border around each image (prevents bleeding when
+# painting scaled with smooth transformation):
+PADDING = 1
+
+
+class _Page(object):
+    """One atlas page, filled with shelf packing.  Provides the part
+    of the Patch API needed by the PixmapCache."""
+
+    def __init__(self, size):
+        self.image = QtGui.QImage(size, size, QtGui.QImage.Format_ARGB32_Premultiplied)
+        self.image.fill(0)
+        self._pixmap = None
+        self.shelves = [] # [y, height, nextX] lists
+        self.nextY = 0
+        self.patchCount = 0
+
+    def pixmap(self):
+        if self._pixmap is None:
+            self._pixmap = QtGui.QPixmap.fromImage(self.image)
+        return self._pixmap
+
+    def hasPixmap(self):
+        return self._pixmap is not None
+
+    def pixmapBytes(self):
+        return self.image.width() * self.image.height() * 4
+
+    def releasePixmap(self):
+        self._pixmap = None
+
+    def allocate(self, w, h):
+        size = self.image.width()
+        for shelf in self.shelves:
+            y, height, x = shelf
+            if h <= height <= 2 * h and x + w <= size:
+                shelf[2] += w
+                return QtCore.QPoint(x, y)
+        if self.nextY + h <= size and w <= size:
+            self.shelves.append([self.nextY, h, w])
+            self.nextY += h
+            return QtCore.QPoint(0, self.nextY - h)
+        return None
+
+
+class TextureAtlas(object):
+    """Packs Patch images into shared pages of PAGE_SIZE x PAGE_SIZE
+    pixels.  A page's pixmap is only (re-)created when patches have
+    been added to it, so that uploads are reused for all slides
+    showing these patches.  Also counts uploaded bytes and draw calls
+    (cf. PatchBatchItem) per painted frame (cf. beginFrame()).
+
+    Page pixmaps are managed by the pixmap_cache (i.e. count against
+    its budget).  Patches are only weakly referenced; the space of
+    released patches (cf. release()) is not reused, but a page is
+    dropped as soon as it does not contain any patches anymore."""
+
+    def __init__(self, pageSize = PAGE_SIZE):
+        self._pageSize = pageSize
+        self._pages = [] # _Page instances (None for dropped pages)
+        self._locations = {} # weakref to Patch -> (pageIndex, sourceRect)
+
+        self._frame = self._newFrameStatistics()
+        self._lastFrame = self._newFrameStatistics()
+        self.uploadBytes = 0
+        self.drawCalls = 0
+        self.frameCount = 0
+
+    @staticmethod
+    def _newFrameStatistics():
+        return dict(uploadBytes = 0, drawCalls = 0, fragments = 0)
+
+    def pageCount(self):
+        return sum(page is not None for page in self._pages)
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, patch):
+        return weakref.ref(patch) in self._locations
+
+    def location(self, patch):
+        """Return (pageIndex, sourceRect) of the given patch's image,
+        adding it to the atlas if necessary.  Returns None for patches
+        that do not fit into a page."""
+        result = self._locations.get(weakref.ref(patch))
+        if result is None:
+            image = patch.image()
+            w, h = image.width() + 2*PADDING, image.height() + 2*PADDING
+            if w > self._pageSize or h > self._pageSize:
+                return None
+
+            for pageIndex, page in enumerate(self._pages):
+                pos = page is not None and page.allocate(w, h)
+                if pos:
+                    break
+            else:
+                page = _Page(self._pageSize)
+                if None in self._pages:
+                    pageIndex = self._pages.index(None)
+                    self._pages[pageIndex] = page
+                else:
+                    self._pages.append(page)
+                    pageIndex = len(self._pages) - 1
+                pos = page.allocate(w, h)
+
+            pos += QtCore.QPoint(PADDING, PADDING)
+            painter = QtGui.QPainter(page.image)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+            painter.drawImage(pos, image)
+            painter.end()
+            page.releasePixmap() # needs re-upload
+            page.patchCount += 1
+
+            result = self._locations[weakref.ref(patch, self._remove)] = (
+                pageIndex, QtCore.QRectF(QtCore.QRect(pos, image.size())))
+        return result
+
+    def release(self, patch):
+        """Forget the given patch (e.g. a StaticLayer that is not
+        used anymore)."""
+        self._remove(weakref.ref(patch))
+
+    def _remove(self, key):
+        # (also used as weakref callback)
+        location = self._locations.pop(key, None)
+        if location is not None:
+            pageIndex, sourceRect = location
+            page = self._pages[pageIndex]
+            page.patchCount -= 1
+            if not page.patchCount:
+                self._pages[pageIndex] = None
+
+    def pixmap(self, pageIndex):
+        """Return pixmap of the given page (to be used for drawing)."""
+        page = self._pages[pageIndex]
+        if not page.hasPixmap():
+            bytes = page.pixmapBytes()
+            self.uploadBytes += bytes
+            self._frame['uploadBytes'] += bytes
+        return pixmap_cache.cache.pixmap(page)
+
+    def countDrawCall(self, fragments):
+        self.drawCalls += 1
+        self._frame['drawCalls'] += 1
+        self._frame['fragments'] += fragments
+
+    def beginFrame(self):
+        """Called before the view is painted; finishes the statistics
+        of the previous frame (cf. frameStatistics())."""
+        self._lastFrame = self._frame
+        self._frame = self._newFrameStatistics()
+        self.frameCount += 1
+
+    def frameStatistics(self):
+        """Return dict with uploadBytes, drawCalls and fragments
+        (i.e. patches drawn) of the last complete frame."""
+        return dict(self._lastFrame)
+
+    def statistics(self):
+        return dict(pages = self.pageCount(), patches = len(self._locations),
+                    uploadBytes = self.uploadBytes, drawCalls = self.drawCalls,
+                    frames = self.frameCount)
+
+    def clear(self):
+        self._pages = []
+        self._locations = {}
+
+
+atlas = TextureAtlas()
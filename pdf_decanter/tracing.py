@@ -0,0 +1,118 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Timeline tracing of loading, decomposition and GUI events, exported
+in the Chrome trace event format (viewable in chrome://tracing or
+Perfetto).  Tracing is disabled by default; then span() returns a
+shared no-op context manager, so that instrumented code costs only a
+function call and a global lookup."""
+
+import os, time, json, atexit, threading, contextlib
+
+_events = None # list of trace events while enabled
+_lock = threading.Lock()
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_nullSpan = _NullSpan()
+
+
+def _now():
+    """Return timestamp in microseconds (CLOCK_MONOTONIC on Linux, so
+    timestamps of different processes are comparable)."""
+    return time.perf_counter() * 1e6
+
+
+def _record(event):
+    event.update(pid = os.getpid(), tid = threading.get_ident())
+    with _lock:
+        if _events is not None:
+            _events.append(event)
+
+
+def enable(filename = None):
+    """Start recording events (if filename is given, the trace is
+    written to that file when the process exits)."""
+    global _events
+    if _events is None:
+        _events = []
+    if filename:
+        atexit.register(lambda: writeChromeTrace(filename))
+
+def disable():
+    """Stop recording and forget all events."""
+    global _events
+    _events = None
+
+def isEnabled():
+    return _events is not None
+
+
+@contextlib.contextmanager
+def _span(name, category, args):
+    start = _now()
+    try:
+        yield
+    finally:
+        _record(dict(name = name, cat = category, ph = 'X',
+                     ts = start, dur = _now() - start, args = args))
+
+def span(name, category, **args):
+    """Context manager recording a complete event ('X') for the
+    enclosed code."""
+    if _events is None:
+        return _nullSpan
+    return _span(name, category, args)
+
+
+def instant(name, category, **args):
+    if _events is not None:
+        _record(dict(name = name, cat = category, ph = 'i', s = 't', ts = _now(), args = args))
+
+
+def begin(name, category, id, **args):
+    """Begin an asynchronous span (e.g. an animation), which is
+    finished by calling end() with the same name, category and id."""
+    if _events is not None:
+        _record(dict(name = name, cat = category, ph = 'b', id = id, ts = _now(), args = args))
+
+def end(name, category, id):
+    if _events is not None:
+        _record(dict(name = name, cat = category, ph = 'e', id = id, ts = _now()))
+
+
+def events():
+    """Return list of recorded events (e.g. for passing them from a
+    worker process to addEvents() in the main process)."""
+    with _lock:
+        return list(_events or ())
+
+def addEvents(events):
+    with _lock:
+        if _events is not None:
+            _events.extend(events)
+
+
+def chromeTrace():
+    return dict(traceEvents = events(), displayTimeUnit = 'ms')
+
+def writeChromeTrace(filename):
+    with open(filename, 'w') as f:
+        json.dump(chromeTrace(), f)
@@ -0,0 +1,267 @@
+#  Copyright 2012-2014 Hans Meine <hans_meine@gmx.net>
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Planning of animated transitions, i.e. deciding which content to
+fade out/in and which to slide out/in when changing frames."""
+
+import numpy
+from .dynqt import QtCore
+from . import presentation
+
+# number of frame pairs planned per event loop iteration by
+# TransitionPlanner.scheduleAll():
+PLANS_PER_STEP = 20
+
+
+def coveredKeys(coveringKeys, keys, rectOf):
+    """Return set of those `keys` whose rect (QRectF, as returned by
+    `rectOf(key)`) is contained in the rect of any of the
+    coveringKeys.  Uses an array of the rects sorted by left edge, so
+    that each covering rect only has to be tested against the rects
+    starting within its horizontal extent."""
+    keys = list(keys)
+    if not coveringKeys or not keys:
+        return set()
+
+    rects = numpy.array([rectOf(key).getCoords() for key in keys])
+    order = numpy.argsort(rects[:,0], kind = 'stable')
+    rects = rects[order]
+    lefts = rects[:,0]
+
+    # (like QRectF.contains(), never consider empty rects as covered:)
+    covered = numpy.zeros(len(keys), bool)
+    nonEmpty = (rects[:,2] > rects[:,0]) & (rects[:,3] > rects[:,1])
+    for coveringKey in coveringKeys:
+        x1, y1, x2, y2 = rectOf(coveringKey).getCoords()
+        if x1 == x2 or y1 == y2:
+            continue
+        begin = numpy.searchsorted(lefts, x1, 'left')
+        end = numpy.searchsorted(lefts, x2, 'right')
+        candidates = rects[begin:end]
+        covered[begin:end] |= ((candidates[:,1] >= y1) &
+                               (candidates[:,2] <= x2) &
+                               (candidates[:,3] <= y2) &
+                               nonEmpty[begin:end])
+
+    return set(keys[i] for i in order[covered])
+
+
+def classifyTransition(removedKeys, addedKeys, slideDirection, rectOf,
+                       alwaysSlides = lambda key: False):
+    """Decide which of the removed / added keys (Patches, or other
+    item keys of a FrameRenderer) to fade out/in and which to slide
+    out/in.  Returns (fadeOut, fadeIn, slideOut, slideIn) lists.
+
+    Within a Slide (slideDirection == 0), everything fades.
+    Otherwise, keys for which alwaysSlides(key) is true (e.g. custom
+    content) slide and other non-Patches as well
+    as header & footer always fade; other Patches slide unless they
+    have a predecessor / successor with the same bounding rect
+    (cf. Patch.isSuccessorOf()), in which case both fade.  Finally,
+    fading out is skipped for content that is completely covered by
+    content fading in."""
+
+    fadeOut, fadeIn, slideOut, slideIn = {}, {}, {}, {}
+
+    def isNavigationPatch(key):
+        return (isinstance(key, presentation.Patch) and
+                key.flag(presentation.Patch.MASK_NAVIGATION))
+
+    if not slideDirection:
+        # within-Slide animation, no sliding here:
+        fadeOut = dict.fromkeys(removedKeys)
+        fadeIn = dict.fromkeys(addedKeys)
+    else:
+        # removed Patches by bounding rect, for finding successors:
+        removedPatches = {}
+        for oldKey in removedKeys:
+            if isinstance(oldKey, presentation.Patch):
+                removedPatches.setdefault(oldKey.rectKey(), []).append(oldKey)
+
+        for oldKey in removedKeys:
+            if alwaysSlides(oldKey):
+                slideOut[oldKey] = None
+            elif not isinstance(oldKey, presentation.Patch) or isNavigationPatch(oldKey):
+                fadeOut[oldKey] = None
+            else:
+                slideOut[oldKey] = None
+
+        for newKey in addedKeys:
+            if alwaysSlides(newKey):
+                slideIn[newKey] = None
+                continue
+            if not isinstance(newKey, presentation.Patch) or isNavigationPatch(newKey):
+                fadeIn[newKey] = None
+                continue
+
+            successorOf = removedPatches.get(newKey.rectKey())
+            if successorOf:
+                oldKey = successorOf[0]
+                slideOut.pop(oldKey, None) # (may already be fading out)
+                fadeOut[oldKey] = None
+                fadeIn[newKey] = None
+            else:
+                slideIn[newKey] = None
+
+    for oldKey in coveredKeys(fadeIn, fadeOut, rectOf):
+        del fadeOut[oldKey]
+
+    return list(fadeOut), list(fadeIn), list(slideOut), list(slideIn)
+
+
+def _patchRect(patch):
+    return QtCore.QRectF(patch.boundingRect())
+
+
+class TransitionPlan(object):
+    """Precomputed result of classifyTransition() for the Patches of
+    a pair of frames.  Only valid if the removed and added items of a
+    FrameRenderer are exactly the removed and added Patches (i.e. no
+    custom content, movies or debug items are involved), cf. matches()."""
+
+    __slots__ = ('removed', 'added', 'fadeOut', 'fadeIn', 'slideOut', 'slideIn')
+
+    def __init__(self, removed, added, fadeOut, fadeIn, slideOut, slideIn):
+        self.removed = removed
+        self.added = added
+        self.fadeOut = fadeOut
+        self.fadeIn = fadeIn
+        self.slideOut = slideOut
+        self.slideIn = slideIn
+
+    @classmethod
+    def create(cls, sourceFrame, targetFrame):
+        sourcePatches = set(sourceFrame.content())
+        targetPatches = set(targetFrame.content())
+        removed = [patch for patch in sourceFrame.content() if patch not in targetPatches]
+        added = [patch for patch in targetFrame.content() if patch not in sourcePatches]
+
+        offset = (targetFrame.slide().slideIndex() -
+                  sourceFrame.slide().slideIndex())
+        slideDirection = -1 if offset < 0 else (1 if offset > 0 else 0)
+
+        return cls(frozenset(removed), frozenset(added),
+                   *classifyTransition(removed, added, slideDirection, _patchRect))
+
+    def matches(self, removeItems, addItems):
+        """Return whether this plan applies to the given item dicts."""
+        return (len(removeItems) == len(self.removed) and
+                len(addItems) == len(self.added) and
+                all(key in self.removed for key in removeItems) and
+                all(key in self.added for key in addItems))
+
+    def indices(self, sourceFrame, targetFrame):
+        """Return representation of this plan using indices into the
+        frames' content() (used for persisting plans)."""
+        sourceIndex = dict((patch, i) for i, patch in enumerate(sourceFrame.content()))
+        targetIndex = dict((patch, i) for i, patch in enumerate(targetFrame.content()))
+        return ([sourceIndex[patch] for patch in self.fadeOut],
+                [targetIndex[patch] for patch in self.fadeIn],
+                [sourceIndex[patch] for patch in self.slideOut],
+                [targetIndex[patch] for patch in self.slideIn])
+
+    @classmethod
+    def fromIndices(cls, sourceFrame, targetFrame, indices):
+        fadeOut, fadeIn, slideOut, slideIn = indices
+        sourceContent, targetContent = sourceFrame.content(), targetFrame.content()
+        sourcePatches, targetPatches = set(sourceContent), set(targetContent)
+        return cls(frozenset(patch for patch in sourceContent if patch not in targetPatches),
+                   frozenset(patch for patch in targetContent if patch not in sourcePatches),
+                   [sourceContent[i] for i in fadeOut],
+                   [targetContent[i] for i in fadeIn],
+                   [sourceContent[i] for i in slideOut],
+                   [targetContent[i] for i in slideIn])
+
+
+class TransitionPlanner(QtCore.QObject):
+    """Cache of TransitionPlans, keyed by (sourceFrame, targetFrame).
+    scheduleAll() computes the plans for all consecutive frame pairs
+    (both directions) in idle time."""
+
+    def __init__(self, parent = None):
+        QtCore.QObject.__init__(self, parent)
+        self._plans = {}
+        self._todo = []
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._planNext)
+
+    def __len__(self):
+        return len(self._plans)
+
+    def plan(self, sourceFrame, targetFrame):
+        """Return (cached) TransitionPlan for the given frames."""
+        key = (sourceFrame, targetFrame)
+        result = self._plans.get(key)
+        if result is None:
+            result = self._plans[key] = TransitionPlan.create(sourceFrame, targetFrame)
+        return result
+
+    def hasPlan(self, sourceFrame, targetFrame):
+        return (sourceFrame, targetFrame) in self._plans
+
+    def clear(self):
+        """Forget all plans (e.g. after header / footer flags changed)."""
+        self._plans = {}
+
+    def forgetFrames(self, frames):
+        """Forget all plans from or to the given frames (e.g. after
+        header / footer flags of their patches changed)."""
+        frames = set(frames)
+        for key in [key for key in self._plans
+                    if key[0] in frames or key[1] in frames]:
+            del self._plans[key]
+
+    def _consecutivePairs(self, slides):
+        frames = list(slides.frames())
+        for source, target in zip(frames[:-1], frames[1:]):
+            yield source, target
+            yield target, source
+
+    def scheduleAll(self, slides):
+        """Plan transitions between all consecutive frames in idle time."""
+        self._todo = [pair for pair in self._consecutivePairs(slides)
+                      if pair not in self._plans]
+        if self._todo:
+            self._timer.start(0)
+
+    def computeAll(self, slides):
+        """Plan transitions between all consecutive frames (synchronously)."""
+        self._todo = []
+        for source, target in self._consecutivePairs(slides):
+            self.plan(source, target)
+
+    def isActive(self):
+        return bool(self._todo)
+
+    def _planNext(self):
+        for source, target in self._todo[:PLANS_PER_STEP]:
+            self.plan(source, target)
+        del self._todo[:PLANS_PER_STEP]
+        if self._todo:
+            self._timer.start(0)
+
+    def exportState(self, slides):
+        """Return picklable representation of all plans (using frame
+        indices and content indices)."""
+        return dict(((source.frameIndex(), target.frameIndex()),
+                     plan.indices(source, target))
+                    for (source, target), plan in self._plans.items())
+
+    def importState(self, slides, state):
+        for (sourceIndex, targetIndex), indices in state.items():
+            source, target = slides.frame(sourceIndex), slides.frame(targetIndex)
+            self._plans[(source, target)] = TransitionPlan.fromIndices(
+                source, target, indices)